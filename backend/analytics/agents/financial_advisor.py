@@ -5,12 +5,17 @@ Uses LangChain + OpenAI to provide intelligent financial advice.
 """
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import pandas as pd
-from sqlalchemy import text
 from loguru import logger
 
-from analytics.database.connection import get_db_connection
+from analytics.services.alert_evaluator import DEFAULT_ALERT_CONFIG
+from analytics.services.anomaly_stream import LOOKBACK_DAYS, get_anomaly_stream
+from analytics.services.budgets import load_budget_usage
+from analytics.services.encoding import type_mask
+from analytics.services.feature_store import get_feature_store
+from analytics.services.peer_distributions import CATEGORY_SPEND, SAVINGS_RATE, get_peer_distributions
+from analytics.services.recurring import detect_recurring
 
 
 class FinancialAdvisorAgent:
@@ -28,6 +33,8 @@ class FinancialAdvisorAgent:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         # Note: LangChain integration will be added later
         # For now, using rule-based analysis
+        self.feature_store = get_feature_store()
+        self.peers = get_peer_distributions()
 
     async def generate_insights(
         self,
@@ -40,52 +47,70 @@ class FinancialAdvisorAgent:
         Returns personalized recommendations and warnings
         """
         try:
-            # Fetch user transactions
-            df = await self._get_user_transactions(user_id, period_days)
-
-            if df.empty:
-                return {
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "insights": [],
-                    "message": "Não há transações suficientes para análise."
-                }
-
-            insights = []
-
-            # 1. Spending Trend Analysis
-            trend_insight = self._analyze_spending_trend(df)
-            if trend_insight:
-                insights.append(trend_insight)
-
-            # 2. Category Analysis
-            category_insights = self._analyze_categories(df)
-            insights.extend(category_insights)
-
-            # 3. Budget Compliance
-            budget_insight = self._check_budget_compliance(df)
-            if budget_insight:
-                insights.append(budget_insight)
-
-            # 4. Savings Recommendations
-            savings_insight = self._generate_savings_recommendations(df)
-            if savings_insight:
-                insights.append(savings_insight)
+            features = await self.feature_store.get_features(user_id, period_days)
+            budget_usage = load_budget_usage([user_id], datetime.now())
+            return self.build_insights(features, period_days, budget_usage)
 
+        except Exception as e:
+            logger.error(f"Error generating insights: {e}")
             return {
                 "timestamp": datetime.utcnow().isoformat(),
-                "period_days": period_days,
-                "insights": insights,
-                "summary": self._generate_summary(df)
+                "insights": [],
+                "error": str(e)
             }
 
-        except Exception as e:
-            logger.error(f"Error generating insights: {e}")
+    def build_insights(
+        self,
+        features: Dict[str, Any],
+        period_days: int,
+        budget_usage: Optional[pd.DataFrame] = None
+    ) -> Dict[str, Any]:
+        """
+        Insights response from a feature vector (shared with the nightly batch)
+
+        `budget_usage` holds the user's current budgets with spending, as
+        returned by `load_budget_usage`.
+        """
+        if not features['transactionCount']:
             return {
                 "timestamp": datetime.utcnow().isoformat(),
                 "insights": [],
-                "error": str(e)
+                "message": "Não há transações suficientes para análise."
             }
 
+        insights = []
+
+        # 1. Spending Trend Analysis
+        trend_insight = self._analyze_spending_trend(features)
+        if trend_insight:
+            insights.append(trend_insight)
+
+        # 2. Category Analysis
+        category_insights = self._analyze_categories(features)
+        insights.extend(category_insights)
+
+        # 3. Budget Compliance
+        budget_insight = self._check_budget_compliance(budget_usage)
+        if budget_insight:
+            insights.append(budget_insight)
+
+        # 4. Savings Recommendations
+        savings_insight = self._generate_savings_recommendations(features)
+        if savings_insight:
+            insights.append(savings_insight)
+
+        # 5. Peer Comparison
+        peer_insight = self._compare_with_peers(features)
+        if peer_insight:
+            insights.append(peer_insight)
+
+        return {
+            "timestamp": datetime.utcnow().isoformat(),
+            "period_days": period_days,
+            "insights": insights,
+            "summary": self._generate_summary(features)
+        }
+
     async def find_savings_opportunities(self, user_id: str) -> List[Dict[str, Any]]:
         """
         Identify opportunities to save money
@@ -95,9 +120,12 @@ class FinancialAdvisorAgent:
         - Unnecessary recurring expenses
         - Category overspending
         """
-        opportunities = []
+        df = await self.feature_store.get_frame(user_id, 90)  # 3 months
+        return self.build_savings_opportunities(df)
 
-        df = await self._get_user_transactions(user_id, 90)  # 3 months
+    def build_savings_opportunities(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Savings opportunities from a frame of COMPLETED transactions (3 months)"""
+        opportunities = []
 
         if df.empty:
             return opportunities
@@ -106,19 +134,21 @@ class FinancialAdvisorAgent:
         recurring = self._find_recurring_expenses(df)
 
         for expense in recurring:
-            if expense['average_amount'] > 50:  # High-value recurring
+            if expense['monthly_amount'] > 50:  # High-value recurring
                 opportunities.append({
                     "type": "expensive_subscription",
                     "category": expense['category'],
-                    "monthly_cost": expense['average_amount'],
-                    "estimated_savings": expense['average_amount'] * 0.3,  # Assume 30% savings
+                    "description": expense['description'],
+                    "cadence": expense['cadence'],
+                    "monthly_cost": expense['monthly_amount'],
+                    "estimated_savings": expense['monthly_amount'] * 0.3,  # Assume 30% savings
                     "priority": "high",
-                    "recommendation": f"Revise assinatura em '{expense['category']}' - R$ {expense['average_amount']:.2f}/mês"
+                    "recommendation": f"Revise assinatura em '{expense['category']}' - R$ {expense['monthly_amount']:.2f}/mês"
                 })
 
         # Find categories with unusual high spending
-        expense_df = df[df['type'] == 'EXPENSE']
-        category_totals = expense_df.groupby('category_name')['amount'].sum().sort_values(ascending=False)
+        expense_df = df[type_mask(df, 'EXPENSE')]
+        category_totals = expense_df.groupby('category_name', observed=True)['amount'].sum().sort_values(ascending=False)
 
         for category, total in category_totals.head(3).items():
             avg_transaction = expense_df[expense_df['category_name'] == category]['amount'].mean()
@@ -144,101 +174,74 @@ class FinancialAdvisorAgent:
         """
         Detect unusual transactions using statistical analysis
 
-        Uses Z-score to find outliers
+        Reads the z-scores stored at ingest time (services.anomaly_stream);
+        the first call for a user scans the window and seeds them.
         """
-        anomalies = []
-
-        df = await self._get_user_transactions(user_id, 60)
-
-        if df.empty or len(df) < 10:
-            return anomalies
+        stream = get_anomaly_stream()
+        stored = stream.stored_anomalies(user_id, sensitivity)
+        if stored is not None:
+            return stored
 
-        # Calculate Z-scores for each transaction
-        expense_df = df[df['type'] == 'EXPENSE'].copy()
+        df = await self.feature_store.get_frame(user_id, LOOKBACK_DAYS)
+        return self.seed_anomalies(user_id, df, sensitivity)
 
-        for category in expense_df['category_name'].unique():
-            category_df = expense_df[expense_df['category_name'] == category]
+    def seed_anomalies(self, user_id: str, df: pd.DataFrame, sensitivity: float = 2.0) -> List[Dict[str, Any]]:
+        """Seed a user's stored scores from their last LOOKBACK_DAYS and return the anomalies found"""
+        get_anomaly_stream().seed(df, [user_id])
 
-            if len(category_df) < 3:
-                continue
-
-            mean = category_df['amount'].mean()
-            std = category_df['amount'].std()
-
-            if std == 0:
-                continue
+        if df.empty or len(df) < 10:
+            return []
 
-            category_df['z_score'] = (category_df['amount'] - mean) / std
+        return self.find_anomalies(df, sensitivity).get(user_id, [])
 
-            # Find outliers
-            outliers = category_df[abs(category_df['z_score']) > sensitivity]
+    def find_anomalies(
+        self,
+        df: pd.DataFrame,
+        sensitivity: float = 2.0
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Z-score outliers per user and category, for one or many users
 
-            for _, row in outliers.iterrows():
-                anomalies.append({
-                    "transaction_id": row['id'],
-                    "date": row['date'].isoformat() if pd.notna(row['date']) else None,
-                    "category": row['category_name'],
-                    "amount": float(row['amount']),
-                    "expected_range": {
-                        "min": float(mean - sensitivity * std),
-                        "max": float(mean + sensitivity * std)
-                    },
-                    "severity": "high" if abs(row['z_score']) > 3 else "medium",
-                    "description": f"Transação incomum: R$ {row['amount']:.2f} (média: R$ {mean:.2f})"
-                })
+        Returns anomalies grouped by userId.
+        """
+        expense_df = df[type_mask(df, 'EXPENSE')]
+
+        amount = expense_df['amount'].astype(float)
+        grouped = amount.groupby([expense_df['userId'], expense_df['category_name']], observed=True)
+        count = grouped.transform('size')
+        mean = grouped.transform('mean')
+        std = grouped.transform('std')
+        z_score = (amount - mean) / std
+
+        # Categories need at least 3 transactions and some spread
+        outliers = (count >= 3) & (std > 0) & (z_score.abs() > sensitivity)
+
+        anomalies: Dict[str, List[Dict[str, Any]]] = {}
+        rows = expense_df[outliers].assign(mean=mean[outliers], std=std[outliers], z_score=z_score[outliers])
+
+        for row in rows.itertuples(index=False):
+            anomalies.setdefault(row.userId, []).append({
+                "transaction_id": row.id,
+                "date": row.date.isoformat() if pd.notna(row.date) else None,
+                "category": row.category_name,
+                "amount": float(row.amount),
+                "expected_range": {
+                    "min": float(row.mean - sensitivity * row.std),
+                    "max": float(row.mean + sensitivity * row.std)
+                },
+                "severity": "high" if abs(row.z_score) > 3 else "medium",
+                "description": f"Transação incomum: R$ {row.amount:.2f} (média: R$ {row.mean:.2f})"
+            })
 
         return anomalies
 
     # Private helper methods
 
-    async def _get_user_transactions(
-        self,
-        user_id: str,
-        period_days: int
-    ) -> pd.DataFrame:
-        """Fetch user transactions from database"""
-        engine = get_db_connection()
-
-        query = text("""
-            SELECT
-                t.id,
-                t."userId",
-                t.description,
-                t.amount,
-                t.type,
-                t.date,
-                t.status,
-                uc.name as category_name,
-                uc.type as category_type
-            FROM transactions t
-            LEFT JOIN "userCategories" uc ON t."userCategoryId" = uc.id
-            WHERE t."userId" = :user_id
-                AND t.date >= NOW() - INTERVAL ':days days'
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={
-                "user_id": user_id,
-                "days": period_days
-            })
-
-        df['date'] = pd.to_datetime(df['date'])
-        return df
-
-    def _analyze_spending_trend(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_spending_trend(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Analyze if spending is increasing or decreasing"""
-        expense_df = df[df['type'] == 'EXPENSE'].copy()
-
-        if expense_df.empty:
-            return None
-
         # Compare first half vs second half of period
-        mid_point = expense_df['date'].min() + (expense_df['date'].max() - expense_df['date'].min()) / 2
-
-        first_half = expense_df[expense_df['date'] <= mid_point]['amount'].sum()
-        second_half = expense_df[expense_df['date'] > mid_point]['amount'].sum()
+        first_half = features['expenseTrend']['firstHalf']
+        second_half = features['expenseTrend']['secondHalf']
 
         if second_half > first_half * 1.2:  # 20% increase
             return {
@@ -252,45 +255,68 @@ class FinancialAdvisorAgent:
 
         return None
 
-    def _analyze_categories(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def _analyze_categories(self, features: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Analyze spending by category"""
         insights = []
 
-        expense_df = df[df['type'] == 'EXPENSE']
-        category_totals = expense_df.groupby('category_name')['amount'].sum().sort_values(ascending=False)
-
         # Top spending category
-        if not category_totals.empty:
-            top_category = category_totals.index[0]
-            top_amount = category_totals.iloc[0]
+        if features['topCategories']:
+            top = features['topCategories'][0]
 
             insights.append({
                 "type": "top_category",
                 "priority": "medium",
-                "category": top_category,
-                "amount": float(top_amount),
-                "percentage": (top_amount / expense_df['amount'].sum() * 100),
-                "message": f"Maior gasto: {top_category} (R$ {top_amount:.2f})"
+                "category": top['category'],
+                "amount": top['total'],
+                "percentage": top['share'],
+                "message": f"Maior gasto: {top['category']} (R$ {top['total']:.2f})"
             })
 
         return insights
 
-    def _check_budget_compliance(self, df: pd.DataFrame) -> Dict[str, Any]:
-        """Check if user is within budget (placeholder)"""
-        # TODO: Integrate with budget data
-        return None
+    def _check_budget_compliance(self, budget_usage: Optional[pd.DataFrame]) -> Dict[str, Any]:
+        """Check if user is within the budgets of the current period"""
+        if budget_usage is None or budget_usage.empty:
+            return None
 
-    def _generate_savings_recommendations(self, df: pd.DataFrame) -> Dict[str, Any]:
+        threshold = DEFAULT_ALERT_CONFIG['budgetExceededThreshold']
+        flagged = budget_usage[budget_usage['percentage'] >= threshold].sort_values('percentage', ascending=False)
+
+        if flagged.empty:
+            return None
+
+        exceeded = int((flagged['percentage'] >= 100).sum())
+
+        return {
+            "type": "budget_exceeded" if exceeded else "budget_warning",
+            "priority": "high" if exceeded else "medium",
+            "budgets": [
+                {
+                    "budgetId": b.id,
+                    "name": b.name,
+                    "category": b.category_name,
+                    "amount": float(b.amount),
+                    "spent": float(b.spent),
+                    "percentage": round(float(b.percentage), 1)
+                }
+                for b in flagged.itertuples(index=False)
+            ],
+            "message": (
+                f"{exceeded} orçamento(s) excedido(s) neste período." if exceeded
+                else f"{len(flagged)} orçamento(s) acima de {threshold}% do limite."
+            ),
+            "recommendation": "Reduza os gastos nessas categorias até o fim do período do orçamento."
+        }
+
+    def _generate_savings_recommendations(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Generate savings recommendations"""
-        expense_df = df[df['type'] == 'EXPENSE']
-        income_df = df[df['type'] == 'INCOME']
+        total_income = features['totalIncome']
+        total_expenses = features['totalExpenses']
 
-        if income_df.empty:
+        if total_income <= 0:
             return None
 
-        total_income = income_df['amount'].sum()
-        total_expenses = expense_df['amount'].sum()
-        savings_rate = ((total_income - total_expenses) / total_income * 100) if total_income > 0 else 0
+        savings_rate = features['savingsRate']
 
         if savings_rate < 20:
             return {
@@ -299,34 +325,72 @@ class FinancialAdvisorAgent:
                 "current_rate": savings_rate,
                 "target_rate": 20,
                 "amount_to_save": (total_income * 0.2 - (total_income - total_expenses)),
+                "peer_percentile": self.peers.percentile(SAVINGS_RATE, savings_rate),
                 "message": f"Taxa de economia: {savings_rate:.1f}% (ideal: 20%)",
                 "recommendation": "Estabeleça metas de economia automática para atingir 20% da renda."
             }
 
         return None
 
-    def _generate_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _compare_with_peers(self, features: Dict[str, Any]) -> Dict[str, Any]:
+        """Percentiles of the savings rate and top categories' monthly spend among all users"""
+        savings = None
+        if features['totalIncome'] > 0:
+            percentile = self.peers.percentile(SAVINGS_RATE, features['savingsRate'])
+            if percentile is not None:
+                savings = {"rate": features['savingsRate'], "percentile": percentile}
+
+        categories = []
+        for top in features['topCategories'][:3]:
+            monthly = features['expensesByCategory'].get(str(top['category']), 0.0)
+            percentile = self.peers.percentile(CATEGORY_SPEND, monthly, str(top['category']))
+            if percentile is not None:
+                categories.append({"category": top['category'], "monthly_amount": round(monthly, 2), "percentile": percentile})
+
+        if savings is None and not categories:
+            return None
+
+        messages = []
+        if savings is not None:
+            messages.append(f"Sua taxa de economia é maior que a de {savings['percentile']:.0f}% dos usuários.")
+        for c in categories:
+            messages.append(f"Você gasta mais com {c['category']} do que {c['percentile']:.0f}% dos usuários.")
+
+        # Saving less than most peers or spending more than nearly all of them deserves attention
+        notable = (savings is not None and savings['percentile'] < 25) or any(c['percentile'] >= 90 for c in categories)
+        return {
+            "type": "peer_comparison",
+            "priority": "medium" if notable else "low",
+            "savings_rate": savings,
+            "categories": categories,
+            "population_updated_at": self.peers.computed_at.isoformat() if self.peers.computed_at else None,
+            "message": " ".join(messages)
+        }
+
+    def _generate_summary(self, features: Dict[str, Any]) -> Dict[str, Any]:
         """Generate overall summary"""
         return {
-            "total_transactions": len(df),
-            "total_income": float(df[df['type'] == 'INCOME']['amount'].sum()),
-            "total_expenses": float(df[df['type'] == 'EXPENSE']['amount'].sum()),
-            "categories_count": df['category_name'].nunique()
+            "total_transactions": features['transactionCount'],
+            "total_income": features['totalIncome'],
+            "total_expenses": features['totalExpenses'],
+            "categories_count": features['categoriesCount']
         }
 
     def _find_recurring_expenses(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        """Find recurring expenses"""
-        recurring = []
-
-        expense_df = df[df['type'] == 'EXPENSE'].copy()
-        expense_df['amount_rounded'] = expense_df['amount'].round(0)
-
-        for (category, amount), group in expense_df.groupby(['category_name', 'amount_rounded']):
-            if len(group) >= 2:  # At least 2 occurrences
-                recurring.append({
-                    "category": category,
-                    "average_amount": float(group['amount'].mean()),
-                    "frequency": len(group)
-                })
-
-        return recurring
+        """Find recurring expenses that are still being charged"""
+        # Two occurrences are enough here: the window is only 90 days
+        series, _ = detect_recurring(df[type_mask(df, 'EXPENSE')], min_occurrences=2)
+        series = series[series['active']].sort_values('monthlyAmount', ascending=False)
+
+        return [
+            {
+                "category": s.category,
+                "description": s.description,
+                "cadence": s.cadence,
+                "average_amount": float(s.amount),
+                "monthly_amount": float(s.monthlyAmount),
+                "frequency": int(s.occurrences),
+                "next_date": s.nextDate.isoformat()
+            }
+            for s in series.itertuples(index=False)
+        ]
@@ -9,13 +9,25 @@ Provides intelligent insights for financial goals:
 """
 import os
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 import pandas as pd
 from sqlalchemy import text
 from loguru import logger
 
+from analytics.config import get_settings
 from analytics.database.connection import get_db_connection
 from analytics.ai import get_gpt_advisor
+from analytics.services.cache import get_result_cache
+from analytics.services.feature_store import get_feature_store
+from analytics.services.goal_simulator import GoalSimulator, risk_level_for
+
+# Upper bound on goals x contributions x cut combinations x targets x shifts
+MAX_SCENARIO_CELLS = 200000
+
+PREDICTIONS_NAMESPACE = "goal_predictions"
+# Keys hold the goals, the feature watermark and the day, so entries can live a day
+PREDICTIONS_TTL = 24 * 3600
 
 
 class GoalsAdvisorAgent:
@@ -34,6 +46,15 @@ class GoalsAdvisorAgent:
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         # Future: LangChain integration for natural language recommendations
 
+        self.feature_store = get_feature_store()
+        self.cache = get_result_cache()
+
+        settings = get_settings()
+        self.simulator = GoalSimulator(
+            n_paths=settings.goal_simulation_paths,
+            horizon_months=settings.goal_simulation_horizon_months
+        )
+
     async def predict_goal_achievement(
         self,
         user_id: str,
@@ -54,13 +75,12 @@ class GoalsAdvisorAgent:
             if not goal or goal['userId'] != user_id:
                 return {"error": "Goal not found"}
 
-            # Get user's financial data
-            transactions_df = await self._get_user_transactions(user_id, 90)
+            # Get user's financial capacity from the shared feature store
+            features = await self.feature_store.get_features(user_id)
 
-            # Calculate financial capacity
-            monthly_income = self._calculate_monthly_income(transactions_df)
-            monthly_expenses = self._calculate_monthly_expenses(transactions_df)
-            available_monthly = monthly_income - monthly_expenses
+            monthly_income = features['monthlyIncome']
+            monthly_expenses = features['monthlyExpenses']
+            available_monthly = features['availableMonthly']
 
             # Calculate goal metrics
             target_amount = float(goal['targetAmount'])
@@ -81,30 +101,28 @@ class GoalsAdvisorAgent:
             # Calculate required monthly contribution
             required_monthly = remaining / months_remaining if months_remaining > 0 else remaining
 
-            # Calculate probability based on financial capacity
-            if available_monthly <= 0:
-                probability = 0
-                risk_level = "critical"
-            elif required_monthly > available_monthly * 0.5:  # Requires >50% of available money
-                probability = 20
-                risk_level = "high"
-            elif required_monthly > available_monthly * 0.3:  # Requires 30-50%
-                probability = 60
-                risk_level = "medium"
-            elif required_monthly > available_monthly * 0.1:  # Requires 10-30%
-                probability = 85
-                risk_level = "low"
-            else:  # Requires <10%
-                probability = 95
-                risk_level = "very_low"
-
-            # Calculate projected completion date
-            if available_monthly > 0:
+            # Monte Carlo probability from the user's net savings distribution
+            mu, sigma = features['netSavings']['mu'], features['netSavings']['sigma']
+            simulation = self.simulator.simulate(
+                [remaining],
+                [current_amount],
+                [target_amount],
+                [months_remaining if deadline else None],
+                mu,
+                sigma,
+                seed=GoalSimulator.seed_for(user_id)
+            )[0]
+            probability = simulation['probability']
+            risk_level = risk_level_for(probability)
+
+            # Projected completion: simulated median, falling back to a 20% contribution
+            projected_date = None
+            if simulation['completionDates']['p50']:
+                projected_date = datetime.fromisoformat(simulation['completionDates']['p50'])
+            elif available_monthly > 0:
                 safe_monthly_contribution = available_monthly * 0.2  # Conservative 20%
                 projected_months = remaining / safe_monthly_contribution if safe_monthly_contribution > 0 else 999
                 projected_date = datetime.now() + timedelta(days=int(projected_months * 30))
-            else:
-                projected_date = None
 
             # Generate insights
             insights = []
@@ -135,7 +153,7 @@ class GoalsAdvisorAgent:
                 gpt = get_gpt_advisor()
                 if gpt.is_available():
                     goal_data = {
-                        'title': goal.get('title', 'Meta'),
+                        'title': goal.get('name', 'Meta'),
                         'targetAmount': target_amount,
                         'currentAmount': current_amount,
                         'deadline': deadline.isoformat() if deadline else None
@@ -144,9 +162,10 @@ class GoalsAdvisorAgent:
                         'monthly_income': monthly_income,
                         'monthly_expenses': monthly_expenses
                     }
+                    transactions_df = await self.feature_store.get_frame(user_id)
                     gpt_insights = gpt.generate_goal_insights(
                         goal_data,
-                        transactions_data,
+                        transactions_df.to_dict('records'),
                         financial_summary
                     )
                     for gpt_insight in gpt_insights:
@@ -173,6 +192,7 @@ class GoalsAdvisorAgent:
                     "recommendedMonthly": round(min(required_monthly, available_monthly * 0.3), 2),
                     "monthsRemaining": round(months_remaining, 1)
                 },
+                "simulation": simulation,
                 "insights": insights,
                 "timestamp": datetime.utcnow().isoformat()
             }
@@ -200,11 +220,11 @@ class GoalsAdvisorAgent:
             if not goal or goal['userId'] != user_id:
                 return {"error": "Goal not found"}
 
-            transactions_df = await self._get_user_transactions(user_id, 90)
+            features = await self.feature_store.get_features(user_id)
 
-            monthly_income = self._calculate_monthly_income(transactions_df)
-            monthly_expenses = self._calculate_monthly_expenses(transactions_df)
-            available_monthly = monthly_income - monthly_expenses
+            monthly_income = features['monthlyIncome']
+            monthly_expenses = features['monthlyExpenses']
+            available_monthly = features['availableMonthly']
 
             target_amount = float(goal['targetAmount'])
             current_amount = float(goal['currentAmount'])
@@ -306,93 +326,180 @@ class GoalsAdvisorAgent:
         """
         try:
             goals = await self._get_user_goals(user_id)
-            transactions_df = await self._get_user_transactions(user_id, 90)
 
             if not goals:
                 return []
 
-            monthly_income = self._calculate_monthly_income(transactions_df)
-            monthly_expenses = self._calculate_monthly_expenses(transactions_df)
-            available_monthly = monthly_income - monthly_expenses
+            features = await self.feature_store.get_features(user_id)
+            at_risk = self.assess_goal_risk(pd.DataFrame(goals), {user_id: features['availableMonthly']})
 
-            at_risk = []
+            return at_risk.get(user_id, [])
 
-            for goal in goals:
-                if goal['status'] != 'ACTIVE':
-                    continue
+        except Exception as e:
+            logger.error(f"Error detecting at-risk goals: {e}")
+            return []
 
-                target_amount = float(goal['targetAmount'])
-                current_amount = float(goal['currentAmount'])
-                remaining = target_amount - current_amount
+    async def goals_dashboard(self, user_id: str) -> Dict[str, Any]:
+        """
+        Goals dashboard: summary, top at-risk goals and insights
 
-                # Check if goal has deadline
-                deadline = goal.get('targetDate')
-                if not deadline:
-                    continue
+        Loads the goals once for both the risk analysis and the summary.
+        """
+        goals = await self._get_user_goals(user_id)
+        available_monthly = (await self.feature_store.get_features(user_id))['availableMonthly'] if goals else 0.0
+        return self.build_goals_dashboard(user_id, goals, available_monthly)
 
-                deadline_date = pd.to_datetime(deadline)
-                days_remaining = (deadline_date - pd.Timestamp.now()).days
+    def build_goals_dashboard(
+        self,
+        user_id: str,
+        goals: List[Dict[str, Any]],
+        available_monthly: float
+    ) -> Dict[str, Any]:
+        """Goals dashboard from a user's goal rows and monthly capacity"""
+        at_risk = self.assess_goal_risk(pd.DataFrame(goals), {user_id: available_monthly}).get(user_id, []) if goals else []
 
-                if days_remaining <= 0:
-                    # Already overdue
-                    at_risk.append({
-                        "goalId": goal['id'],
-                        "name": goal['name'],
-                        "riskLevel": "critical",
-                        "reason": "Prazo expirado",
-                        "daysOverdue": abs(days_remaining),
-                        "recommendation": "Estenda o prazo ou reduza o valor alvo"
-                    })
-                    continue
+        active_goals = [g for g in goals if g['status'] == 'ACTIVE']
 
-                months_remaining = max(1, days_remaining / 30)
-                required_monthly = remaining / months_remaining
-
-                # Calculate risk level
-                risk_reasons = []
-                risk_level = "low"
-
-                if required_monthly > available_monthly * 0.5:
-                    risk_reasons.append(f"Requer {round((required_monthly/available_monthly)*100, 0)}% do seu saldo mensal")
-                    risk_level = "high"
-                elif required_monthly > available_monthly * 0.3:
-                    risk_reasons.append(f"Requer {round((required_monthly/available_monthly)*100, 0)}% do seu saldo mensal")
-                    risk_level = "medium"
-
-                if days_remaining < 30:
-                    risk_reasons.append(f"Apenas {days_remaining} dias restantes")
-                    risk_level = "high"
-
-                progress = (current_amount / target_amount * 100) if target_amount > 0 else 0
-                time_progress = ((goal.get('createdAt', datetime.now()) - pd.Timestamp.now()).days /
-                                (deadline_date - pd.Timestamp(goal.get('createdAt', datetime.now()))).days * 100) if deadline else 0
-
-                if progress < time_progress - 20:  # More than 20% behind schedule
-                    risk_reasons.append(f"Progresso ({round(progress, 0)}%) abaixo do esperado")
-                    if risk_level == "low":
-                        risk_level = "medium"
-
-                if risk_reasons:
-                    at_risk.append({
-                        "goalId": goal['id'],
-                        "name": goal['name'],
-                        "riskLevel": risk_level,
-                        "reasons": risk_reasons,
-                        "progress": round(progress, 1),
-                        "daysRemaining": days_remaining,
-                        "requiredMonthly": round(required_monthly, 2),
-                        "recommendation": self._generate_risk_recommendation(
-                            risk_level,
-                            required_monthly,
-                            available_monthly
-                        )
-                    })
-
-            return sorted(at_risk, key=lambda x: {"critical": 0, "high": 1, "medium": 2, "low": 3}[x['riskLevel']])
+        # Calculate aggregated metrics
+        total_target = sum(float(g['targetAmount']) for g in active_goals)
+        total_current = sum(float(g['currentAmount']) for g in active_goals)
+        overall_progress = (total_current / total_target * 100) if total_target > 0 else 0
 
-        except Exception as e:
-            logger.error(f"Error detecting at-risk goals: {e}")
-            return []
+        # Generate insights
+        insights = []
+
+        if len(at_risk) > 0:
+            insights.append({
+                "type": "warning",
+                "message": f"Você tem {len(at_risk)} meta(s) em risco",
+                "priority": "high"
+            })
+
+        if len(active_goals) > 3:
+            insights.append({
+                "type": "recommendation",
+                "message": "Muitas metas ativas. Considere focar nas mais importantes.",
+                "priority": "medium"
+            })
+
+        return {
+            "summary": {
+                "totalGoals": len(goals),
+                "activeGoals": len(active_goals),
+                "completedGoals": len([g for g in goals if g['status'] == 'COMPLETED']),
+                "atRiskCount": len(at_risk),
+                "totalTarget": round(total_target, 2),
+                "totalCurrent": round(total_current, 2),
+                "overallProgress": round(overall_progress, 1)
+            },
+            "atRiskGoals": at_risk[:3],  # Top 3 at-risk
+            "insights": insights,
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
+    def assess_goal_risk(
+        self,
+        goals: pd.DataFrame,
+        available_monthly: Dict[str, float]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        At-risk analysis for the active goals of one or many users
+
+        Args:
+            goals: Goal rows (as returned by `_get_user_goals`) of any users
+            available_monthly: Monthly income minus expenses per userId
+
+        Returns:
+            At-risk goals grouped by userId, most critical first
+        """
+        if goals.empty:
+            return {}
+
+        goals = goals[(goals['status'] == 'ACTIVE') & goals['targetDate'].notna()]
+        if goals.empty:
+            return {}
+
+        now = pd.Timestamp.now()
+        target = goals['targetAmount'].astype(float).to_numpy()
+        current = goals['currentAmount'].astype(float).to_numpy()
+        remaining = target - current
+        available = goals['userId'].map(available_monthly).fillna(0.0).to_numpy(dtype=float)
+
+        deadline = pd.to_datetime(goals['targetDate'])
+        created = pd.to_datetime(goals['createdAt']).fillna(now)
+        days_remaining = (deadline - now).dt.days.to_numpy()
+
+        months_remaining = np.maximum(1, days_remaining / 30)
+        required = remaining / months_remaining
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(available > 0, required / available * 100, np.nan)
+
+        over_half = (remaining > 0) & (required > available * 0.5)
+        over_third = (remaining > 0) & ~over_half & (required > available * 0.3)
+        short_deadline = days_remaining < 30
+
+        progress = np.where(target > 0, current / target * 100, 0.0)
+        total_days = (deadline - created).dt.days.to_numpy()
+        elapsed_days = (now - created).dt.days.to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            time_progress = np.where(total_days > 0, elapsed_days / total_days * 100, 0.0)
+        behind = progress < time_progress - 20  # More than 20% behind schedule
+
+        overdue = days_remaining <= 0
+        risk_level = np.select(
+            [overdue, over_half | short_deadline, over_third | behind],
+            ["critical", "high", "medium"],
+            default="low"
+        )
+        flagged = overdue | over_half | over_third | short_deadline | behind
+
+        order = {"critical": 0, "high": 1, "medium": 2, "low": 3}
+        indices = sorted(np.flatnonzero(flagged), key=lambda i: order[risk_level[i]])
+
+        ids = goals['id'].to_numpy()
+        names = goals['name'].to_numpy()
+        users = goals['userId'].to_numpy()
+
+        at_risk: Dict[str, List[Dict[str, Any]]] = {}
+        for i in indices:
+            if overdue[i]:
+                at_risk.setdefault(users[i], []).append({
+                    "goalId": ids[i],
+                    "name": names[i],
+                    "riskLevel": "critical",
+                    "reason": "Prazo expirado",
+                    "daysOverdue": int(abs(days_remaining[i])),
+                    "recommendation": "Estenda o prazo ou reduza o valor alvo"
+                })
+                continue
+
+            risk_reasons = []
+            if over_half[i] or over_third[i]:
+                if np.isnan(share[i]):
+                    risk_reasons.append("Sem saldo mensal disponível para a meta")
+                else:
+                    risk_reasons.append(f"Requer {round(float(share[i]), 0)}% do seu saldo mensal")
+            if short_deadline[i]:
+                risk_reasons.append(f"Apenas {int(days_remaining[i])} dias restantes")
+            if behind[i]:
+                risk_reasons.append(f"Progresso ({round(float(progress[i]), 0)}%) abaixo do esperado")
+
+            at_risk.setdefault(users[i], []).append({
+                "goalId": ids[i],
+                "name": names[i],
+                "riskLevel": str(risk_level[i]),
+                "reasons": risk_reasons,
+                "progress": round(float(progress[i]), 1),
+                "daysRemaining": int(days_remaining[i]),
+                "requiredMonthly": round(float(required[i]), 2),
+                "recommendation": self._generate_risk_recommendation(
+                    risk_level[i],
+                    float(required[i]),
+                    float(available[i])
+                )
+            })
+
+        return at_risk
 
     async def suggest_goal_optimization(
         self,
@@ -413,11 +520,8 @@ class GoalsAdvisorAgent:
             if not goal or goal['userId'] != user_id:
                 return {"error": "Goal not found"}
 
-            transactions_df = await self._get_user_transactions(user_id, 90)
-
-            monthly_income = self._calculate_monthly_income(transactions_df)
-            monthly_expenses = self._calculate_monthly_expenses(transactions_df)
-            available_monthly = monthly_income - monthly_expenses
+            features = await self.feature_store.get_features(user_id)
+            available_monthly = features['availableMonthly']
 
             target_amount = float(goal['targetAmount'])
             current_amount = float(goal['currentAmount'])
@@ -479,8 +583,367 @@ class GoalsAdvisorAgent:
             logger.error(f"Error suggesting optimization: {e}")
             return {"error": str(e)}
 
+    async def analyze_all_goals(
+        self,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """
+        Predictions, contribution plans and optimizations for every active goal
+
+        Loads goals and 90 days of transactions once, then evaluates all
+        goals together as array operations instead of one request (and one
+        transaction load) per goal.
+        """
+        try:
+            goals = await self._get_user_goals(user_id)
+            active_goals = [g for g in goals if g['status'] == 'ACTIVE']
+
+            features = await self.feature_store.get_features(user_id)
+
+            monthly_income = features['monthlyIncome']
+            monthly_expenses = features['monthlyExpenses']
+            available_monthly = features['availableMonthly']
+
+            # Simulations are seeded per user, so same goals + same data = same result
+            key = (
+                datetime.now().strftime('%Y-%m-%d'),
+                features['watermark']['updatedAt'],
+                features['watermark']['count'],
+                tuple(
+                    (g['id'], str(g['targetAmount']), str(g['currentAmount']), str(g.get('targetDate')))
+                    for g in active_goals
+                )
+            )
+            results = self.cache.get(PREDICTIONS_NAMESPACE, user_id, key)
+            if results is None:
+                net_savings = (features['netSavings']['mu'], features['netSavings']['sigma'])
+                results = self._evaluate_goals_batch(active_goals, available_monthly, net_savings, seed_key=user_id)
+                self.cache.set(PREDICTIONS_NAMESPACE, user_id, results, key=key, ttl=PREDICTIONS_TTL)
+
+            return {
+                "userId": user_id,
+                "goals": results,
+                "count": len(results),
+                "context": {
+                    "monthlyIncome": round(monthly_income, 2),
+                    "monthlyExpenses": round(monthly_expenses, 2),
+                    "available": round(available_monthly, 2)
+                },
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error analyzing goals in batch: {e}")
+            return {"error": str(e)}
+
+    async def evaluate_scenario_grid(
+        self,
+        user_id: str,
+        contributions: Optional[List[float]] = None,
+        deadline_shifts: Optional[List[int]] = None,
+        target_changes: Optional[List[float]] = None,
+        expense_cuts: Optional[Dict[str, List[float]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Evaluate a what-if grid over all active goals in one vectorized call
+
+        Axes:
+        - contributions: monthly contribution amounts
+        - expense cuts: every combination of the per-category cut percentages,
+          whose freed money is added to the contribution
+        - target changes: percent change of each goal's target
+        - deadline shifts: months added to (or removed from) each deadline
+
+        Returns completion-month and on-track surfaces indexed
+        [goal][contribution][expense_cut][target_change](/[deadline_shift]),
+        so sliders can be rendered without a round-trip per position. A grid
+        over MAX_SCENARIO_CELLS is an error flagged `invalid`.
+        """
+        try:
+            goals = await self._get_user_goals(user_id)
+            active_goals = [g for g in goals if g['status'] == 'ACTIVE']
+
+            features = await self.feature_store.get_features(user_id)
+
+            monthly_income = features['monthlyIncome']
+            monthly_expenses = features['monthlyExpenses']
+            available_monthly = features['availableMonthly']
+
+            if contributions is None:
+                contributions = [round(max(available_monthly, 0) * share, 2) for share in (0.1, 0.2, 0.3, 0.4, 0.5)]
+            deadline_shifts = deadline_shifts or [0]
+            target_changes = target_changes or [0.0]
+            expense_cuts = expense_cuts or {}
+
+            category_monthly = features['expensesByCategory']
+            cut_categories = list(expense_cuts.keys())
+
+            # Cartesian product of per-category cut levels -> freed money per combination
+            if cut_categories:
+                levels = np.meshgrid(*[np.asarray(expense_cuts[c], dtype=float) for c in cut_categories], indexing='ij')
+                spend = np.array([category_monthly.get(c, 0.0) for c in cut_categories])
+                cut_grid = np.stack([lv.ravel() for lv in levels], axis=1)
+                freed = cut_grid @ spend / 100
+            else:
+                cut_grid = np.zeros((1, 0))
+                freed = np.zeros(1)
+
+            n_cells = len(active_goals) * len(contributions) * len(freed) * len(target_changes) * len(deadline_shifts)
+            if n_cells > MAX_SCENARIO_CELLS:
+                return {
+                    "error": f"Scenario grid too large ({n_cells} cells, max {MAX_SCENARIO_CELLS})",
+                    "invalid": True
+                }
+
+            now = pd.Timestamp.now()
+            target = np.array([float(g['targetAmount']) for g in active_goals])
+            current = np.array([float(g['currentAmount']) for g in active_goals])
+            deadlines = pd.to_datetime(pd.Series([g.get('targetDate') for g in active_goals], dtype=object))
+            has_deadline = deadlines.notna().to_numpy()
+            deadline_months = ((deadlines - now).dt.days / 30).fillna(np.inf).to_numpy()
+
+            # Broadcast shapes: G goals, C contributions, E cut combos, T target changes, D shifts
+            scenario_target = target[:, None] * (1 + np.asarray(target_changes, dtype=float)[None, :] / 100)   # (G, T)
+            remaining = np.maximum(scenario_target - current[:, None], 0)                                     # (G, T)
+            monthly = np.asarray(contributions, dtype=float)[:, None] + freed[None, :]                       # (C, E)
+
+            monthly_b = monthly[None, :, :, None]
+            remaining_b = remaining[:, None, None, :]
+            completion = np.divide(
+                remaining_b, monthly_b,
+                out=np.full(np.broadcast_shapes(remaining_b.shape, monthly_b.shape), 999.0),
+                where=monthly_b > 0
+            )
+            completion = np.where(remaining_b <= 0, 0.0, np.minimum(completion, 999.0))      # (G, C, E, T)
+
+            shifted = deadline_months[:, None] + np.asarray(deadline_shifts, dtype=float)[None, :]   # (G, D)
+            on_track = completion[..., None] <= shifted[:, None, None, None, :]                       # (G, C, E, T, D)
+
+            months_left = np.maximum(shifted, 1)
+            required = np.where(
+                has_deadline[:, None, None],
+                remaining[:, :, None] / months_left[:, None, :],
+                np.nan
+            )                                                                                      # (G, T, D)
+
+            results = {}
+            for i, goal in enumerate(active_goals):
+                results[goal['id']] = {
+                    "name": goal['name'],
+                    "target": target[i],
+                    "current": current[i],
+                    "hasDeadline": bool(has_deadline[i]),
+                    "completionMonths": np.round(completion[i], 1).tolist(),
+                    "onTrack": on_track[i].tolist() if has_deadline[i] else None,
+                    "requiredMonthly": np.round(required[i], 2).tolist() if has_deadline[i] else None
+                }
+
+            return {
+                "userId": user_id,
+                "asOf": now.isoformat(),
+                "axes": {
+                    "contributions": [float(c) for c in contributions],
+                    "expenseCuts": {
+                        "categories": cut_categories,
+                        "combinations": cut_grid.tolist(),
+                        "freedMonthly": np.round(freed, 2).tolist()
+                    },
+                    "targetChanges": [float(t) for t in target_changes],
+                    "deadlineShifts": [int(d) for d in deadline_shifts]
+                },
+                "goals": results,
+                "context": {
+                    "monthlyIncome": round(monthly_income, 2),
+                    "monthlyExpenses": round(monthly_expenses, 2),
+                    "available": round(available_monthly, 2),
+                    "expensesByCategory": {c: round(v, 2) for c, v in category_monthly.items()}
+                },
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error evaluating scenario grid: {e}")
+            return {"error": str(e)}
+
     # Private helper methods
 
+    def _evaluate_goals_batch(
+        self,
+        goals: List[Dict[str, Any]],
+        available_monthly: float,
+        net_savings: Tuple[float, float],
+        seed_key: str = ""
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Vectorized version of the single-goal prediction, plans and
+        optimization rules, keyed by goal id
+        """
+        if not goals:
+            return {}
+
+        now = pd.Timestamp.now()
+        available = available_monthly
+
+        target = np.array([float(g['targetAmount']) for g in goals])
+        current = np.array([float(g['currentAmount']) for g in goals])
+        remaining = target - current
+        deadlines = pd.to_datetime(pd.Series([g.get('targetDate') for g in goals]))
+        has_deadline = deadlines.notna().to_numpy()
+        days_to_deadline = (deadlines - now).dt.days.fillna(0).to_numpy()
+        deadline_months = np.maximum(1, days_to_deadline / 30)
+
+        def safe_months(monthly):
+            # remaining / monthly, with the 999-month sentinel when nothing can be saved
+            monthly = np.broadcast_to(monthly, remaining.shape)
+            return np.divide(remaining, monthly, out=np.full(remaining.shape, 999.0), where=monthly > 0)
+
+        def dates_after(months):
+            days = np.minimum(months, 999) * 30
+            return [(now + timedelta(days=int(d))).isoformat() for d in days]
+
+        # Prediction: no deadline means "10% of available per month"
+        months_remaining = np.where(has_deadline, deadline_months, safe_months(available * 0.1))
+        days_remaining = np.where(has_deadline, days_to_deadline, (months_remaining * 30).astype(int))
+        required = np.where(months_remaining > 0, remaining / np.where(months_remaining > 0, months_remaining, 1), remaining)
+
+        # Probability: one Monte Carlo run shared by all goals
+        mu, sigma = net_savings
+        simulations = self.simulator.simulate(
+            remaining,
+            current,
+            target,
+            [m if d else None for m, d in zip(months_remaining, has_deadline)],
+            mu,
+            sigma,
+            seed=GoalSimulator.seed_for(seed_key)
+        )
+        probability = np.array([sim['probability'] for sim in simulations])
+        risk_level = [risk_level_for(p) for p in probability]
+
+        fallback = dates_after(safe_months(available * 0.2)) if available > 0 else [None] * len(goals)
+        projected = [sim['completionDates']['p50'] or fallback[i] for i, sim in enumerate(simulations)]
+
+        # Plans: conservative 10%, moderate 20%, aggressive min(required, 35%)
+        plan_months = np.where(has_deadline, deadline_months, 12)
+        plan_required = remaining / plan_months
+        plan_amounts = np.stack([
+            np.full(len(goals), available * 0.10),
+            np.full(len(goals), available * 0.20),
+            np.minimum(plan_required, available * 0.35)
+        ], axis=1)
+        plan_completion = np.stack([safe_months(plan_amounts[:, i]) for i in range(3)], axis=1)
+        recommended = np.select(
+            [plan_required <= available * 0.10, plan_required > available * 0.30],
+            ["conservative", "aggressive"],
+            default="moderate"
+        )
+
+        # Optimization: 20% of available, compared against the current deadline
+        optimal_monthly = available * 0.20
+        optimal_months = safe_months(optimal_monthly)
+        optimal_deadline = [now + timedelta(days=int(m * 30)) for m in np.minimum(optimal_months, 999)]
+        comfortable_target = current + optimal_monthly * 12
+
+        results = {}
+        for i, goal in enumerate(goals):
+            deadline = deadlines.iloc[i] if has_deadline[i] else None
+
+            insights = []
+            if probability[i] < 50:
+                insights.append({
+                    "type": "warning",
+                    "message": "Meta em risco! Ajustes necessários para alcançar o objetivo.",
+                    "priority": "high"
+                })
+            if required[i] > available * 0.3:
+                insights.append({
+                    "type": "recommendation",
+                    "message": "Considere estender o prazo ou reduzir o valor alvo.",
+                    "priority": "medium"
+                })
+            if deadline is not None and days_remaining[i] < 30 and remaining[i] > available:
+                insights.append({
+                    "type": "urgent",
+                    "message": "Prazo muito próximo! Improvável de alcançar sem contribuição extra.",
+                    "priority": "critical"
+                })
+
+            suggestions = []
+            if deadline is not None and optimal_deadline[i] > deadline:
+                suggestions.append({
+                    "type": "deadline_extension",
+                    "current": deadline.isoformat(),
+                    "suggested": optimal_deadline[i].isoformat(),
+                    "reason": "Prazo atual muito agressivo para sua capacidade financeira",
+                    "impact": f"Reduz contribuição mensal necessária para R$ {optimal_monthly:.2f}"
+                })
+            if deadline is not None and optimal_deadline[i] < deadline:
+                suggestions.append({
+                    "type": "deadline_acceleration",
+                    "current": deadline.isoformat(),
+                    "suggested": optimal_deadline[i].isoformat(),
+                    "reason": "Você pode alcançar esta meta mais cedo",
+                    "impact": f"Conclui {round((deadline - optimal_deadline[i]).days / 30, 1)} meses antes"
+                })
+            if comfortable_target[i] > target[i] * 1.2:
+                suggestions.append({
+                    "type": "target_increase",
+                    "current": target[i],
+                    "suggested": round(comfortable_target[i], 2),
+                    "reason": "Você tem capacidade para uma meta mais ambiciosa",
+                    "impact": f"Aumenta meta em R$ {comfortable_target[i] - target[i]:.2f}"
+                })
+
+            plans = []
+            for j, (name, plan_type, description) in enumerate([
+                ("Conservador", "conservative", "Contribuição segura sem comprometer seu orçamento"),
+                ("Moderado", "moderate", "Equilíbrio entre progresso e conforto financeiro"),
+                ("Agressivo", "aggressive", "Máximo progresso possível dentro da sua capacidade")
+            ]):
+                monthly = plan_amounts[i, j]
+                plans.append({
+                    "name": name,
+                    "type": plan_type,
+                    "monthly": round(monthly, 2),
+                    "weekly": round(monthly / 4, 2),
+                    "daily": round(monthly / 30, 2),
+                    "completionMonths": round(plan_completion[i, j], 1),
+                    "completionDate": dates_after(plan_completion[i:i + 1, j])[0],
+                    "impactOnBudget": f"{round((monthly / available) * 100, 1) if available > 0 else 0}%",
+                    "description": description
+                })
+
+            results[goal['id']] = {
+                "name": goal['name'],
+                "prediction": {
+                    "probability": round(float(probability[i]), 1),
+                    "riskLevel": str(risk_level[i]),
+                    "projectedCompletionDate": projected[i],
+                    "onTrack": bool(probability[i] >= 70)
+                },
+                "financial": {
+                    "remaining": float(remaining[i]),
+                    "requiredMonthly": round(float(required[i]), 2),
+                    "availableMonthly": round(available, 2),
+                    "recommendedMonthly": round(float(min(required[i], available * 0.3)), 2),
+                    "monthsRemaining": round(float(months_remaining[i]), 1)
+                },
+                "simulation": simulations[i],
+                "plans": plans,
+                "recommended": str(recommended[i]),
+                "optimization": {
+                    "suggestions": suggestions,
+                    "optimal": {
+                        "monthlyContribution": round(optimal_monthly, 2),
+                        "deadline": optimal_deadline[i].isoformat(),
+                        "timeframe": f"{round(float(optimal_months[i]), 1)} meses"
+                    }
+                },
+                "insights": insights
+            }
+
+        return results
+
     async def _get_goal(self, goal_id: str) -> Optional[Dict[str, Any]]:
         """Fetch single goal from database"""
         engine = get_db_connection()
@@ -536,70 +999,6 @@ class GoalsAdvisorAgent:
                 "createdAt": r[8]
             } for r in results]
 
-    async def _get_user_transactions(
-        self,
-        user_id: str,
-        period_days: int
-    ) -> pd.DataFrame:
-        """Fetch user transactions from database"""
-        engine = get_db_connection()
-
-        query = text("""
-            SELECT
-                t.id,
-                t.amount,
-                t.type,
-                t.date,
-                t.status
-            FROM transactions t
-            WHERE t."userId" = :user_id
-                AND t.date >= NOW() - INTERVAL ':days days'
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={
-                "user_id": user_id,
-                "days": period_days
-            })
-
-        if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
-
-        return df
-
-    def _calculate_monthly_income(self, df: pd.DataFrame) -> float:
-        """Calculate average monthly income"""
-        if df.empty:
-            return 0.0
-
-        income_df = df[df['type'] == 'INCOME']
-
-        if income_df.empty:
-            return 0.0
-
-        # Calculate average monthly income over the period
-        months = (df['date'].max() - df['date'].min()).days / 30
-        months = max(1, months)
-
-        return float(income_df['amount'].sum() / months)
-
-    def _calculate_monthly_expenses(self, df: pd.DataFrame) -> float:
-        """Calculate average monthly expenses"""
-        if df.empty:
-            return 0.0
-
-        expense_df = df[df['type'] == 'EXPENSE']
-
-        if expense_df.empty:
-            return 0.0
-
-        months = (df['date'].max() - df['date'].min()).days / 30
-        months = max(1, months)
-
-        return float(expense_df['amount'].sum() / months)
-
     def _generate_risk_recommendation(
         self,
         risk_level: str,
@@ -6,6 +6,12 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
 from loguru import logger
 from analytics.ai import get_gpt_advisor
+from analytics.database.queries import fetch_budget_periods, fetch_goals, fetch_transactions
+from analytics.services.budgets import compute_budget_usage
+from analytics.services.cash_flow import HORIZONS, load_projections
+from analytics.services.aggregates import AggregateState
+from analytics.services.money import from_cents, percent
+from analytics.services.report_calculator import ReportCalculator
 import pandas as pd
 import numpy as np
 
@@ -13,7 +19,7 @@ import numpy as np
 class ReportAnalyzer:
     """Generates comprehensive financial reports with AI insights"""
 
-    def __init__(self, db_manager):
+    def __init__(self, db_manager=None):
         self.db = db_manager
         self.gpt = get_gpt_advisor()
 
@@ -28,24 +34,34 @@ class ReportAnalyzer:
 
         Args:
             user_id: User ID
-            report_type: Type of report (monthly, category, goals, cash_flow)
-            period: Time period (7d, 30d, 90d, 1y)
+            report_type: Type of report (monthly, category, goals, cash_flow,
+                cash_flow_projection, budget_variance)
+            period: Time period (7d, 30d, 90d, 1y); the horizon for projections
 
         Returns:
             Report data with insights and charts
         """
+        if report_type == "budget_variance":
+            return self.generate_budget_variance_report(user_id, period)
+        if report_type == "cash_flow_projection":
+            return self.generate_cash_flow_projection_report(user_id, min(self._parse_period(period), max(HORIZONS)))
+
         try:
-            # Fetch data based on period
             days = self._parse_period(period)
+
+            # Totals-only reports merge cached monthly aggregate states
+            if report_type in ("monthly", "category"):
+                state = ReportCalculator().period_states(user_id, datetime.now() - timedelta(days=days))
+                if report_type == "monthly":
+                    return self._generate_monthly_report(user_id, state, period)
+                return self._generate_category_report(user_id, state, period)
+
+            # Fetch data based on period
             transactions = self._fetch_transactions(user_id, days)
             goals = self._fetch_goals(user_id)
 
             # Generate report based on type
-            if report_type == "monthly":
-                return self._generate_monthly_report(user_id, transactions, period)
-            elif report_type == "category":
-                return self._generate_category_report(user_id, transactions, period)
-            elif report_type == "goals":
+            if report_type == "goals":
                 return self._generate_goals_report(user_id, goals, transactions, period)
             elif report_type == "cash_flow":
                 return self._generate_cash_flow_report(user_id, transactions, period)
@@ -90,17 +106,202 @@ class ReportAnalyzer:
             logger.error(f"Error generating custom report: {e}")
             return {"error": str(e)}
 
+    def generate_budget_variance_report(
+        self,
+        user_id: str,
+        period: str = "1y"
+    ) -> Dict[str, Any]:
+        """
+        Generate budget variance report (ReportType.BUDGET_VARIANCE)
+
+        Every budget period overlapping the window is matched to its
+        category's expenses with an interval join, then compared against
+        its amount: variance, daily burn rate and projected overrun for
+        periods still running.
+
+        Args:
+            user_id: User ID
+            period: Time period (30d, 90d, 1y, 3y, ...)
+        """
+        try:
+            now = datetime.now()
+            days = self._parse_period(period)
+            budgets = fetch_budget_periods([user_id], now - timedelta(days=days), now)
+
+            if budgets.empty:
+                return {
+                    "type": "budget_variance",
+                    "period": period,
+                    "summary": {
+                        "totalBudgeted": 0,
+                        "totalSpent": 0,
+                        "variance": 0,
+                        "budgetsCount": 0,
+                        "overBudgetCount": 0,
+                        "atRiskCount": 0
+                    },
+                    "budgets": [],
+                    "categories": [],
+                    "insights": ["Nenhum orçamento encontrado no período."]
+                }
+
+            transactions = fetch_transactions(
+                [user_id],
+                budgets['startDate'].min(),
+                min(budgets['endDate'].max(), pd.Timestamp(now))
+            )
+            variance = self._compute_budget_variance(compute_budget_usage(budgets, transactions), now)
+
+            budgets_data = [
+                {
+                    "budgetId": b.id,
+                    "name": b.name,
+                    "category": b.category_name,
+                    "period": b.period,
+                    "startDate": b.startDate.isoformat(),
+                    "endDate": b.endDate.isoformat(),
+                    "amount": float(b.amount),
+                    "spent": float(b.spent),
+                    "variance": float(b.variance),
+                    "variancePercentage": float(b.variancePercentage),
+                    "utilization": float(b.percentage),
+                    "transactionCount": int(b.transactionCount),
+                    "elapsedDays": round(float(b.elapsedDays), 1),
+                    "totalDays": round(float(b.totalDays), 1),
+                    "dailyBurnRate": float(b.dailyBurnRate),
+                    "projectedSpend": float(b.projectedSpend),
+                    "projectedOverrun": float(b.projectedOverrun),
+                    "status": b.varianceStatus
+                }
+                for b in variance.round(dict.fromkeys(variance.select_dtypes('number').columns, 2)).itertuples(index=False)
+            ]
+
+            by_category = (
+                variance.assign(
+                    category=variance['category_name'].fillna('Sem categoria'),
+                    over=variance['varianceStatus'] == 'over_budget'
+                )
+                .groupby('category')
+                .agg(
+                    budgeted=('amountCents', 'sum'),
+                    spent=('spentCents', 'sum'),
+                    periods=('id', 'size'),
+                    overBudget=('over', 'sum')
+                )
+                .sort_values('spent', ascending=False)
+            )
+            categories = [
+                {
+                    "category": name,
+                    "budgeted": from_cents(row['budgeted']),
+                    "spent": from_cents(row['spent']),
+                    "variance": from_cents(row['budgeted'] - row['spent']),
+                    "periods": int(row['periods']),
+                    "overBudgetPeriods": int(row['overBudget'])
+                }
+                for name, row in by_category.iterrows()
+            ]
+
+            budgeted_cents = int(variance['amountCents'].sum())
+            spent_cents = int(variance['spentCents'].sum())
+            summary = {
+                "totalBudgeted": from_cents(budgeted_cents),
+                "totalSpent": from_cents(spent_cents),
+                "variance": from_cents(budgeted_cents - spent_cents),
+                "budgetsCount": len(variance),
+                "overBudgetCount": int((variance['varianceStatus'] == 'over_budget').sum()),
+                "atRiskCount": int((variance['varianceStatus'] == 'at_risk').sum())
+            }
+
+            return {
+                "type": "budget_variance",
+                "period": period,
+                "summary": summary,
+                "budgets": budgets_data,
+                "categories": categories,
+                "insights": self._generate_budget_variance_insights(summary, budgets_data),
+                "timestamp": datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error generating budget variance report: {e}")
+            return {"error": str(e)}
+
+    def generate_cash_flow_projection_report(
+        self,
+        user_id: str,
+        horizon_days: int = 90
+    ) -> Dict[str, Any]:
+        """
+        Generate cash-flow projection report (ReportType.CASH_FLOW_PROJECTION)
+
+        Day-by-day projected balance from the current account balances,
+        recurring transactions, average discretionary spending and the
+        monthly contributions the active goals need to meet their deadlines.
+
+        Args:
+            user_id: User ID
+            horizon_days: Days to project (30, 90 or 365)
+        """
+        try:
+            projection = load_projections([user_id], datetime.now(), horizon_days)[user_id]
+
+            return {
+                "type": "cash_flow_projection",
+                "period": f"{horizon_days}d",
+                **{k: v for k, v in projection.items() if k != "userId"},
+                "insights": self._generate_cash_flow_projection_insights(projection),
+                "timestamp": datetime.now().isoformat()
+            }
+
+        except Exception as e:
+            logger.error(f"Error generating cash flow projection: {e}")
+            return {"error": str(e)}
+
+    def _compute_budget_variance(self, usage: pd.DataFrame, now: datetime) -> pd.DataFrame:
+        """Variance, burn rate and projection columns for budget usage rows"""
+        day = pd.Timedelta(days=1)
+        start = usage['startDate']
+        end = usage['endDate']
+
+        total_days = ((end - start) / day).clip(lower=1.0)
+        # At least one day elapsed so a budget starting today doesn't explode the burn rate
+        elapsed_days = ((end.clip(upper=pd.Timestamp(now)) - start) / day).clip(lower=1.0)
+        elapsed_days = np.minimum(elapsed_days, total_days)
+        closed = end <= pd.Timestamp(now)
+
+        spent = usage['spent']
+        amount = usage['amount']
+        burn_rate = spent / elapsed_days
+        projected = np.where(closed, spent, burn_rate * total_days)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            variance_pct = np.where(amount > 0, (amount - spent) / amount * 100, 0.0)
+
+        return usage.assign(
+            totalDays=total_days,
+            elapsedDays=elapsed_days,
+            variance=amount - spent,
+            variancePercentage=variance_pct,
+            dailyBurnRate=burn_rate,
+            projectedSpend=projected,
+            projectedOverrun=np.maximum(projected - amount, 0.0),
+            varianceStatus=np.select(
+                [spent > amount, projected > amount, closed],
+                ["over_budget", "at_risk", "under_budget"],
+                default="on_track"
+            )
+        )
+
     def _generate_monthly_report(
         self,
         user_id: str,
-        transactions: List[Dict],
+        state: AggregateState,
         period: str
     ) -> Dict[str, Any]:
-        """Generate monthly financial summary report"""
-
-        df = pd.DataFrame(transactions)
+        """Generate monthly financial summary report from (month, type, category) states"""
 
-        if df.empty:
+        if state.moments.empty:
             return {
                 "type": "monthly",
                 "period": period,
@@ -114,20 +315,12 @@ class ReportAnalyzer:
                 "insights": ["Nenhuma transação encontrada no período."]
             }
 
-        # Calculate monthly aggregations
-        df['date'] = pd.to_datetime(df['date'])
-        df['month'] = df['date'].dt.to_period('M')
-
-        monthly = df.groupby(['month', 'type']).agg({
-            'amount': 'sum'
-        }).reset_index()
-
-        # Pivot to get income and expenses
-        monthly_pivot = monthly.pivot(
-            index='month',
-            columns='type',
-            values='amount'
-        ).fillna(0)
+        # Monthly income and expenses (exact cents until serialized)
+        monthly_pivot = (
+            state.rollup(['month', 'type']).moments['sumCents']
+            .unstack('type', fill_value=0)
+            .sort_index()
+        )
 
         monthly_data = []
         for month in monthly_pivot.index:
@@ -136,16 +329,18 @@ class ReportAnalyzer:
 
             monthly_data.append({
                 "month": str(month),
-                "income": float(income),
-                "expenses": float(expenses),
-                "balance": float(income - expenses)
+                "income": from_cents(income),
+                "expenses": from_cents(expenses),
+                "balance": from_cents(income - expenses)
             })
 
         # Calculate summary
-        total_income = df[df['type'] == 'INCOME']['amount'].sum()
-        total_expenses = abs(df[df['type'] == 'EXPENSE']['amount'].sum())
-        net_savings = total_income - total_expenses
-        savings_rate = (net_savings / total_income * 100) if total_income > 0 else 0
+        income_cents = int(monthly_pivot['INCOME'].sum()) if 'INCOME' in monthly_pivot.columns else 0
+        expense_cents = int(monthly_pivot['EXPENSE'].sum()) if 'EXPENSE' in monthly_pivot.columns else 0
+        total_income = from_cents(income_cents)
+        total_expenses = from_cents(expense_cents)
+        net_savings = from_cents(income_cents - expense_cents)
+        savings_rate = percent(income_cents - expense_cents, income_cents) if income_cents > 0 else 0
 
         # Generate AI insights
         insights = self._generate_monthly_insights(
@@ -169,14 +364,12 @@ class ReportAnalyzer:
     def _generate_category_report(
         self,
         user_id: str,
-        transactions: List[Dict],
+        state: AggregateState,
         period: str
     ) -> Dict[str, Any]:
-        """Generate expenses by category report"""
-
-        df = pd.DataFrame(transactions)
+        """Generate expenses by category report from (month, type, category) states"""
 
-        if df.empty:
+        if state.moments.empty:
             return {
                 "type": "category",
                 "period": period,
@@ -184,10 +377,11 @@ class ReportAnalyzer:
                 "insights": ["Nenhuma transação encontrada no período."]
             }
 
-        # Filter only expenses
-        expenses_df = df[df['type'] == 'EXPENSE'].copy()
+        # Expenses per category (uncategorized ones are left out)
+        summary = state.rollup(['type', 'category']).summary().reset_index()
+        category_summary = summary[(summary['type'] == 'EXPENSE') & summary['category'].notna()]
 
-        if expenses_df.empty:
+        if category_summary.empty:
             return {
                 "type": "category",
                 "period": period,
@@ -195,27 +389,19 @@ class ReportAnalyzer:
                 "insights": ["Nenhuma despesa encontrada no período."]
             }
 
-        # Group by category
-        category_summary = expenses_df.groupby('category').agg({
-            'amount': ['sum', 'count', 'mean']
-        }).reset_index()
-
-        category_summary.columns = ['category', 'total', 'count', 'average']
-        category_summary['total'] = category_summary['total'].abs()
-        category_summary['average'] = category_summary['average'].abs()
-        category_summary = category_summary.sort_values('total', ascending=False)
+        category_summary = category_summary.sort_values('totalCents', ascending=False)
 
-        total_expenses = category_summary['total'].sum()
+        total_cents = category_summary['totalCents'].sum()
+        total_expenses = from_cents(total_cents)
 
         categories = []
         for _, row in category_summary.iterrows():
-            percentage = (row['total'] / total_expenses * 100) if total_expenses > 0 else 0
             categories.append({
                 "name": row['category'],
-                "total": float(row['total']),
+                "total": from_cents(row['totalCents']),
                 "count": int(row['count']),
-                "average": float(row['average']),
-                "percentage": float(percentage)
+                "average": round(float(row['mean']), 2),
+                "percentage": percent(row['totalCents'], total_cents)
             })
 
         # Generate AI insights
@@ -514,6 +700,30 @@ Forneça insights curtos e diretos (máximo 1 linha cada).
 
         return insights
 
+    def _generate_budget_variance_insights(
+        self, summary: Dict[str, Any], budgets: List[Dict]
+    ) -> List[str]:
+        """Generate insights for budget variance report"""
+
+        insights = [
+            f"Orçado: R$ {summary['totalBudgeted']:.2f} | Gasto: R$ {summary['totalSpent']:.2f}"
+        ]
+
+        if summary['overBudgetCount'] > 0:
+            insights.append(f"⚠️ {summary['overBudgetCount']} período(s) de orçamento estourado(s)")
+
+        running = [b for b in budgets if b['status'] == 'at_risk']
+        if running:
+            worst = max(running, key=lambda b: b['projectedOverrun'])
+            insights.append(
+                f"'{worst['name']}' deve ultrapassar o limite em R$ {worst['projectedOverrun']:.2f} no ritmo atual"
+            )
+
+        if summary['overBudgetCount'] == 0 and not running:
+            insights.append("Todos os orçamentos estão dentro do limite.")
+
+        return insights
+
     def _generate_cash_flow_insights(
         self, cash_flow: List[Dict], trend: str
     ) -> List[str]:
@@ -531,6 +741,27 @@ Forneça insights curtos e diretos (máximo 1 linha cada).
 
         return insights
 
+    def _generate_cash_flow_projection_insights(self, projection: Dict[str, Any]) -> List[str]:
+        """Generate insights for cash flow projection report"""
+
+        insights = [
+            f"Saldo projetado em {projection['horizonDays']} dias: R$ {projection['endingBalance']:.2f}"
+        ]
+
+        if projection['firstNegativeDate']:
+            insights.append(f"⚠️ O saldo deve ficar negativo em {projection['firstNegativeDate']}")
+        elif projection['lowestBalance'] < projection['startingBalance']:
+            insights.append(
+                f"Menor saldo previsto: R$ {projection['lowestBalance']:.2f} em {projection['lowestBalanceDate']}"
+            )
+
+        if projection['totals']['goalContributions'] > 0:
+            insights.append(
+                f"Inclui R$ {projection['totals']['goalContributions']:.2f} em aportes para metas"
+            )
+
+        return insights
+
     def _parse_period(self, period: str) -> int:
         """Parse period string to days"""
         if period.endswith('d'):
@@ -542,63 +773,38 @@ Forneça insights curtos e diretos (máximo 1 linha cada).
         return 30
 
     def _fetch_transactions(self, user_id: str, days: int) -> List[Dict]:
-        """Fetch transactions from database"""
-        query = f"""
-            SELECT
-                t.id,
-                t.amount,
-                t.type,
-                t.category,
-                t.description,
-                t.date,
-                t.status
-            FROM transactions t
-            WHERE t."userId" = %(user_id)s
-                AND t.date >= NOW() - INTERVAL '{days} days'
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """
-
-        result = self.db.execute_query(query, {"user_id": user_id})
-
-        transactions = []
-        for row in result:
-            transactions.append({
-                "id": row[0],
-                "amount": float(row[1]),
-                "type": row[2],
-                "category": row[3],
-                "description": row[4],
-                "date": row[5].isoformat() if row[5] else None,
-                "status": row[6]
-            })
-
-        return transactions
+        """Fetch COMPLETED transactions of the last `days` days (shared loader)"""
+        df = fetch_transactions([user_id], datetime.now() - timedelta(days=days))
+
+        return [
+            {
+                "id": row.id,
+                "amount": from_cents(row.amountCents),
+                "amountCents": int(row.amountCents),
+                "type": row.type,
+                "category": row.category_name,
+                "description": row.description,
+                "date": row.date.isoformat() if pd.notna(row.date) else None,
+                "status": row.status
+            }
+            for row in df.itertuples(index=False)
+        ]
 
     def _fetch_goals(self, user_id: str) -> List[Dict]:
-        """Fetch goals from database"""
-        query = """
-            SELECT id, name, "targetAmount", "currentAmount", "targetDate",
-                   status, color, "userId", "createdAt"
-            FROM goals
-            WHERE "userId" = %(user_id)s
-            ORDER BY "createdAt" DESC
-        """
-
-        result = self.db.execute_query(query, {"user_id": user_id})
-
-        goals = []
-        for row in result:
-            goals.append({
-                "id": row[0],
-                "name": row[1],
-                "targetAmount": float(row[2]),
-                "currentAmount": float(row[3]),
-                "targetDate": row[4].isoformat() if row[4] else None,
-                "status": row[5],
-                "color": row[6],
-                "userId": row[7],
-                "createdAt": row[8].isoformat() if row[8] else None
-            })
-
-        return goals
+        """Fetch goals from database (shared loader)"""
+        df = fetch_goals([user_id])
+
+        return [
+            {
+                "id": row.id,
+                "name": row.name,
+                "targetAmount": from_cents(row.targetAmountCents),
+                "currentAmount": from_cents(row.currentAmountCents),
+                "targetDate": row.targetDate.isoformat() if pd.notna(row.targetDate) else None,
+                "status": row.status,
+                "color": row.color,
+                "userId": row.userId,
+                "createdAt": row.createdAt.isoformat() if pd.notna(row.createdAt) else None
+            }
+            for row in df.itertuples(index=False)
+        ]
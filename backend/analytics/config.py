@@ -32,6 +32,48 @@ class Settings:
         # JWT (shared with Node.js)
         self.jwt_secret = os.getenv("JWT_SECRET", "your-secret-key")
 
+        # Resource sampler (health/readiness)
+        self.resource_sample_interval = float(os.getenv("RESOURCE_SAMPLE_INTERVAL", "5"))
+        self.resource_history_minutes = int(os.getenv("RESOURCE_HISTORY_MINUTES", "60"))
+
+        # Event-loop blocking detector (instrumentation mode)
+        self.loop_monitor_enabled = os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+        self.loop_block_threshold_ms = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", "100"))
+
+        # Goal Monte Carlo simulation
+        self.goal_simulation_paths = int(os.getenv("GOAL_SIMULATION_PATHS", "10000"))
+        self.goal_simulation_horizon_months = int(os.getenv("GOAL_SIMULATION_HORIZON_MONTHS", "60"))
+
+        # Nightly batch runner
+        self.batch_partitions = int(os.getenv("BATCH_PARTITIONS", "16"))
+        self.batch_workers = int(os.getenv("BATCH_WORKERS", str(os.cpu_count() or 1)))
+
+        # Alert rule evaluation schedule (0 disables the in-process schedule)
+        self.alert_evaluation_interval_minutes = float(os.getenv("ALERT_EVALUATION_INTERVAL_MINUTES", "60"))
+
+        # LISTEN/NOTIFY cache invalidation (changes are batched per user)
+        self.change_listener_enabled = os.getenv("CHANGE_LISTENER_ENABLED", "true").lower() == "true"
+        self.change_debounce_seconds = float(os.getenv("CHANGE_DEBOUNCE_SECONDS", "2"))
+        self.change_max_delay_seconds = float(os.getenv("CHANGE_MAX_DELAY_SECONDS", "30"))
+
+        # Predictive pre-warming of users likely to log in soon (0 interval disables it)
+        self.prewarm_interval_minutes = float(os.getenv("PREWARM_INTERVAL_MINUTES", "15"))
+        self.prewarm_lead_minutes = float(os.getenv("PREWARM_LEAD_MINUTES", "60"))
+        self.prewarm_cpu_budget_seconds = float(os.getenv("PREWARM_CPU_BUDGET_SECONDS", "30"))
+        self.prewarm_max_cpu_percent = float(os.getenv("PREWARM_MAX_CPU_PERCENT", "50"))
+
+        # Platform KPIs (admin): rollups up to this age, otherwise sampled queries
+        self.kpi_rollup_max_age_hours = float(os.getenv("KPI_ROLLUP_MAX_AGE_HOURS", "36"))
+        self.kpi_sample_percent = float(os.getenv("KPI_SAMPLE_PERCENT", "1"))
+        self.kpi_user_sample_size = int(os.getenv("KPI_USER_SAMPLE_SIZE", "2000"))
+
+        # Approximate report mode: rows sampled per (month, type, category) stratum, query budget
+        self.report_sample_per_stratum = int(os.getenv("REPORT_SAMPLE_PER_STRATUM", "40"))
+        self.report_approximate_budget_ms = int(os.getenv("REPORT_APPROXIMATE_BUDGET_MS", "800"))
+
+        # Relative error of the amount quantile sketches (monthly states, category stats)
+        self.sketch_relative_accuracy = float(os.getenv("SKETCH_RELATIVE_ACCURACY", "0.01"))
+
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -8,6 +8,9 @@ from sqlalchemy.pool import QueuePool
 from functools import lru_cache
 import os
 
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
 
 @lru_cache()
 def get_db_connection():
@@ -24,8 +27,8 @@ def get_db_connection():
     engine = create_engine(
         database_url,
         poolclass=QueuePool,
-        pool_size=10,
-        max_overflow=20,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW,
         pool_pre_ping=True,  # Verify connections before using
         echo=os.getenv("NODE_ENV") == "development"
     )
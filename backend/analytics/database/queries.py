@@ -0,0 +1,816 @@
+"""
+Shared queries
+
+One place for the transaction frame layout used by the feature store,
+agents and routers, so every consumer sees the same columns, plus the
+multi-user loaders and snapshot table used by the nightly batch. Money is
+loaded as bigint cents (`amountCents`, ...) with a float view next to it
+(see services.money); transaction enums and category names are
+dictionary-encoded categoricals (see services.encoding).
+"""
+import hashlib
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from analytics.database.connection import get_db_connection
+from analytics.services.encoding import encode_transactions
+from analytics.services.money import with_units
+
+# Advisory lock namespace of save_monthly_aggregates (second key: hashtext(userId))
+MONTHLY_AGGREGATES_LOCK = 50050
+
+
+def fetch_transactions(
+    user_ids: List[str],
+    start: datetime,
+    end: Optional[datetime] = None,
+    updated_after: Optional[datetime] = None,
+    completed_only: bool = True
+) -> pd.DataFrame:
+    """
+    Fetch transactions for one or more users with their category
+
+    Args:
+        user_ids: Users to load (single `= ANY(:user_ids)` query)
+        start: Earliest transaction date
+        end: Latest transaction date (default: no upper bound)
+        updated_after: Only rows created/updated after this instant (deltas)
+        completed_only: Restrict to COMPLETED transactions
+    """
+    engine = get_db_connection()
+
+    conditions = ['t."userId" = ANY(:user_ids)', "t.date >= :start_date"]
+    params: Dict[str, Any] = {"user_ids": list(user_ids), "start_date": start}
+
+    if end is not None:
+        conditions.append("t.date <= :end_date")
+        params["end_date"] = end
+    if updated_after is not None:
+        conditions.append('t."updatedAt" >= :updated_after')
+        params["updated_after"] = updated_after
+    if completed_only:
+        conditions.append("t.status = 'COMPLETED'")
+
+    query = text(f"""
+        SELECT
+            t.id,
+            t."userId",
+            t.description,
+            ROUND(t.amount * 100)::bigint AS "amountCents",
+            t.type,
+            t.date,
+            t.status,
+            t."userCategoryId",
+            t."updatedAt",
+            uc.name as category_name,
+            uc.type as category_type
+        FROM transactions t
+        LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
+        WHERE {' AND '.join(conditions)}
+        ORDER BY t.date DESC
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params=params)
+
+    df['date'] = pd.to_datetime(df['date'])
+    df['updatedAt'] = pd.to_datetime(df['updatedAt'])
+    return encode_transactions(with_units(df, 'amountCents'))
+
+
+def fetch_stratified_sample(
+    user_id: str,
+    start: datetime,
+    end: datetime,
+    strata: pd.DataFrame,
+    per_stratum: int,
+    seed: int = 0,
+    timeout_ms: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Up to `per_stratum` random COMPLETED transactions per (month, type, category)
+
+    `strata` lists the strata to read with their known sizes (month
+    "YYYY-MM", type, category name or "" when uncategorized, size); each
+    row carries its stratum's size as `stratumSize`. A stratum's sample is
+    the first `per_stratum` rows in md5(id) order from a pivot derived
+    from the seed (wrapping around), read from the
+    transactions_stratified_sample_idx index, so only sampled rows are
+    read and a seed always yields the same sample. With `timeout_ms` the
+    query is cancelled past that budget (the driver raises an
+    OperationalError).
+    """
+    columns = ['id', 'type', 'userCategoryId', 'date', 'amountCents', 'month', 'stratumSize', 'category_name']
+    if strata.empty:
+        return with_units(pd.DataFrame(columns=columns).astype({'amountCents': 'int64'}), 'amountCents')
+
+    engine = get_db_connection()
+
+    # Strata are matched by category name; a name may cover several of the user's category ids
+    query = text("""
+        WITH strata AS (
+            SELECT *
+            FROM unnest(CAST(:stratum_ids AS int[]), CAST(:months AS timestamp[]), CAST(:types AS text[]), CAST(:categories AS text[]))
+                AS s(stratum, month_start, type, category)
+        ),
+        parts AS (
+            SELECT s.stratum, s.month_start, s.type, uc.id AS category_id
+            FROM strata s
+            JOIN "user_categories" uc ON uc."userId" = :user_id AND uc.name = s.category
+            UNION ALL
+            SELECT s.stratum, s.month_start, s.type, ''
+            FROM strata s
+            WHERE s.category = ''
+        )
+        SELECT p.stratum, x.id, x.type, x."userCategoryId", x.date, x."amountCents", x.lap, x.hash,
+               uc.name AS category_name
+        FROM parts p
+        CROSS JOIN LATERAL (
+            SELECT *
+            FROM (
+                (
+                    SELECT t.id, t.type::text AS type, t."userCategoryId", t.date,
+                           ROUND(t.amount * 100)::bigint AS "amountCents", 0 AS lap, md5(t.id) AS hash
+                    FROM transactions t
+                    WHERE t."userId" = :user_id
+                        AND COALESCE(t."userCategoryId", '') = p.category_id
+                        AND date_trunc('month', t.date) = p.month_start
+                        AND md5(t.id) >= :pivot
+                        AND t.type = CAST(p.type AS "TransactionType")
+                        AND t.status = 'COMPLETED'
+                        AND t.date >= :start_date
+                        AND t.date <= :end_date
+                    ORDER BY md5(t.id)
+                    LIMIT :per_stratum
+                )
+                UNION ALL
+                (
+                    SELECT t.id, t.type::text AS type, t."userCategoryId", t.date,
+                           ROUND(t.amount * 100)::bigint AS "amountCents", 1 AS lap, md5(t.id) AS hash
+                    FROM transactions t
+                    WHERE t."userId" = :user_id
+                        AND COALESCE(t."userCategoryId", '') = p.category_id
+                        AND date_trunc('month', t.date) = p.month_start
+                        AND md5(t.id) < :pivot
+                        AND t.type = CAST(p.type AS "TransactionType")
+                        AND t.status = 'COMPLETED'
+                        AND t.date >= :start_date
+                        AND t.date <= :end_date
+                    ORDER BY md5(t.id)
+                    LIMIT :per_stratum
+                )
+            ) arc
+            LIMIT :per_stratum
+        ) x
+        LEFT JOIN "user_categories" uc ON x."userCategoryId" = uc.id
+    """)
+    strata = strata.reset_index(drop=True)
+    params = {
+        "user_id": user_id,
+        "start_date": start,
+        "end_date": end,
+        "per_stratum": per_stratum,
+        "pivot": hashlib.md5(str(seed).encode()).hexdigest(),
+        "stratum_ids": list(range(len(strata))),
+        "months": [pd.Period(m, freq='M').start_time.to_pydatetime() for m in strata['month']],
+        "types": strata['type'].astype(str).tolist(),
+        "categories": strata['category'].fillna('').astype(str).tolist()
+    }
+
+    with engine.begin() as conn:
+        if timeout_ms is not None:
+            conn.execute(text(f"SET LOCAL statement_timeout = {int(timeout_ms)}"))
+        df = pd.read_sql(query, conn, params=params)
+
+    # A name covering several category ids was read once per id: keep its first rows along the arc
+    df = df.sort_values(['stratum', 'lap', 'hash']).groupby('stratum', sort=False).head(per_stratum)
+    stratum = df['stratum'].to_numpy(dtype=np.int64)
+    df = df.assign(
+        month=strata['month'].to_numpy()[stratum],
+        stratumSize=strata['size'].to_numpy(dtype=np.int64)[stratum],
+        date=pd.to_datetime(df['date'])
+    )
+    return with_units(df[columns].reset_index(drop=True), 'amountCents')
+
+
+def fetch_transaction_watermark(user_id: str, start: datetime) -> Dict[str, Any]:
+    """
+    Cheap change marker for a user's transactions since `start`
+
+    Latest updatedAt plus row count (all statuses): new or edited rows move
+    the timestamp, deletions change the count.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT MAX(t."updatedAt"), COUNT(*)
+        FROM transactions t
+        WHERE t."userId" = :user_id
+            AND t.date >= :start_date
+    """)
+
+    with engine.connect() as conn:
+        row = conn.execute(query, {"user_id": user_id, "start_date": start}).fetchone()
+
+    return {"updated_at": row[0], "count": int(row[1] or 0)}
+
+
+def fetch_monthly_watermarks(user_id: str, start: datetime, end: datetime) -> Dict[str, Dict[str, Any]]:
+    """
+    fetch_transaction_watermark per calendar month in [start, end]
+
+    Keyed by "YYYY-MM"; months without transactions are absent.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT to_char(date_trunc('month', t.date), 'YYYY-MM'), MAX(t."updatedAt"), COUNT(*)
+        FROM transactions t
+        WHERE t."userId" = :user_id
+            AND t.date >= :start_date
+            AND t.date <= :end_date
+        GROUP BY 1
+    """)
+
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"user_id": user_id, "start_date": start, "end_date": end}).fetchall()
+
+    return {r[0]: {"updated_at": r[1], "count": int(r[2])} for r in rows}
+
+
+def fetch_monthly_aggregates(user_id: str, months: List[str]) -> pd.DataFrame:
+    """Persisted monthly aggregate rows of a user's months ("YYYY-MM")"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT month, type, category, count, "sumCents", "sumSquares", "minCents", "maxCents",
+               sketch, accuracy, "watermarkAt", "watermarkCount"
+        FROM monthly_aggregates
+        WHERE "userId" = :user_id AND month = ANY(:months)
+    """)
+
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn, params={"user_id": user_id, "months": list(months)})
+
+
+def save_monthly_aggregates(user_id: str, months: List[str], rows: List[Dict[str, Any]]):
+    """
+    Replace the persisted aggregates of a user's months
+
+    Each row holds month, type, category, count, sumCents, sumSquares,
+    minCents, maxCents, sketch ({bucket: count}), accuracy, watermarkAt and
+    watermarkCount. Concurrent rebuilds of one user (a request, the
+    prewarmer, the change listener) are serialized by an advisory lock, and
+    rows are upserted on (userId, month, type, category), so a month is
+    never stored twice.
+    """
+    params = [
+        {**row, "id": uuid.uuid4().hex, "user_id": user_id, "sketch": json.dumps(row["sketch"])}
+        for row in rows
+    ]
+
+    engine = get_db_connection()
+    with engine.begin() as conn:
+        conn.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, hashtext(:user_id))"),
+            {"namespace": MONTHLY_AGGREGATES_LOCK, "user_id": user_id}
+        )
+        conn.execute(
+            text('DELETE FROM monthly_aggregates WHERE "userId" = :user_id AND month = ANY(:months)'),
+            {"user_id": user_id, "months": list(months)}
+        )
+        if params:
+            conn.execute(text("""
+                INSERT INTO monthly_aggregates (
+                    id, "userId", month, type, category, count, "sumCents", "sumSquares", "minCents", "maxCents",
+                    sketch, accuracy, "watermarkAt", "watermarkCount", "updatedAt"
+                )
+                VALUES (
+                    :id, :user_id, :month, :type, :category, :count, :sumCents, :sumSquares, :minCents, :maxCents,
+                    CAST(:sketch AS jsonb), :accuracy, :watermarkAt, :watermarkCount, NOW()
+                )
+                ON CONFLICT ("userId", month, type, category) DO UPDATE
+                SET count = EXCLUDED.count,
+                    "sumCents" = EXCLUDED."sumCents",
+                    "sumSquares" = EXCLUDED."sumSquares",
+                    "minCents" = EXCLUDED."minCents",
+                    "maxCents" = EXCLUDED."maxCents",
+                    sketch = EXCLUDED.sketch,
+                    accuracy = EXCLUDED.accuracy,
+                    "watermarkAt" = EXCLUDED."watermarkAt",
+                    "watermarkCount" = EXCLUDED."watermarkCount",
+                    "updatedAt" = EXCLUDED."updatedAt"
+            """), params)
+
+
+def fetch_category_name(user_category_id: str) -> Optional[str]:
+    """Name of a user category"""
+    engine = get_db_connection()
+
+    with engine.connect() as conn:
+        row = conn.execute(
+            text('SELECT name FROM "user_categories" WHERE id = :id'),
+            {"id": user_category_id}
+        ).fetchone()
+
+    return row[0] if row else None
+
+
+def fetch_active_user_ids() -> List[str]:
+    """Ids of all ACTIVE users"""
+    engine = get_db_connection()
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT id FROM users WHERE status = 'ACTIVE' ORDER BY id")).fetchall()
+
+    return [r[0] for r in rows]
+
+
+def fetch_login_activity(since: datetime, hours: List[int]) -> pd.DataFrame:
+    """
+    Session activity of ACTIVE users since `since`
+
+    Session creation and last access times are the activity events. Per
+    user: distinct active days, distinct days with activity in one of
+    `hours` (UTC hour of day) and the latest event. Users never active in
+    those hours are left out.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        WITH events AS (
+            SELECT "userId", "createdAt" AS at FROM sessions WHERE "createdAt" >= :since
+            UNION ALL
+            SELECT "userId", "lastAccessedAt" FROM sessions WHERE "lastAccessedAt" >= :since
+        )
+        SELECT e."userId" AS "userId",
+               COUNT(DISTINCT e.at::date) AS "activeDays",
+               COUNT(DISTINCT e.at::date) FILTER (WHERE EXTRACT(HOUR FROM e.at)::int = ANY(:hours)) AS "windowDays",
+               MAX(e.at) AS "lastSeen"
+        FROM events e
+        JOIN users u ON u.id = e."userId"
+        WHERE u.status = 'ACTIVE'
+        GROUP BY e."userId"
+        HAVING COUNT(DISTINCT e.at::date) FILTER (WHERE EXTRACT(HOUR FROM e.at)::int = ANY(:hours)) > 0
+    """)
+
+    with engine.connect() as conn:
+        return pd.read_sql(query, conn, params={"since": since, "hours": list(hours)})
+
+
+def fetch_goals(user_ids: List[str]) -> pd.DataFrame:
+    """Goals of one or more users, same columns as the goals agent loaders"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT id, name,
+               ROUND("targetAmount" * 100)::bigint AS "targetAmountCents",
+               ROUND("currentAmount" * 100)::bigint AS "currentAmountCents",
+               "targetDate", status, color, "userId", "createdAt"
+        FROM goals
+        WHERE "userId" = ANY(:user_ids)
+        ORDER BY "createdAt" DESC
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids)})
+
+    df['targetDate'] = pd.to_datetime(df['targetDate'])
+    df['createdAt'] = pd.to_datetime(df['createdAt'])
+    return with_units(df, 'targetAmountCents', 'currentAmountCents')
+
+
+def save_snapshots(rows: Iterable[Dict[str, Any]], run_id: str, computed_at: datetime):
+    """
+    Upsert precomputed results into analytics_snapshots
+
+    Each row is {"userId", "kind", "data"}; one row per (userId, kind) is
+    kept, replaced by every run.
+    """
+    params = [
+        {
+            "id": uuid.uuid4().hex,
+            "user_id": row["userId"],
+            "kind": row["kind"],
+            "data": json.dumps(row["data"], default=str),
+            "run_id": run_id,
+            "computed_at": computed_at
+        }
+        for row in rows
+    ]
+    if not params:
+        return
+
+    query = text("""
+        INSERT INTO analytics_snapshots (id, "userId", kind, data, "runId", "computedAt")
+        VALUES (:id, :user_id, :kind, CAST(:data AS jsonb), :run_id, :computed_at)
+        ON CONFLICT ("userId", kind) DO UPDATE
+        SET data = EXCLUDED.data,
+            "runId" = EXCLUDED."runId",
+            "computedAt" = EXCLUDED."computedAt"
+    """)
+
+    engine = get_db_connection()
+    with engine.begin() as conn:
+        conn.execute(query, params)
+
+
+def fetch_snapshots(user_id: str) -> Dict[str, Dict[str, Any]]:
+    """Latest precomputed results for a user, keyed by kind"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT kind, data, "runId", "computedAt"
+        FROM analytics_snapshots
+        WHERE "userId" = :user_id
+    """)
+
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"user_id": user_id}).fetchall()
+
+    return {
+        r[0]: {"data": r[1], "runId": r[2], "computedAt": r[3].isoformat() if r[3] else None}
+        for r in rows
+    }
+
+
+def save_population_distributions(rows: Iterable[Dict[str, Any]], run_id: str, computed_at: datetime):
+    """
+    Replace the population histograms with a run's
+
+    Each row is {"metric", "category", "count", "sketch"}; metrics missing
+    from the run are removed.
+    """
+    params = [
+        {
+            "id": uuid.uuid4().hex,
+            "metric": row["metric"],
+            "category": row["category"],
+            "count": row["count"],
+            "sketch": json.dumps(row["sketch"]),
+            "run_id": run_id,
+            "computed_at": computed_at
+        }
+        for row in rows
+    ]
+
+    engine = get_db_connection()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM population_distributions"))
+        if params:
+            conn.execute(text("""
+                INSERT INTO population_distributions (id, metric, category, count, sketch, "runId", "computedAt")
+                VALUES (:id, :metric, :category, :count, CAST(:sketch AS jsonb), :run_id, :computed_at)
+            """), params)
+
+
+def fetch_population_distributions() -> List[Dict[str, Any]]:
+    """Stored population histograms (aggregates only, no per-user data)"""
+    engine = get_db_connection()
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT metric, category, count, sketch, "computedAt"
+            FROM population_distributions
+        """)).fetchall()
+
+    return [
+        {"metric": r[0], "category": r[1], "count": int(r[2]), "sketch": r[3], "computedAt": r[4]}
+        for r in rows
+    ]
+
+
+def fetch_snapshot_kpis(fresh_after: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Platform totals from the latest nightly insights snapshots
+
+    Sums each user's 30-day summary and takes the median savings rate over
+    users with income. None when that run finished before `fresh_after`.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        WITH latest AS (
+            SELECT "runId", "computedAt"
+            FROM analytics_snapshots
+            WHERE kind = 'insights'
+            ORDER BY "computedAt" DESC
+            LIMIT 1
+        ), summaries AS (
+            SELECT
+                COALESCE((s.data -> 'summary' ->> 'total_income')::numeric, 0) AS income,
+                COALESCE((s.data -> 'summary' ->> 'total_expenses')::numeric, 0) AS expenses,
+                COALESCE((s.data -> 'summary' ->> 'total_transactions')::bigint, 0) AS transactions
+            FROM analytics_snapshots s
+            JOIN latest l ON l."runId" = s."runId"
+            WHERE s.kind = 'insights'
+        )
+        SELECT
+            (SELECT "computedAt" FROM latest),
+            COUNT(*),
+            SUM(income),
+            SUM(expenses),
+            SUM(transactions),
+            COUNT(*) FILTER (WHERE income > 0),
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY (income - expenses) / income * 100)
+                FILTER (WHERE income > 0)
+        FROM summaries
+    """)
+
+    with engine.connect() as conn:
+        row = conn.execute(query).fetchone()
+
+    if row is None or row[0] is None or row[0] < fresh_after:
+        return None
+    return {
+        "computedAt": row[0],
+        "users": int(row[1]),
+        "totalIncome": float(row[2] or 0),
+        "totalExpenses": float(row[3] or 0),
+        "transactions": int(row[4] or 0),
+        "usersWithIncome": int(row[5] or 0),
+        "medianSavingsRate": float(row[6]) if row[6] is not None else None
+    }
+
+
+def fetch_snapshot_category_mix(fresh_after: datetime) -> Optional[Dict[str, Any]]:
+    """
+    Expense totals per category name from the latest nightly category analysis
+
+    Covers the analysis' full months (`months`). None when that run
+    finished before `fresh_after`.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        WITH latest AS (
+            SELECT "runId"
+            FROM analytics_snapshots
+            WHERE kind = 'category_analysis'
+            ORDER BY "computedAt" DESC
+            LIMIT 1
+        )
+        SELECT c ->> 'category', SUM((c ->> 'total')::numeric), COUNT(DISTINCT s."userId")
+        FROM analytics_snapshots s
+        JOIN latest l ON l."runId" = s."runId"
+        CROSS JOIN LATERAL jsonb_array_elements(s.data -> 'categories') c
+        WHERE s.kind = 'category_analysis'
+        GROUP BY 1
+    """)
+
+    with engine.connect() as conn:
+        latest = conn.execute(text("""
+            SELECT "computedAt", data -> 'months'
+            FROM analytics_snapshots
+            WHERE kind = 'category_analysis'
+            ORDER BY "computedAt" DESC
+            LIMIT 1
+        """)).fetchone()
+        if latest is None or latest[0] < fresh_after:
+            return None
+        rows = conn.execute(query).fetchall()
+
+    return {
+        "computedAt": latest[0],
+        "months": latest[1] or [],
+        "categories": {r[0]: float(r[1] or 0) for r in rows},
+        "users": {r[0]: int(r[2]) for r in rows}
+    }
+
+
+def fetch_sampled_transaction_pages(start: datetime, end: datetime, percent: float, seed: int) -> pd.DataFrame:
+    """
+    COMPLETED transactions in [start, end] on a TABLESAMPLE SYSTEM sample of pages
+
+    SYSTEM reads only the sampled heap pages (each kept independently with
+    probability percent/100), so the cost scales with the sample instead
+    of the table. Rows are aggregated per (page, type, category) for the
+    page-cluster estimators in services.platform_kpis.
+    """
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT
+            (t.ctid::text::point)[0]::bigint AS page,
+            t.type::text AS type,
+            uc.name AS category_name,
+            COUNT(*) AS count,
+            SUM(ROUND(t.amount * 100))::bigint AS "amountCents"
+        FROM transactions t TABLESAMPLE SYSTEM (:percent) REPEATABLE (:seed)
+        LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
+        WHERE t.status = 'COMPLETED'
+            AND t.date >= :start_date
+            AND t.date <= :end_date
+        GROUP BY 1, 2, 3
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"percent": percent, "seed": seed, "start_date": start, "end_date": end})
+
+    return with_units(df, 'amountCents')
+
+
+def fetch_sampled_active_user_ids(target: int, seed: int) -> List[str]:
+    """
+    About `target` ACTIVE users, drawn row by row (TABLESAMPLE BERNOULLI)
+
+    The sampling rate comes from the planner's row estimate, so no count
+    over users is needed.
+    """
+    engine = get_db_connection()
+
+    with engine.connect() as conn:
+        estimate = conn.execute(text("SELECT reltuples FROM pg_class WHERE oid = 'users'::regclass")).scalar()
+        percent = 100.0 if not estimate or estimate <= target else target / float(estimate) * 100
+        rows = conn.execute(
+            text("""
+                SELECT id FROM users TABLESAMPLE BERNOULLI (:percent) REPEATABLE (:seed)
+                WHERE status = 'ACTIVE'
+            """),
+            {"percent": percent, "seed": seed}
+        ).fetchall()
+
+    return [r[0] for r in rows]
+
+
+def fetch_user_totals(user_ids: List[str], start: datetime, end: datetime) -> pd.DataFrame:
+    """Per-user COMPLETED income and expense cents in [start, end] (users without transactions are absent)"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT
+            t."userId",
+            SUM(ROUND(t.amount * 100)) FILTER (WHERE t.type = 'INCOME')::bigint AS "incomeCents",
+            SUM(ROUND(t.amount * 100)) FILTER (WHERE t.type = 'EXPENSE')::bigint AS "expenseCents"
+        FROM transactions t
+        WHERE t."userId" = ANY(:user_ids)
+            AND t.status = 'COMPLETED'
+            AND t.date >= :start_date
+            AND t.date <= :end_date
+        GROUP BY 1
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids), "start_date": start, "end_date": end})
+
+    return with_units(df, 'incomeCents', 'expenseCents')
+
+
+def fetch_budgets(user_ids: List[str], active_at: datetime) -> pd.DataFrame:
+    """ACTIVE/EXCEEDED budgets whose period contains `active_at`, with category name"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT
+            b.id,
+            b."userId",
+            b.name,
+            b."userCategoryId",
+            ROUND(b.amount * 100)::bigint AS "amountCents",
+            b.period,
+            b."startDate",
+            b."endDate",
+            b.status,
+            uc.name as category_name
+        FROM budgets b
+        LEFT JOIN "user_categories" uc ON b."userCategoryId" = uc.id
+        WHERE b."userId" = ANY(:user_ids)
+            AND b.status IN ('ACTIVE', 'EXCEEDED')
+            AND b."startDate" <= :active_at
+            AND b."endDate" >= :active_at
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids), "active_at": active_at})
+
+    df['startDate'] = pd.to_datetime(df['startDate'])
+    df['endDate'] = pd.to_datetime(df['endDate'])
+    return with_units(df, 'amountCents')
+
+
+def fetch_budget_periods(user_ids: List[str], start: datetime, end: datetime) -> pd.DataFrame:
+    """Non-cancelled budgets whose period overlaps [start, end], with category name"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT
+            b.id,
+            b."userId",
+            b.name,
+            b."userCategoryId",
+            ROUND(b.amount * 100)::bigint AS "amountCents",
+            b.period,
+            b."startDate",
+            b."endDate",
+            b.status,
+            uc.name as category_name
+        FROM budgets b
+        LEFT JOIN "user_categories" uc ON b."userCategoryId" = uc.id
+        WHERE b."userId" = ANY(:user_ids)
+            AND b.status != 'CANCELLED'
+            AND b."startDate" <= :end_date
+            AND b."endDate" >= :start_date
+        ORDER BY b."startDate"
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids), "start_date": start, "end_date": end})
+
+    df['startDate'] = pd.to_datetime(df['startDate'])
+    df['endDate'] = pd.to_datetime(df['endDate'])
+    return with_units(df, 'amountCents')
+
+
+def fetch_accounts(user_ids: List[str]) -> pd.DataFrame:
+    """ACTIVE accounts of one or more users"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT id, "userId", name, type, ROUND(balance * 100)::bigint AS "balanceCents", currency
+        FROM accounts
+        WHERE "userId" = ANY(:user_ids)
+            AND status = 'ACTIVE'
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids)})
+
+    return with_units(df, 'balanceCents')
+
+
+def fetch_alert_configs(user_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Per-user alert rule overrides stored in users.metadata.alertConfig"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT id, metadata->'alertConfig'
+        FROM users
+        WHERE id = ANY(:user_ids)
+            AND metadata ? 'alertConfig'
+    """)
+
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"user_ids": list(user_ids)}).fetchall()
+
+    return {r[0]: r[1] for r in rows if isinstance(r[1], dict)}
+
+
+def fetch_alert_keys(user_ids: List[str], since: datetime) -> pd.DataFrame:
+    """(userId, type, dedupKey, triggeredAt) of alerts raised since `since`"""
+    engine = get_db_connection()
+
+    query = text("""
+        SELECT "userId", type::text as type, data->'metadata'->>'dedupKey' as "dedupKey", "triggeredAt"
+        FROM alerts
+        WHERE "userId" = ANY(:user_ids)
+            AND "triggeredAt" >= :since
+            AND data->'metadata' ? 'dedupKey'
+    """)
+
+    with engine.connect() as conn:
+        df = pd.read_sql(query, conn, params={"user_ids": list(user_ids), "since": since})
+
+    df['triggeredAt'] = pd.to_datetime(df['triggeredAt'])
+    return df
+
+
+def insert_alerts(alerts: List[Dict[str, Any]]):
+    """Bulk insert alerts (dicts with the alerts table columns)"""
+    if not alerts:
+        return
+
+    now = datetime.now()
+    params = [
+        {
+            **alert,
+            "id": str(uuid.uuid4()),
+            "data": json.dumps(alert["data"], default=str),
+            "rule": json.dumps(alert["rule"], default=str),
+            "channels": json.dumps(alert["channels"]),
+            "now": now
+        }
+        for alert in alerts
+    ]
+
+    query = text("""
+        INSERT INTO alerts (
+            id, "userId", type, severity, status, title, message, description,
+            data, rule, "actionUrl", "actionText", "triggeredAt", "expiresAt",
+            channels, "createdAt", "updatedAt"
+        )
+        VALUES (
+            :id, :userId, CAST(:type AS "AlertType"), CAST(:severity AS "AlertSeverity"), 'ACTIVE',
+            :title, :message, :description, CAST(:data AS jsonb), CAST(:rule AS jsonb),
+            :actionUrl, :actionText, :now, :expiresAt, CAST(:channels AS jsonb), :now, :now
+        )
+    """)
+
+    engine = get_db_connection()
+    with engine.begin() as conn:
+        conn.execute(query, params)
@@ -23,7 +23,13 @@ import uvicorn
 from loguru import logger
 
 from analytics.config import get_settings
-from analytics.routers import reports, insights, health, goals
+from analytics.routers import reports, insights, health, goals, dashboard, admin
+from analytics.services.resource_sampler import get_resource_sampler
+from analytics.services.loop_monitor import get_loop_monitor
+from analytics.services.alert_evaluator import get_alert_evaluator
+from analytics.services.change_listener import get_change_listener
+from analytics.services.push_hub import get_push_hub
+from analytics.services.prewarmer import get_prewarmer
 
 # Initialize settings
 settings = get_settings()
@@ -66,11 +72,21 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+# Visit tracking for the prewarmer hit rate (before the request touches the caches)
+@app.middleware("http")
+async def track_user_visits(request: Request, call_next):
+    user_id = request.query_params.get("user_id")
+    if user_id:
+        get_prewarmer().record_request(user_id)
+    return await call_next(request)
+
 # Register routers
 app.include_router(health.router, prefix="/analytics", tags=["Health"])
 app.include_router(reports.router, prefix="/analytics/reports", tags=["Reports"])
 app.include_router(insights.router, prefix="/analytics/insights", tags=["Insights"])
 app.include_router(goals.router, prefix="/analytics/goals", tags=["Goals AI"])
+app.include_router(dashboard.router, prefix="/analytics/dashboard", tags=["Dashboard"])
+app.include_router(admin.router, prefix="/analytics/admin", tags=["Admin"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -78,10 +94,23 @@ async def startup_event():
     logger.info(f"🌍 Environment: {settings.environment}")
     logger.info(f"🔧 Debug mode: {settings.debug}")
     logger.info(f"🚀 Server running on {settings.host}:{settings.port}")
+    await get_resource_sampler().start()
+    if settings.loop_monitor_enabled:
+        await get_loop_monitor().start()
+    await get_alert_evaluator().start()
+    if settings.change_listener_enabled:
+        get_change_listener().subscribe(get_push_hub().on_change)
+        await get_change_listener().start()
+    await get_prewarmer().start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("🛑 Analytics Service shutting down...")
+    await get_resource_sampler().stop()
+    await get_loop_monitor().stop()
+    await get_alert_evaluator().stop()
+    await get_change_listener().stop()
+    await get_prewarmer().stop()
 
 # Root endpoint
 @app.get("/analytics")
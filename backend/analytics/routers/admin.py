@@ -0,0 +1,74 @@
+"""
+Admin Router - Platform-wide KPIs
+
+Service-wide volume, median savings rate and category mix for operational
+dashboards, served from the nightly rollups or from sampled queries (see
+services.platform_kpis); never from a full scan of transactions. Requires
+an ADMIN access token.
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from loguru import logger
+
+from analytics.config import get_settings
+from analytics.routers.params import require_admin
+from analytics.services.platform_kpis import SOURCES, PlatformKPIs
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+# Sampled queries stay cheap: at most this share of transaction pages
+MAX_SAMPLE_PERCENT = 10.0
+
+
+def kpi_params(
+    period_days: Optional[int] = Query(None, ge=1, le=3650, description="Window in days (default: the rollup windows)"),
+    source: str = Query("auto", description="auto (rollups when fresh) or sample"),
+    sample_percent: Optional[float] = Query(None, gt=0, le=MAX_SAMPLE_PERCENT, description="Share of pages to sample")
+) -> Dict[str, Any]:
+    if source not in SOURCES:
+        raise HTTPException(status_code=400, detail=f"source must be one of {', '.join(SOURCES)}")
+    return {"period_days": period_days, "source": source, "sample_percent": sample_percent}
+
+
+async def _compute(name: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    settings = get_settings()
+    kpis = PlatformKPIs(
+        params["sample_percent"] or settings.kpi_sample_percent,
+        settings.kpi_user_sample_size,
+        settings.kpi_rollup_max_age_hours
+    )
+    compute: Callable[..., Dict[str, Any]] = getattr(kpis, name)
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, compute, params["period_days"], params["source"])
+    except Exception as e:
+        logger.error(f"Error computing platform KPI {name}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", **result, "generated_at": datetime.utcnow().isoformat()}
+
+
+@router.get("/kpis")
+async def get_kpis(params: Dict[str, Any] = Depends(kpi_params)):
+    """Volume, median savings rate and category mix in one payload"""
+    return await _compute("overview", params)
+
+
+@router.get("/kpis/volume")
+async def get_volume(params: Dict[str, Any] = Depends(kpi_params)):
+    """Total income, expenses and transaction count across all users"""
+    return await _compute("volume", params)
+
+
+@router.get("/kpis/savings-rate")
+async def get_savings_rate(params: Dict[str, Any] = Depends(kpi_params)):
+    """Median per-user savings rate across users with income"""
+    return await _compute("savings_rate", params)
+
+
+@router.get("/kpis/category-mix")
+async def get_category_mix(params: Dict[str, Any] = Depends(kpi_params)):
+    """Expense share per category across all users"""
+    return await _compute("category_mix", params)
@@ -0,0 +1,129 @@
+"""
+Dashboard Router - One-shot dashboard snapshot
+
+Replaces the dashboard's separate calls (financial summary, insights,
+anomalies, savings opportunities, goals dashboard) with one request that
+loads the user's transactions once and computes every section from slices
+of the shared frame, in parallel worker threads.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Tuple
+
+import pandas as pd
+from fastapi import APIRouter, HTTPException, Query
+from loguru import logger
+
+from analytics.agents.financial_advisor import FinancialAdvisorAgent
+from analytics.agents.goals_advisor import GoalsAdvisorAgent
+from analytics.database.queries import fetch_goals
+from analytics.services.anomaly_stream import LOOKBACK_DAYS, get_anomaly_stream
+from analytics.services.budgets import load_budget_usage
+from analytics.services.feature_store import get_feature_store
+from analytics.services.report_calculator import ReportCalculator
+
+router = APIRouter()
+
+# Savings opportunities and goal capacity read 3 months, anomalies LOOKBACK_DAYS
+BASE_WINDOW_DAYS = max(90, LOOKBACK_DAYS)
+SAVINGS_DAYS = 90
+
+
+def _since(frame: pd.DataFrame, now: datetime, days: int) -> pd.DataFrame:
+    return frame[frame['date'] >= now - timedelta(days=days)]
+
+
+def _timed(name: str, section: Callable[[], Any]) -> Tuple[str, Any, float]:
+    started = time.perf_counter()
+    try:
+        result = section()
+    except Exception as e:
+        logger.error(f"Error computing dashboard section {name}: {e}")
+        result = {"error": str(e)}
+    return name, result, round((time.perf_counter() - started) * 1000, 2)
+
+
+@router.get("/")
+async def get_dashboard(
+    user_id: str = Query(..., description="User ID"),
+    period_days: int = Query(30, description="Days covered by the summary and insights"),
+    sensitivity: float = Query(2.0, description="Anomaly detection sensitivity (1-3)")
+):
+    """
+    Financial summary, insights, anomalies, savings opportunities and goals
+    dashboard in one payload
+
+    Same section payloads as the individual endpoints, plus the time spent
+    loading and computing each section (`timings_ms`).
+    """
+    try:
+        started = time.perf_counter()
+        now = datetime.now()
+        advisor = FinancialAdvisorAgent()
+        goals_agent = GoalsAdvisorAgent()
+        calculator = ReportCalculator()
+        store = get_feature_store()
+
+        # One scan: the widest window any section reads
+        window_days = max(BASE_WINDOW_DAYS, period_days)
+        frame, window_features = await store.get_window(user_id, window_days)
+        # Goal capacity uses the 3-month features, as the goals endpoints do
+        goal_features = (
+            window_features if window_days == SAVINGS_DAYS
+            else store.compute_features(_since(frame, now, SAVINGS_DAYS), SAVINGS_DAYS, user_id=user_id)
+        )
+        timings = {"load": round((time.perf_counter() - started) * 1000, 2)}
+        period_frame = _since(frame, now, period_days)
+
+        def summary():
+            period = {"start": (now - timedelta(days=period_days)).isoformat(), "end": now.isoformat()}
+            if period_frame.empty:
+                return {"period": period, **calculator.empty_financial_summary()}
+            return {"period": period, **calculator.financial_summary(period_frame)}
+
+        def insights():
+            features = store.compute_features(period_frame, period_days, user_id=user_id)
+            return advisor.build_insights(features, period_days, load_budget_usage([user_id], now))
+
+        def anomalies():
+            found = get_anomaly_stream().stored_anomalies(user_id, sensitivity)
+            if found is None:
+                found = advisor.seed_anomalies(user_id, _since(frame, now, LOOKBACK_DAYS), sensitivity)
+            return {"anomalies": found, "count": len(found)}
+
+        def savings_opportunities():
+            opportunities = advisor.build_savings_opportunities(_since(frame, now, SAVINGS_DAYS))
+            return {
+                "opportunities": opportunities,
+                "potential_savings": sum(o.get("estimated_savings", 0) for o in opportunities)
+            }
+
+        def goals():
+            rows = fetch_goals([user_id]).to_dict('records')
+            return goals_agent.build_goals_dashboard(user_id, rows, goal_features['availableMonthly'])
+
+        sections = {
+            "summary": summary,
+            "insights": insights,
+            "anomalies": anomalies,
+            "savings_opportunities": savings_opportunities,
+            "goals": goals
+        }
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(None, _timed, name, section) for name, section in sections.items()
+        ))
+
+        payload: Dict[str, Any] = {"status": "success", "user_id": user_id, "period_days": period_days}
+        for name, result, elapsed in results:
+            payload[name] = result
+            timings[name] = elapsed
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        payload["timings_ms"] = timings
+        payload["generated_at"] = datetime.utcnow().isoformat()
+        return payload
+
+    except Exception as e:
+        logger.error(f"Error building dashboard: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -3,9 +3,9 @@ Goals Analytics Router - AI-Powered Goal Insights
 
 Provides intelligent endpoints for financial goal management.
 """
-from datetime import datetime
 from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field
 from loguru import logger
 
 from analytics.agents.goals_advisor import GoalsAdvisorAgent
@@ -14,6 +14,14 @@ router = APIRouter()
 goals_agent = GoalsAdvisorAgent()
 
 
+class ScenarioGridRequest(BaseModel):
+    """What-if grid axes (omitted axes collapse to a single neutral value)"""
+    contributions: Optional[List[float]] = Field(None, description="Monthly contribution amounts")
+    deadline_shifts: Optional[List[int]] = Field(None, description="Deadline shifts in months")
+    target_changes: Optional[List[float]] = Field(None, description="Target changes in percent")
+    expense_cuts: Optional[Dict[str, List[float]]] = Field(None, description="Cut percentages per category")
+
+
 @router.get("/prediction/{goal_id}")
 async def predict_goal_achievement(
     goal_id: str,
@@ -162,53 +170,71 @@ async def get_goals_dashboard(
     - Key insights and recommendations
     """
     try:
-        # Get at-risk goals
-        at_risk = await goals_agent.detect_at_risk_goals(user_id=user_id)
+        return await goals_agent.goals_dashboard(user_id=user_id)
 
-        # Get all user goals for analysis
-        goals = await goals_agent._get_user_goals(user_id=user_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in goals dashboard endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        active_goals = [g for g in goals if g['status'] == 'ACTIVE']
 
-        # Calculate aggregated metrics
-        total_target = sum(float(g['targetAmount']) for g in active_goals)
-        total_current = sum(float(g['currentAmount']) for g in active_goals)
-        overall_progress = (total_current / total_target * 100) if total_target > 0 else 0
+@router.get("/batch")
+async def get_goals_batch_analysis(
+    user_id: str = Query(..., description="User ID")
+):
+    """
+    Predictions, contribution plans and optimizations for all active goals
 
-        # Generate insights
-        insights = []
+    Loads the user's goals and financial capacity once and evaluates every
+    goal in a single pass. Returns a map keyed by goal id with the same
+    prediction/financial/plans/optimization blocks as the per-goal endpoints.
+    """
+    try:
+        result = await goals_agent.analyze_all_goals(user_id=user_id)
 
-        if len(at_risk) > 0:
-            insights.append({
-                "type": "warning",
-                "message": f"Você tem {len(at_risk)} meta(s) em risco",
-                "priority": "high"
-            })
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
 
-        if len(active_goals) > 3:
-            insights.append({
-                "type": "recommendation",
-                "message": "Muitas metas ativas. Considere focar nas mais importantes.",
-                "priority": "medium"
-            })
+        return result
 
-        return {
-            "summary": {
-                "totalGoals": len(goals),
-                "activeGoals": len(active_goals),
-                "completedGoals": len([g for g in goals if g['status'] == 'COMPLETED']),
-                "atRiskCount": len(at_risk),
-                "totalTarget": round(total_target, 2),
-                "totalCurrent": round(total_current, 2),
-                "overallProgress": round(overall_progress, 1)
-            },
-            "atRiskGoals": at_risk[:3],  # Top 3 at-risk
-            "insights": insights,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in goals batch endpoint: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/scenarios")
+async def evaluate_goal_scenarios(
+    grid: ScenarioGridRequest,
+    user_id: str = Query(..., description="User ID")
+):
+    """
+    What-if scenario grid for contribution planning
+
+    Evaluates every combination of contribution amount, per-category
+    expense cut, target change and deadline shift for all active goals in
+    one vectorized call. Returns the completion-month surface so sliders
+    can be rendered client-side without a request per position.
+    """
+    try:
+        result = await goals_agent.evaluate_scenario_grid(
+            user_id=user_id,
+            contributions=grid.contributions,
+            deadline_shifts=grid.deadline_shifts,
+            target_changes=grid.target_changes,
+            expense_cuts=grid.expense_cuts
+        )
+
+        if "error" in result:
+            # Only an invalid grid is the caller's fault
+            raise HTTPException(status_code=400 if result.get("invalid") else 500, detail=result["error"])
+
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in goals dashboard endpoint: {e}")
+        logger.error(f"Error in scenarios endpoint: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,30 +1,117 @@
 """
 Health Check Router
 """
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
 from datetime import datetime
-import psutil
-import os
+
+from analytics.services.resource_sampler import get_resource_sampler
+from analytics.services.loop_monitor import get_loop_monitor
+from analytics.services.change_listener import get_change_listener
+from analytics.services.push_hub import get_push_hub
+from analytics.services.prewarmer import get_prewarmer
 
 router = APIRouter()
 
 
 @router.get("/health")
 async def health_check():
-    """Health check endpoint for analytics service"""
+    """
+    Health check endpoint for analytics service
+
+    Serves the latest background sample, so it never touches psutil or
+    the database on the request path.
+    """
+    sampler = get_resource_sampler()
+    sample = sampler.latest()
+
+    if sample is None:
+        return {
+            "status": "starting",
+            "service": "analytics",
+            "timestamp": datetime.utcnow().isoformat()
+        }
+
     return {
         "status": "healthy",
         "service": "analytics",
         "timestamp": datetime.utcnow().isoformat(),
-        "uptime": psutil.Process(os.getpid()).create_time(),
-        "memory": {
-            "used_mb": psutil.Process(os.getpid()).memory_info().rss / 1024 / 1024,
-            "percent": psutil.Process(os.getpid()).memory_percent()
-        },
-        "cpu_percent": psutil.Process(os.getpid()).cpu_percent()
+        "sampled_at": sample["timestamp"],
+        "uptime": sample["uptime_seconds"],
+        "memory": sample["memory"],
+        "cpu_percent": sample["cpu_percent"],
+        "open_fds": sample["open_fds"],
+        "threads": sample["threads"],
+        "loop_lag_ms": sample["loop_lag_ms"],
+        "db_pool": sample["db_pool"],
+        "executor_queue": sample["executor_queue"],
+        "event_loop": get_loop_monitor().stats(),
+        "change_listener": get_change_listener().stats(),
+        "push_hub": get_push_hub().stats(),
+        "prewarmer": get_prewarmer().stats(),
+        "sampler": {
+            "running": sampler.running,
+            "interval_seconds": sampler.interval
+        }
     }
 
 
+@router.get("/health/history")
+async def health_history(
+    minutes: int = Query(15, ge=1, le=1440, description="Minutes of history to return")
+):
+    """Resource samples recorded during the last N minutes (oldest first)"""
+    samples = get_resource_sampler().history(minutes)
+
+    return {
+        "minutes": minutes,
+        "count": len(samples),
+        "samples": samples
+    }
+
+
+@router.get("/health/blocking")
+async def blocking_calls(
+    limit: int = Query(20, ge=1, le=100, description="Number of events to return")
+):
+    """
+    Recent event-loop stalls with the stack and router/agent function
+    responsible (requires LOOP_MONITOR_ENABLED=true)
+    """
+    monitor = get_loop_monitor()
+
+    return {
+        "stats": monitor.stats(),
+        "events": monitor.events(limit)
+    }
+
+
+@router.get("/ready")
+async def readiness():
+    """
+    Readiness probe
+
+    Not ready until the sampler is running, or while the DB pool has
+    no free connections left.
+    """
+    sampler = get_resource_sampler()
+    sample = sampler.latest()
+    checks = {
+        "sampler": sampler.running and sample is not None,
+        "db_pool": True
+    }
+
+    pool = sample.get("db_pool") if sample else None
+    if pool:
+        checks["db_pool"] = pool["checked_out"] < pool["capacity"]
+
+    ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "checks": checks}
+    )
+
+
 @router.get("/status")
 async def status():
     """Detailed status of analytics service"""
@@ -3,16 +3,35 @@ Insights Router - AI-Powered Financial Insights
 
 Uses LangChain + OpenAI to generate intelligent financial advice.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from typing import Optional
+from datetime import datetime, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from typing import List, Optional
 from loguru import logger
+from pydantic import BaseModel, Field
 
 from analytics.agents.financial_advisor import FinancialAdvisorAgent
 from analytics.database.connection import get_db_connection
+from analytics.database.queries import fetch_category_name, fetch_snapshots, fetch_transactions
+from analytics.routers.params import user_id_list
+from analytics.services.anomaly_stream import get_anomaly_stream
+from analytics.services.budgets import load_budget_usage
+from analytics.services.feature_store import get_feature_store
+from analytics.services.push_hub import get_push_hub
 
 router = APIRouter()
 
 
+class TransactionEvent(BaseModel):
+    """A created transaction, as sent by the Node backend"""
+    transaction_id: str
+    user_id: str
+    amount: float
+    type: str = Field(..., description="INCOME, EXPENSE or TRANSFER")
+    date: datetime
+    category: Optional[str] = Field(None, description="Category name")
+    user_category_id: Optional[str] = Field(None, description="Used to look up the name when category is omitted")
+
+
 @router.get("/")
 async def get_insights(
     user_id: str = Query(..., description="User ID"),
@@ -43,6 +62,53 @@ async def get_insights(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/multi")
+async def get_multi_user_insights(
+    user_ids: List[str] = Depends(user_id_list),
+    period_days: int = Query(30, description="Number of days to analyze")
+):
+    """
+    Insights for several users (household, advisor clients) and combined
+
+    Loads all users' transactions and budgets once and computes the
+    feature vectors with grouped operations; `combined` treats the users
+    as one household.
+    """
+    try:
+        now = datetime.now()
+        start = now - timedelta(days=period_days)
+        store = get_feature_store()
+        agent = FinancialAdvisorAgent()
+
+        frame = fetch_transactions(user_ids, start)
+        budget_usage = load_budget_usage(user_ids, now, frame, start)
+        budgets_by_user = dict(tuple(budget_usage.groupby('userId')))
+        features = store.compute_features_batch(frame, period_days)
+
+        no_data = frame.iloc[0:0]
+        by_user = {
+            user_id: agent.build_insights(
+                features.get(user_id) or store.compute_features(no_data, period_days, user_id=user_id),
+                period_days,
+                budgets_by_user.get(user_id)
+            )
+            for user_id in user_ids
+        }
+
+        return {
+            "status": "success",
+            "user_ids": user_ids,
+            "combined": agent.build_insights(store.compute_features(frame, period_days), period_days, budget_usage),
+            "by_user": by_user,
+            "period_days": period_days,
+            "generated_at": datetime.utcnow().isoformat()
+        }
+
+    except Exception as e:
+        logger.error(f"Error generating multi-user insights: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/savings-opportunities")
 async def get_savings_opportunities(
     user_id: str = Query(..., description="User ID")
@@ -86,3 +152,92 @@ async def detect_anomalies(
     except Exception as e:
         logger.error(f"Error detecting anomalies: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/anomalies/ingest")
+async def ingest_transaction(event: TransactionEvent):
+    """
+    Score a new transaction against its category's running statistics
+
+    Call when a transaction is created: the statistics are updated in O(1)
+    and the score is stored, so /anomalies only reads stored scores.
+    Idempotent per transaction_id.
+    """
+    try:
+        category = event.category
+        if category is None and event.user_category_id:
+            category = fetch_category_name(event.user_category_id)
+
+        score = get_anomaly_stream().ingest({
+            "id": event.transaction_id,
+            "userId": event.user_id,
+            "amount": event.amount,
+            "type": event.type,
+            "date": event.date,
+            "category": category
+        })
+
+        return {
+            "status": "success",
+            "score": score,
+            "is_anomaly": score["severity"] is not None
+        }
+
+    except Exception as e:
+        logger.error(f"Error ingesting transaction: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.websocket("/ws")
+async def push_updates(
+    websocket: WebSocket,
+    user_id: str = Query(..., description="User ID")
+):
+    """
+    Push insights, anomalies and goal risk as they change
+
+    Sends the current state on connect, then a `{"type", "data",
+    "generated_at"}` message per topic whenever the user's data changes
+    the topic's content. Messages from the client are ignored (keep-alive).
+    """
+    hub = get_push_hub()
+    await websocket.accept()
+    try:
+        await hub.connect(user_id, websocket)
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(user_id, websocket)
+
+
+@router.get("/nightly")
+async def get_nightly_snapshot(
+    user_id: str = Query(..., description="User ID")
+):
+    """
+    Insights, anomalies, at-risk goals, the 365-day cash-flow projection and
+    the category analysis (with user segment) precomputed by the nightly batch
+
+    Reads stored results only; use the other endpoints for live analysis.
+    """
+    try:
+        snapshots = fetch_snapshots(user_id)
+    except Exception as e:
+        logger.error(f"Error reading nightly snapshot: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not snapshots:
+        raise HTTPException(status_code=404, detail="No nightly analytics for this user yet")
+
+    return {
+        "status": "success",
+        "insights": snapshots.get("insights", {}).get("data"),
+        "anomalies": snapshots.get("anomalies", {}).get("data", []),
+        "at_risk_goals": snapshots.get("at_risk_goals", {}).get("data", []),
+        "cash_flow_projection": snapshots.get("cash_flow_projection", {}).get("data"),
+        "category_analysis": snapshots.get("category_analysis", {}).get("data"),
+        "computed_at": max(s["computedAt"] or "" for s in snapshots.values()) or None,
+        "run_id": next(iter(snapshots.values()))["runId"]
+    }
@@ -0,0 +1,73 @@
+"""
+Shared request dependencies: multi-user query parameters and the admin guard
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Dict, List
+
+from fastapi import Header, HTTPException, Query
+
+from analytics.config import get_settings
+
+# One request serves a household or an advisor's client list, not the whole user base
+MAX_USERS_PER_REQUEST = 100
+# Defaults of config.py and .env.example: anyone could sign tokens with these
+PLACEHOLDER_SECRETS = ("", "your-secret-key", "your-secret-key-here")
+
+
+def user_id_list(
+    user_ids: List[str] = Query(..., description="User IDs (repeat the parameter or comma-separate)")
+) -> List[str]:
+    """Distinct user ids in request order"""
+    ids = list(dict.fromkeys(u.strip() for value in user_ids for u in value.split(",") if u.strip()))
+    if not ids:
+        raise HTTPException(status_code=400, detail="user_ids must not be empty")
+    if len(ids) > MAX_USERS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_USERS_PER_REQUEST} user_ids per request")
+    return ids
+
+
+def _b64decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+def require_admin(authorization: str = Header("", description="Bearer access token issued by the Node.js backend")) -> Dict[str, Any]:
+    """
+    Claims of a valid ADMIN access token
+
+    Tokens are the backend's HS256 JWTs (shared JWT_SECRET); the signature,
+    expiry (required) and role are checked. Without a real JWT_SECRET every
+    admin request is refused, since the placeholder secrets are public.
+    """
+    secret = get_settings().jwt_secret
+    if secret in PLACEHOLDER_SECRETS:
+        raise HTTPException(status_code=503, detail="JWT_SECRET is not configured")
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or token.count(".") != 2:
+        raise HTTPException(status_code=401, detail="Missing bearer token")
+
+    header, payload, signature = token.split(".")
+    expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(), hashlib.sha256).digest()
+    try:
+        header_claims = json.loads(_b64decode(header))
+        valid = (
+            isinstance(header_claims, dict)
+            and header_claims.get("alg") == "HS256"
+            and hmac.compare_digest(expected, _b64decode(signature))
+        )
+        claims = json.loads(_b64decode(payload)) if valid else {}
+    except (ValueError, TypeError):
+        valid, claims = False, {}
+    if not valid or not isinstance(claims, dict):
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+    expires = claims.get("exp")
+    if isinstance(expires, bool) or not isinstance(expires, (int, float)) or expires < time.time():
+        raise HTTPException(status_code=401, detail="Invalid or expired token")
+    if claims.get("role") != "ADMIN":
+        raise HTTPException(status_code=403, detail="Admin role required")
+    return claims
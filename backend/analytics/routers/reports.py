@@ -4,126 +4,175 @@ Reports Router - Advanced Analytics and Reporting
 Migrated from backend/src/services/ReportService.ts
 Provides high-performance financial analytics using Python/Pandas.
 """
+import asyncio
+import json
+import time
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta
-from typing import Optional, List
+from typing import Any, Awaitable, Callable, Dict, Optional, List
 import pandas as pd
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
 from loguru import logger
 
 from analytics.config import get_settings
-from analytics.database.connection import get_db_connection
+from analytics.database.queries import fetch_stratified_sample, fetch_transactions
+from analytics.agents.report_analyzer import ReportAnalyzer
+from analytics.services.aggregates import get_monthly_state_store
+from analytics.services.cash_flow import HORIZONS
+from analytics.services.category_analysis import PERIOD_MONTHS, get_category_analyzer
+from analytics.services.encoding import type_mask
+from analytics.services.money import from_cents, total
 from analytics.services.report_calculator import ReportCalculator
+from analytics.services.feature_store import get_feature_store
+from analytics.services.stratified import sample_info, stratum_sizes
+from analytics.routers.params import user_id_list
 
 router = APIRouter()
 
+REPORT_MODES = ("exact", "approximate")
+REPORT_PERIODS = {"7d": 7, "30d": 30, "90d": 90, "1y": 365, "2y": 730, "5y": 1825}
+
+
+def _approximate_sample(user_id: str, start: datetime, end: datetime) -> Optional[pd.DataFrame]:
+    """
+    Stratified sample of a user's period within the latency budget (None when the budget ran out)
+
+    Stratum sizes come from the period's monthly states (persisted per
+    closed month); the budget applies to reading the sampled rows.
+    """
+    settings = get_settings()
+    strata = stratum_sizes(get_monthly_state_store().load(user_id, start, end))
+    try:
+        return fetch_stratified_sample(
+            user_id, start, end, strata, settings.report_sample_per_stratum,
+            timeout_ms=settings.report_approximate_budget_ms
+        )
+    except OperationalError as e:
+        logger.warning(f"Approximate report for {user_id} exceeded the latency budget: {e}")
+        return None
+
+
+def _progressive(estimate: Dict[str, Any], exact: Callable[[], Awaitable[Dict[str, Any]]]) -> StreamingResponse:
+    """NDJSON stream: the estimate right away, then the exact result when it is ready"""
+    async def lines():
+        yield json.dumps(jsonable_encoder({"stage": "estimate", **estimate})) + "\n"
+        try:
+            result = {"stage": "exact", **(await exact())}
+        except Exception as e:
+            logger.error(f"Error computing exact report: {e}")
+            result = {"stage": "exact", "error": str(e)}
+        yield json.dumps(jsonable_encoder(result)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+def _check_mode(mode: str, stream: bool):
+    if mode not in REPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(REPORT_MODES)}")
+    if stream and mode != "approximate":
+        raise HTTPException(status_code=400, detail="stream requires mode=approximate")
+
 
 @router.get("/financial-summary")
 async def get_financial_summary(
     user_id: str = Query(..., description="User ID"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    mode: str = Query("exact", description="exact, or approximate (stratified sample with 95% intervals)"),
+    stream: bool = Query(False, description="With mode=approximate: stream the estimate, then the exact result (NDJSON)")
 ):
     """
     Get comprehensive financial summary with income, expenses, and trends
 
     Performance: ~10x faster than Node.js version using Pandas
     """
+    _check_mode(mode, stream)
     try:
         calculator = ReportCalculator()
 
         # Parse dates
         start = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=30)
         end = datetime.fromisoformat(end_date) if end_date else datetime.now()
+        # Resolved bounds, so every branch reports the same period shape
+        period = {"start": start.isoformat(), "end": end.isoformat()}
 
-        # Get data from database
-        engine = get_db_connection()
-
-        query = text("""
-            SELECT
-                t.id,
-                t."userId",
-                t.description,
-                t.amount,
-                t.type,
-                t.date,
-                t."categoryId",
-                t."userCategoryId",
-                uc.name as category_name,
-                uc.type as category_type
-            FROM transactions t
-            LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
-            WHERE t."userId" = :user_id
-                AND t.date BETWEEN :start_date AND :end_date
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={
-                "user_id": user_id,
-                "start_date": start,
-                "end_date": end
-            })
+        def exact() -> Dict[str, Any]:
+            # Get data from database (amounts as exact int64 cents)
+            df = fetch_transactions([user_id], start, end)
 
-        if df.empty:
-            return {
-                "period": {"start": start_date, "end": end_date},
-                "summary": {
-                    "total_income": 0,
-                    "total_expenses": 0,
-                    "net_balance": 0,
-                    "transaction_count": 0
-                },
-                "by_category": [],
-                "trends": []
+            if df.empty:
+                return {"period": period, **calculator.empty_financial_summary()}
+
+            # Expense percentiles from the period's monthly sketches (cached and persisted per month)
+            states = calculator.period_states(user_id, start, end)
+            return {"period": period, **calculator.financial_summary(df, states)}
+
+        if mode == "exact":
+            return exact()
+
+        started = time.perf_counter()
+        sample = _approximate_sample(user_id, start, end)
+        if sample is None:
+            estimate: Dict[str, Any] = {"period": period, "approximate": True, "budget_exceeded": True}
+        elif sample.empty:
+            estimate = {"period": period, "approximate": True, **calculator.empty_financial_summary()}
+        else:
+            estimate = {
+                "period": period,
+                "approximate": True,
+                **calculator.approximate_financial_summary(sample),
+                "sample": sample_info(sample, get_settings().report_sample_per_stratum, time.perf_counter() - started)
             }
 
-        # Calculate using Pandas (MUCH faster than JS)
-        income_df = df[df['type'] == 'INCOME']
-        expense_df = df[df['type'] == 'EXPENSE']
+        if stream:
+            loop = asyncio.get_running_loop()
+            return _progressive(estimate, lambda: loop.run_in_executor(None, exact))
+        if sample is None:
+            raise HTTPException(status_code=504, detail="Approximate summary exceeded the latency budget; use stream=true or mode=exact")
+        return estimate
 
-        total_income = float(income_df['amount'].sum())
-        total_expenses = float(expense_df['amount'].sum())
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating financial summary: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Group by category
-        category_summary = df.groupby(['category_name', 'type']).agg({
-            'amount': 'sum',
-            'id': 'count'
-        }).reset_index()
-        category_summary.columns = ['category', 'type', 'total', 'count']
 
-        # Calculate daily trends
-        df['date'] = pd.to_datetime(df['date'])
-        daily_trends = df.groupby([pd.Grouper(key='date', freq='D'), 'type']).agg({
-            'amount': 'sum'
-        }).reset_index()
+@router.get("/financial-summary/multi")
+async def get_multi_user_financial_summary(
+    user_ids: List[str] = Depends(user_id_list),
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+):
+    """
+    Financial summary of several users (household, advisor clients)
+
+    Loads every user's transactions with one query and returns each user's
+    summary (same shape as /financial-summary) plus the combined one.
+    """
+    try:
+        calculator = ReportCalculator()
+
+        start = datetime.fromisoformat(start_date) if start_date else datetime.now() - timedelta(days=30)
+        end = datetime.fromisoformat(end_date) if end_date else datetime.now()
+
+        df = fetch_transactions(user_ids, start, end)
 
         return {
             "period": {
                 "start": start_date or start.isoformat(),
                 "end": end_date or end.isoformat()
             },
-            "summary": {
-                "total_income": total_income,
-                "total_expenses": total_expenses,
-                "net_balance": total_income - total_expenses,
-                "transaction_count": len(df),
-                "avg_transaction": float(df['amount'].mean()),
-                "savings_rate": (total_income - total_expenses) / total_income * 100 if total_income > 0 else 0
-            },
-            "by_category": category_summary.to_dict('records'),
-            "trends": daily_trends.to_dict('records'),
-            "statistics": {
-                "highest_expense": float(expense_df['amount'].max()) if not expense_df.empty else 0,
-                "lowest_expense": float(expense_df['amount'].min()) if not expense_df.empty else 0,
-                "highest_income": float(income_df['amount'].max()) if not income_df.empty else 0,
-                "median_expense": float(expense_df['amount'].median()) if not expense_df.empty else 0
-            }
+            "user_ids": user_ids,
+            "combined": calculator.financial_summary(df) if not df.empty else calculator.empty_financial_summary(),
+            "by_user": calculator.financial_summary_by_user(df, user_ids)
         }
 
     except Exception as e:
-        logger.error(f"Error generating financial summary: {e}")
+        logger.error(f"Error generating multi-user financial summary: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -142,56 +191,20 @@ async def get_spending_patterns(
     """
     try:
         calculator = ReportCalculator()
+        feature_store = get_feature_store()
 
-        engine = get_db_connection()
-
-        # Get transaction data
-        query = text("""
-            SELECT
-                t.*,
-                uc.name as category_name,
-                uc.type as category_type
-            FROM transactions t
-            LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
-            WHERE t."userId" = :user_id
-                AND t.date >= NOW() - INTERVAL ':months months'
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={"user_id": user_id, "months": months})
+        # Get transaction data and shared features
+        df = await feature_store.get_frame(user_id, months * 30)
+        features = await feature_store.get_features(user_id, months * 30)
 
         if df.empty:
             return {"patterns": [], "insights": []}
 
-        # Detect patterns using Pandas
-        df['date'] = pd.to_datetime(df['date'])
-        df['day_of_month'] = df['date'].dt.day
-        df['day_of_week'] = df['date'].dt.dayofweek
-
-        # Find recurring expenses (similar amounts on similar days)
-        recurring = df.groupby(['category_name', 'day_of_month']).agg({
-            'amount': ['mean', 'std', 'count']
-        }).reset_index()
-
-        recurring = recurring[recurring[('amount', 'count')] >= 3]  # At least 3 occurrences
-        recurring = recurring[recurring[('amount', 'std')] < recurring[('amount', 'mean')] * 0.1]  # Low variance
-
-        patterns = []
-        for _, row in recurring.iterrows():
-            patterns.append({
-                "category": row['category_name'],
-                "type": "recurring",
-                "frequency": "monthly",
-                "average_amount": float(row[('amount', 'mean')]),
-                "confidence": 0.9,
-                "day_of_month": int(row['day_of_month'])
-            })
+        patterns = calculator.detect_recurring_transactions(df, amount_tolerance=0.1)
 
         return {
             "patterns": patterns,
-            "insights": calculator.generate_insights(df),
+            "insights": calculator.generate_insights(features),
             "analyzed_transactions": len(df),
             "period_months": months
         }
@@ -207,13 +220,21 @@ async def get_category_analysis(
     period: str = Query("month", description="Period: month, quarter, year")
 ):
     """
-    Deep category analysis with AI-powered recommendations
+    Deep category analysis with spending-profile clustering
+
+    Monthly spending per category over the last complete months (6 for
+    month, 12 for quarter, 24 for year) with trend and volatility, and
+    the categories grouped by profile (k-means). Cached per user-month.
     """
+    if period not in PERIOD_MONTHS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(PERIOD_MONTHS)}")
+
     try:
-        # TODO: Implement category analysis with ML clustering
+        analysis = await get_category_analyzer().analyze_user(user_id, period)
+
         return {
             "status": "success",
-            "message": "Category analysis endpoint - implementation in progress"
+            "analysis": analysis
         }
 
     except Exception as e:
@@ -221,11 +242,129 @@ async def get_category_analysis(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/budget-variance")
+async def get_budget_variance(
+    user_id: str = Query(..., description="User ID"),
+    period: str = Query("1y", description="Period: 30d, 90d, 1y, 3y")
+):
+    """
+    Budget variance report (BUDGET_VARIANCE)
+
+    Spent vs budgeted, burn rate and projected overrun for every budget
+    period overlapping the requested window.
+    """
+    report = ReportAnalyzer().generate_budget_variance_report(user_id, period)
+
+    if "error" in report:
+        raise HTTPException(status_code=500, detail=report["error"])
+
+    return {"status": "success", "report": report}
+
+
+@router.get("/cash-flow-projection")
+async def get_cash_flow_projection(
+    user_id: str = Query(..., description="User ID"),
+    days: int = Query(90, description="Horizon in days: 30, 90 or 365")
+):
+    """
+    Cash-flow projection report (CASH_FLOW_PROJECTION)
+
+    Day-by-day projected balance from recurring transactions, average
+    discretionary spending and scheduled goal contributions.
+    """
+    if days not in HORIZONS:
+        raise HTTPException(status_code=400, detail=f"days must be one of {', '.join(map(str, HORIZONS))}")
+
+    report = ReportAnalyzer().generate_cash_flow_projection_report(user_id, days)
+
+    if "error" in report:
+        raise HTTPException(status_code=500, detail=report["error"])
+
+    return {"status": "success", "report": report}
+
+
+def _report_payload(user_id: str, report_type: str, period: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    /generate response from period totals
+
+    `data` holds total_income, total_expenses, savings_rate,
+    transaction_count, category_count, categories ({name: amount}) and
+    top_categories ([{category, total}], largest expenses first).
+    """
+    total_income = data['total_income']
+    total_expenses = data['total_expenses']
+    balance = total_income - total_expenses
+
+    # Generate insights based on data
+    insights = []
+
+    if total_income > 0:
+        savings_rate = data['savings_rate']
+        if savings_rate > 20:
+            insights.append(f"Excelente! Você está economizando {savings_rate:.1f}% da sua renda.")
+        elif savings_rate > 10:
+            insights.append(f"Bom trabalho! Você está economizando {savings_rate:.1f}% da sua renda.")
+        else:
+            insights.append(f"Sua taxa de economia está em {savings_rate:.1f}%. Tente aumentar para pelo menos 20%.")
+
+    if data['top_categories']:
+        top = data['top_categories'][0]
+        insights.append(f"Sua maior despesa é em '{top['category']}' com R$ {top['total']:,.2f}.")
+
+    if data['transaction_count'] > 10:
+        insights.append(f"Você registrou {data['transaction_count']} transações neste período. Parabéns pela organização!")
+
+    # Format summary based on report type
+    if report_type == "monthly":
+        summary = f"Resumo Mensal ({period}): Receitas de R$ {total_income:,.2f}, Despesas de R$ {total_expenses:,.2f}, Saldo de R$ {balance:,.2f}"
+    elif report_type == "category":
+        summary = f"Análise por Categoria ({period}): {data['category_count']} categorias diferentes identificadas"
+    elif report_type == "goals":
+        summary = f"Progresso de Metas ({period}): Economia de R$ {balance:,.2f} no período"
+    else:
+        summary = f"Fluxo de Caixa ({period}): Saldo final de R$ {balance:,.2f}"
+
+    return {
+        "report_type": report_type,
+        "period": period,
+        "user_id": user_id,
+        "generated_at": datetime.now().isoformat(),
+        "summary": summary,
+        "data": {
+            "total_income": total_income,
+            "total_expenses": total_expenses,
+            "balance": balance,
+            "transaction_count": data['transaction_count'],
+            "categories": data['categories'],
+            # Category breakdown for charts
+            "by_category": [{"category": c['category'], "total": c['total']} for c in data['top_categories']]
+        },
+        "insights": insights if insights else ["Continue registrando suas transações para obter insights personalizados."]
+    }
+
+
+def _empty_report(user_id: str, report_type: str, period: str) -> Dict[str, Any]:
+    return {
+        "report_type": report_type,
+        "period": period,
+        "user_id": user_id,
+        "generated_at": datetime.now().isoformat(),
+        "summary": f"Nenhuma transação encontrada para o período de {period}",
+        "data": {},
+        "insights": [
+            "Não há dados suficientes para gerar insights.",
+            "Comece adicionando suas transações para ver análises detalhadas."
+        ]
+    }
+
+
 @router.get("/generate")
 async def generate_report(
     user_id: str = Query(..., description="User ID"),
     report_type: str = Query(..., description="Report type: monthly, category, goals, cash_flow"),
-    period: str = Query("30d", description="Period: 7d, 30d, 90d, 1y")
+    period: str = Query("30d", description="Period: 7d, 30d, 90d, 1y, 2y, 5y"),
+    mode: str = Query("exact", description="exact, or approximate (stratified sample with 95% intervals)"),
+    stream: bool = Query(False, description="With mode=approximate: stream the estimate, then the exact result (NDJSON)")
 ):
     """
     Generate standard financial reports with AI insights
@@ -236,127 +375,80 @@ async def generate_report(
     - goals: Goals progress analysis
     - cash_flow: Daily cash flow and balance
     """
+    _check_mode(mode, stream)
     try:
-        # Parse period
-        period_map = {
-            "7d": 7,
-            "30d": 30,
-            "90d": 90,
-            "1y": 365
-        }
-        days = period_map.get(period, 30)
-        start_date = datetime.now() - timedelta(days=days)
-        end_date = datetime.now()
-
-        engine = get_db_connection()
-
-        # Get transactions
-        query = text("""
-            SELECT
-                t.id,
-                t."userId",
-                t.description,
-                t.amount,
-                t.type,
-                t.date,
-                t."categoryId",
-                t."userCategoryId",
-                uc.name as category_name,
-                uc.type as category_type
-            FROM transactions t
-            LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
-            WHERE t."userId" = :user_id
-                AND t.date BETWEEN :start_date AND :end_date
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query, conn, params={
-                "user_id": user_id,
-                "start_date": start_date,
-                "end_date": end_date
+        days = REPORT_PERIODS.get(period, 30)
+
+        async def exact() -> Dict[str, Any]:
+            # Get transactions and shared features
+            feature_store = get_feature_store()
+            df = await feature_store.get_frame(user_id, days)
+            features = await feature_store.get_features(user_id, days)
+
+            if df.empty:
+                return _empty_report(user_id, report_type, period)
+
+            return _report_payload(user_id, report_type, period, {
+                "total_income": features['totalIncome'],
+                "total_expenses": features['totalExpenses'],
+                "savings_rate": features['savingsRate'],
+                "transaction_count": features['transactionCount'],
+                "category_count": len(df.groupby('category_name', observed=True)),
+                "categories": df.groupby('category_name', observed=True)['amount'].sum().to_dict(),
+                "top_categories": features['topCategories']
             })
 
-        if df.empty:
-            return {
+        if mode == "exact":
+            return await exact()
+
+        started = time.perf_counter()
+        now = datetime.now()
+        sample = _approximate_sample(user_id, now - timedelta(days=days), now)
+        if sample is None:
+            estimate: Dict[str, Any] = {
                 "report_type": report_type,
                 "period": period,
                 "user_id": user_id,
-                "generated_at": datetime.now().isoformat(),
-                "summary": f"Nenhuma transação encontrada para o período de {period}",
-                "data": {},
-                "insights": [
-                    "Não há dados suficientes para gerar insights.",
-                    "Comece adicionando suas transações para ver análises detalhadas."
-                ]
+                "approximate": True,
+                "budget_exceeded": True
             }
-
-        # Calculate data
-        income_df = df[df['type'] == 'INCOME']
-        expense_df = df[df['type'] == 'EXPENSE']
-
-        total_income = float(income_df['amount'].sum())
-        total_expenses = float(expense_df['amount'].sum())
-        balance = total_income - total_expenses
-
-        # Generate insights based on data
-        insights = []
-
-        if total_income > 0:
-            savings_rate = (balance / total_income) * 100
-            if savings_rate > 20:
-                insights.append(f"Excelente! Você está economizando {savings_rate:.1f}% da sua renda.")
-            elif savings_rate > 10:
-                insights.append(f"Bom trabalho! Você está economizando {savings_rate:.1f}% da sua renda.")
-            else:
-                insights.append(f"Sua taxa de economia está em {savings_rate:.1f}%. Tente aumentar para pelo menos 20%.")
-
-        if not expense_df.empty:
-            top_category = expense_df.groupby('category_name')['amount'].sum().idxmax()
-            top_amount = float(expense_df.groupby('category_name')['amount'].sum().max())
-            insights.append(f"Sua maior despesa é em '{top_category}' com R$ {top_amount:,.2f}.")
-
-        if len(df) > 10:
-            insights.append(f"Você registrou {len(df)} transações neste período. Parabéns pela organização!")
-
-        # Format summary based on report type
-        if report_type == "monthly":
-            summary = f"Resumo Mensal ({period}): Receitas de R$ {total_income:,.2f}, Despesas de R$ {total_expenses:,.2f}, Saldo de R$ {balance:,.2f}"
-        elif report_type == "category":
-            summary = f"Análise por Categoria ({period}): {len(df.groupby('category_name'))} categorias diferentes identificadas"
-        elif report_type == "goals":
-            summary = f"Progresso de Metas ({period}): Economia de R$ {balance:,.2f} no período"
+        elif sample.empty:
+            estimate = {**_empty_report(user_id, report_type, period), "approximate": True}
         else:
-            summary = f"Fluxo de Caixa ({period}): Saldo final de R$ {balance:,.2f}"
-
-        # Category breakdown for charts
-        by_category = []
-        if not expense_df.empty and 'category_name' in expense_df.columns:
-            category_totals = expense_df.groupby('category_name')['amount'].sum().sort_values(ascending=False)
-            for cat, amount in category_totals.head(5).items():
-                by_category.append({
-                    "category": cat if cat else "Outros",
-                    "total": float(amount)
-                })
+            approximate = ReportCalculator().approximate_financial_summary(sample)
+            categories: Dict[str, float] = {}
+            for c in approximate['by_category']:
+                categories[c['category']] = round(categories.get(c['category'], 0.0) + c['total'], 2)
+            expenses = sorted((c for c in approximate['by_category'] if c['type'] == 'EXPENSE'), key=lambda c: c['total'], reverse=True)
+            summary = approximate['summary']
+            estimate = {
+                **_report_payload(user_id, report_type, period, {
+                    "total_income": summary['total_income'],
+                    "total_expenses": summary['total_expenses'],
+                    "savings_rate": summary['savings_rate'],
+                    "transaction_count": summary['transaction_count'],
+                    "category_count": len(categories),
+                    "categories": categories,
+                    "top_categories": expenses[:5]
+                }),
+                "approximate": True,
+                "confidence": approximate['confidence'],
+                "intervals": {
+                    **{k: v for k, v in approximate['intervals'].items() if k in ("total_income", "total_expenses", "savings_rate")},
+                    "balance": approximate['intervals']['net_balance'],
+                    "by_category": {c['category']: c['interval'] for c in expenses[:5]}
+                },
+                "sample": sample_info(sample, get_settings().report_sample_per_stratum, time.perf_counter() - started)
+            }
 
-        return {
-            "report_type": report_type,
-            "period": period,
-            "user_id": user_id,
-            "generated_at": datetime.now().isoformat(),
-            "summary": summary,
-            "data": {
-                "total_income": total_income,
-                "total_expenses": total_expenses,
-                "balance": balance,
-                "transaction_count": len(df),
-                "categories": df.groupby('category_name')['amount'].sum().to_dict() if not df.empty else {},
-                "by_category": by_category
-            },
-            "insights": insights if insights else ["Continue registrando suas transações para obter insights personalizados."]
-        }
+        if stream:
+            return _progressive(estimate, exact)
+        if sample is None:
+            raise HTTPException(status_code=504, detail="Approximate report exceeded the latency budget; use stream=true or mode=exact")
+        return estimate
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -389,35 +481,8 @@ async def generate_custom_report(
         start_date = datetime.now() - timedelta(days=days)
         end_date = datetime.now()
 
-        engine = get_db_connection()
-
         # Get transactions
-        query_sql = text("""
-            SELECT
-                t.id,
-                t."userId",
-                t.description,
-                t.amount,
-                t.type,
-                t.date,
-                t."categoryId",
-                t."userCategoryId",
-                uc.name as category_name,
-                uc.type as category_type
-            FROM transactions t
-            LEFT JOIN "user_categories" uc ON t."userCategoryId" = uc.id
-            WHERE t."userId" = :user_id
-                AND t.date BETWEEN :start_date AND :end_date
-                AND t.status = 'COMPLETED'
-            ORDER BY t.date DESC
-        """)
-
-        with engine.connect() as conn:
-            df = pd.read_sql(query_sql, conn, params={
-                "user_id": user_id,
-                "start_date": start_date,
-                "end_date": end_date
-            })
+        df = fetch_transactions([user_id], start_date, end_date)
 
         if df.empty:
             return {
@@ -434,12 +499,14 @@ async def generate_custom_report(
             }
 
         # Calculate data
-        income_df = df[df['type'] == 'INCOME']
-        expense_df = df[df['type'] == 'EXPENSE']
+        income_df = df[type_mask(df, 'INCOME')]
+        expense_df = df[type_mask(df, 'EXPENSE')]
 
-        total_income = float(income_df['amount'].sum())
-        total_expenses = float(expense_df['amount'].sum())
-        balance = total_income - total_expenses
+        income_cents = int(income_df['amountCents'].sum())
+        expense_cents = int(expense_df['amountCents'].sum())
+        total_income = from_cents(income_cents)
+        total_expenses = from_cents(expense_cents)
+        balance = from_cents(income_cents - expense_cents)
 
         # Analyze query and generate answer
         query_lower = query.lower()
@@ -449,7 +516,7 @@ async def generate_custom_report(
         # Check for specific keywords
         if "alimentação" in query_lower or "comida" in query_lower or "alimentacao" in query_lower:
             food_df = expense_df[expense_df['category_name'].str.lower().str.contains("alimentação|comida|restaurante|mercado", na=False)]
-            food_total = float(food_df['amount'].sum())
+            food_total = total(food_df['amountCents'])
             answer = f"Você gastou R$ {food_total:,.2f} com alimentação no período de {period}."
             if food_total > 0:
                 insights.append(f"Total gasto com alimentação: R$ {food_total:,.2f}")
@@ -457,8 +524,9 @@ async def generate_custom_report(
 
         elif "maior" in query_lower and ("gasto" in query_lower or "despesa" in query_lower):
             if not expense_df.empty:
-                top_category = expense_df.groupby('category_name')['amount'].sum().idxmax()
-                top_amount = float(expense_df.groupby('category_name')['amount'].sum().max())
+                by_category = expense_df.groupby('category_name', observed=True)['amountCents'].sum()
+                top_category = by_category.idxmax()
+                top_amount = from_cents(by_category.max())
                 answer = f"Sua maior despesa é em '{top_category}' com R$ {top_amount:,.2f}."
                 insights.append(f"Categoria com mais gastos: {top_category}")
                 insights.append(f"Total: R$ {top_amount:,.2f}")
@@ -485,7 +553,7 @@ async def generate_custom_report(
             answer = f"Baseado nos seus dados de {period}: Receitas R$ {total_income:,.2f}, Despesas R$ {total_expenses:,.2f}, Saldo R$ {balance:,.2f}."
             insights.append(f"Total de {len(df)} transações analisadas.")
             if not expense_df.empty:
-                top_category = expense_df.groupby('category_name')['amount'].sum().idxmax()
+                top_category = expense_df.groupby('category_name', observed=True)['amount'].sum().idxmax()
                 insights.append(f"Maior categoria de gastos: {top_category}")
 
         return {
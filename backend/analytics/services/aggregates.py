@@ -0,0 +1,415 @@
+"""
+Aggregates - Mergeable per-partition aggregate states
+
+An AggregateState holds count, exact sum (cents), sum of squares, min and
+max of transaction amounts per group, plus a log-bucket quantile sketch.
+States of disjoint partitions (months, days, a single new transaction)
+merge by adding counts and sums and taking min/max; re-aggregating to
+coarser keys is the same operation. Means, standard deviations and
+approximate quantiles are derived from the merged state, so a report over
+a year is a merge of cached monthly states instead of a scan of every row.
+
+The sketch is a relative-error quantile sketch (log-spaced buckets, as in
+DDSketch): any quantile it returns is within SKETCH_ACCURACY of the true
+amount at that rank, whatever the partitioning, because merging only adds
+bucket counts. Closed months are persisted in monthly_aggregates, so the
+states survive restarts and are shared between workers.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from analytics.config import get_settings
+from analytics.database.queries import (
+    fetch_monthly_aggregates,
+    fetch_monthly_watermarks,
+    fetch_transactions,
+    save_monthly_aggregates
+)
+from analytics.services.cache import ResultCache, get_result_cache
+from analytics.services.money import CENTS, cents_of
+
+NAMESPACE = "monthly_states"
+MONTH_KEYS = ['month', 'type', 'category']
+# Closed months only change when old transactions are edited (the watermark catches that)
+STATE_TTL = 7 * 24 * 3600
+
+# Sketch buckets are log-spaced so every quantile is within SKETCH_ACCURACY of a true value
+# (stored sketches record theirs; monthly states built with another accuracy are rebuilt)
+SKETCH_ACCURACY = get_settings().sketch_relative_accuracy
+_GAMMA = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+_LOG_GAMMA = np.log(_GAMMA)
+# Bucket of zero amounts (log buckets start at 1 cent = bucket 0)
+_ZERO_BUCKET = -1
+
+MOMENTS = ['count', 'sumCents', 'sumSquares', 'minCents', 'maxCents']
+
+
+def sketch_buckets(cents: np.ndarray) -> np.ndarray:
+    """Sketch bucket of each absolute amount in cents"""
+    cents = np.abs(np.asarray(cents, dtype=float))
+    with np.errstate(divide='ignore'):
+        buckets = np.ceil(np.log(np.maximum(cents, 1)) / _LOG_GAMMA)
+    return np.where(cents > 0, buckets, _ZERO_BUCKET).astype(np.int64)
+
+
+def bucket_values(buckets: np.ndarray) -> np.ndarray:
+    """Representative cents of each bucket (relative error <= SKETCH_ACCURACY)"""
+    buckets = np.asarray(buckets, dtype=np.int64)
+    values = 2 * _GAMMA ** buckets / (_GAMMA + 1)
+    return np.where(buckets == _ZERO_BUCKET, 0.0, values)
+
+
+class AggregateState:
+    """
+    Mergeable amount statistics per group
+
+    `moments` is indexed by the group keys with MOMENTS columns; `sketch`
+    holds (keys..., bucket, count) rows. Amounts are absolute values.
+    """
+
+    def __init__(self, keys: Sequence[str], moments: pd.DataFrame, sketch: pd.DataFrame):
+        self.keys = list(keys)
+        self.moments = moments
+        self.sketch = sketch
+
+    @classmethod
+    def empty(cls, keys: Sequence[str]) -> "AggregateState":
+        keys = list(keys)
+        moments = pd.DataFrame(
+            {c: pd.Series(dtype=np.int64 if c != 'sumSquares' else float) for c in MOMENTS},
+            index=pd.MultiIndex.from_arrays([[] for _ in keys], names=keys)
+        )
+        sketch = pd.DataFrame({c: pd.Series(dtype=object) for c in keys})
+        sketch['bucket'] = pd.Series(dtype=np.int64)
+        sketch['count'] = pd.Series(dtype=np.int64)
+        return cls(keys, moments, sketch)
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, keys: Sequence[str]) -> "AggregateState":
+        """State of a frame of transactions grouped by `keys` (columns of `df`)"""
+        keys = list(keys)
+        if df.empty:
+            return cls.empty(keys)
+
+        cents = cents_of(df).abs().to_numpy()
+        rows = pd.DataFrame({k: df[k].to_numpy() for k in keys})
+        rows['cents'] = cents
+        rows['squares'] = cents.astype(float) ** 2
+        rows['bucket'] = sketch_buckets(cents)
+
+        grouped = rows.groupby(keys, sort=False, observed=True, dropna=False)
+        moments = grouped.agg(
+            count=('cents', 'size'),
+            sumCents=('cents', 'sum'),
+            sumSquares=('squares', 'sum'),
+            minCents=('cents', 'min'),
+            maxCents=('cents', 'max')
+        )
+        sketch = (
+            rows.groupby(keys + ['bucket'], sort=False, observed=True, dropna=False)
+            .size()
+            .rename('count')
+            .reset_index()
+        )
+        return cls(keys, moments, sketch)
+
+    @classmethod
+    def merge(cls, states: Iterable["AggregateState"], keys: Optional[Sequence[str]] = None) -> "AggregateState":
+        """
+        Merge states of disjoint partitions
+
+        With `keys` (a subset of the states' keys) the result is also
+        rolled up to those keys.
+        """
+        states = list(states)
+        if not states:
+            return cls.empty(keys or [])
+        keys = list(keys if keys is not None else states[0].keys)
+        states = [s for s in states if not s.moments.empty]
+        if not states:
+            return cls.empty(keys)
+
+        moments = pd.concat([s.moments.reset_index() for s in states], ignore_index=True)
+        merged = moments.groupby(keys, sort=False, observed=True, dropna=False).agg(
+            count=('count', 'sum'),
+            sumCents=('sumCents', 'sum'),
+            sumSquares=('sumSquares', 'sum'),
+            minCents=('minCents', 'min'),
+            maxCents=('maxCents', 'max')
+        )
+        sketch = (
+            pd.concat([s.sketch for s in states], ignore_index=True)
+            .groupby(keys + ['bucket'], sort=False, observed=True, dropna=False)['count']
+            .sum()
+            .reset_index()
+        )
+        return cls(keys, merged, sketch)
+
+    def rollup(self, keys: Sequence[str]) -> "AggregateState":
+        """The same statistics over coarser keys"""
+        return AggregateState.merge([self], keys)
+
+    def add(self, df: pd.DataFrame) -> "AggregateState":
+        """State with new transactions (e.g. a single ingested one, with the key columns) merged in"""
+        return AggregateState.merge([self, AggregateState.from_frame(df, self.keys)])
+
+    def summary(self) -> pd.DataFrame:
+        """count, total, mean, std (sample), min and max per group, in currency units"""
+        m = self.moments
+        count = m['count'].to_numpy()
+        mean = m['sumCents'].to_numpy() / np.maximum(count, 1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (m['sumSquares'].to_numpy() - count * mean ** 2) / (count - 1)
+        std = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), 0.0)
+
+        return pd.DataFrame({
+            'count': count,
+            'totalCents': m['sumCents'].to_numpy(),
+            'total': m['sumCents'].to_numpy() / CENTS,
+            'mean': mean / CENTS,
+            'std': std / CENTS,
+            'min': m['minCents'].to_numpy() / CENTS,
+            'max': m['maxCents'].to_numpy() / CENTS
+        }, index=m.index)
+
+    def quantiles(self, qs: Sequence[float]) -> pd.DataFrame:
+        """
+        Approximate quantiles per group from the sketch (currency units)
+
+        Each value is within SKETCH_ACCURACY (relative) of an amount whose
+        rank is the requested one.
+        """
+        columns = [f'q{int(round(q * 100))}' for q in qs]
+        if self.sketch.empty:
+            return pd.DataFrame(columns=columns, index=self.moments.index, dtype=float)
+
+        sketch = self.sketch.sort_values(self.keys + ['bucket'], kind='stable')
+        group = sketch.groupby(self.keys, sort=False, observed=True, dropna=False)
+        cumulative = group['count'].cumsum().to_numpy()
+        total = group['count'].transform('sum').to_numpy()
+        group_id = group.ngroup().to_numpy()
+        values = bucket_values(sketch['bucket'].to_numpy())
+
+        result = {}
+        for column, q in zip(columns, qs):
+            # First bucket per group whose cumulative count reaches the rank
+            reached = cumulative >= np.maximum(np.ceil(q * total), 1)
+            first = pd.Series(reached).groupby(group_id).idxmax().to_numpy()
+            result[column] = values[first] / CENTS
+
+        # Align on the key columns with a merge: unlike reindex, it matches NaN keys (uncategorized)
+        firsts = sketch.drop_duplicates(self.keys)[self.keys].reset_index(drop=True).assign(**result)
+        aligned = self.moments.index.to_frame(index=False).merge(firsts, on=self.keys, how='left')
+        return pd.DataFrame(aligned[columns].to_numpy(dtype=float), index=self.moments.index, columns=columns)
+
+
+class MonthlyStateStore:
+    """
+    Per-user monthly AggregateStates (keyed by MONTH_KEYS) cached across requests
+
+    Closed months are cached with their watermark (latest updatedAt and row
+    count of the month) and rebuilt only when it moves; the partial months
+    at the edges of a period, the live month and any later month are built
+    from rows.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or get_result_cache()
+
+    def load(self, user_id: str, start: datetime, end: Optional[datetime] = None) -> AggregateState:
+        """Merged monthly states of a user's COMPLETED transactions in [start, end]"""
+        end = pd.Timestamp(end or datetime.now())
+        start = pd.Timestamp(start)
+        current = pd.Period(datetime.now(), freq='M')
+        months = pd.period_range(start, end, freq='M')
+
+        # Whole closed months come from the cache; the rest is partial and read from rows
+        whole = [m for m in months if m.start_time >= start and m.end_time <= end and m < current]
+        states: List[AggregateState] = []
+        stale: List[Tuple[pd.Period, dict]] = []
+
+        if whole:
+            watermarks = fetch_monthly_watermarks(user_id, whole[0].start_time, whole[-1].end_time)
+            for month in whole:
+                watermark = watermarks.get(str(month), {"updated_at": None, "count": 0})
+                entry = self.cache.get(NAMESPACE, user_id, str(month))
+                if entry is not None and entry["watermark"] == watermark:
+                    states.append(entry["state"])
+                else:
+                    stale.append((month, watermark))
+
+        if stale:
+            persisted = self._load_persisted(user_id, stale)
+            for month, watermark in stale:
+                if str(month) in persisted:
+                    self.cache.set(NAMESPACE, user_id, {"state": persisted[str(month)], "watermark": watermark}, key=str(month), ttl=STATE_TTL)
+                    states.append(persisted[str(month)])
+            stale = [(month, watermark) for month, watermark in stale if str(month) not in persisted]
+
+        if stale:
+            logger.debug(f"Rebuilding {len(stale)} monthly states for {user_id}")
+            df = fetch_transactions([user_id], stale[0][0].start_time, stale[-1][0].end_time)
+            rebuilt = self.build(df)
+            rows = []
+            for month, watermark in stale:
+                state = self._month(rebuilt, month)
+                self.cache.set(NAMESPACE, user_id, {"state": state, "watermark": watermark}, key=str(month), ttl=STATE_TTL)
+                states.append(state)
+                rows.extend(self._rows(state, month, watermark))
+            save_monthly_aggregates(user_id, [str(month) for month, _ in stale], rows)
+
+        # Every other month (partial edges, the live month and any later one) is read
+        # from rows, one fetch per contiguous run
+        whole_set = set(whole)
+        runs: List[List[pd.Period]] = []
+        for month in months:
+            if month in whole_set:
+                continue
+            if runs and month == runs[-1][-1] + 1:
+                runs[-1].append(month)
+            else:
+                runs.append([month])
+        for run in runs:
+            run_start = max(run[0].start_time, start)
+            run_end = min(run[-1].end_time, end)
+            states.append(self.build(fetch_transactions([user_id], run_start, run_end)))
+
+        return AggregateState.merge(states, MONTH_KEYS)
+
+    def refresh(self, user_id: str, months: Iterable[str]) -> int:
+        """
+        Rebuild the cached states of changed months ("YYYY-MM")
+
+        Only closed months are cached; the live month is always read from
+        rows. Returns the number of months rebuilt.
+        """
+        current = pd.Period(datetime.now(), freq='M')
+        closed = sorted(p for p in (pd.Period(m, freq='M') for m in set(months)) if p < current)
+        if not closed:
+            return 0
+        self.cache.invalidate(user_id, NAMESPACE, keys=[str(m) for m in closed])
+        # One load over the span rebuilds the invalidated months with a single fetch
+        self.load(user_id, closed[0].start_time, closed[-1].end_time)
+        return len(closed)
+
+    @staticmethod
+    def build(df: pd.DataFrame) -> AggregateState:
+        """Monthly states of a transaction frame"""
+        if df.empty:
+            return AggregateState.empty(MONTH_KEYS)
+        return AggregateState.from_frame(
+            df.assign(
+                month=df['date'].dt.to_period('M').astype(str),
+                type=df['type'].astype(str),
+                category=df['category_name'].astype(object)
+            ),
+            MONTH_KEYS
+        )
+
+    def _load_persisted(self, user_id: str, months: List[Tuple[pd.Period, dict]]) -> Dict[str, AggregateState]:
+        """Persisted states of the months whose watermark and sketch accuracy still match"""
+        rows = fetch_monthly_aggregates(user_id, [str(month) for month, _ in months])
+        if rows.empty:
+            return {}
+
+        states = {}
+        for month, watermark in months:
+            stored = rows[rows['month'] == str(month)]
+            if stored.empty:
+                continue
+            first = stored.iloc[0]
+            stored_at = pd.Timestamp(first['watermarkAt']) if pd.notna(first['watermarkAt']) else None
+            current_at = pd.Timestamp(watermark["updated_at"]) if watermark["updated_at"] is not None else None
+            if (
+                not np.isclose(first['accuracy'], SKETCH_ACCURACY)
+                or int(first['watermarkCount']) != watermark["count"]
+                or stored_at != current_at
+            ):
+                continue
+            states[str(month)] = self._from_rows(stored[stored['count'] > 0])
+        return states
+
+    @staticmethod
+    def _rows(state: AggregateState, month: pd.Period, watermark: dict) -> List[dict]:
+        """Persisted rows of one month's state (a single marker row when it has no transactions)"""
+        common = {
+            "month": str(month),
+            "accuracy": SKETCH_ACCURACY,
+            "watermarkAt": watermark["updated_at"],
+            "watermarkCount": watermark["count"]
+        }
+        if state.moments.empty:
+            return [{
+                **common, "type": "", "category": "", "count": 0, "sumCents": 0, "sumSquares": 0.0,
+                "minCents": 0, "maxCents": 0, "sketch": {}
+            }]
+
+        sketches: Dict[tuple, Dict[str, int]] = {}
+        for row in state.sketch.itertuples(index=False):
+            key = (row.type, row.category if pd.notna(row.category) else "")
+            sketches.setdefault(key, {})[str(int(row.bucket))] = int(row.count)
+
+        rows = []
+        for (_, type_, category), m in state.moments.iterrows():
+            category = category if pd.notna(category) else ""
+            rows.append({
+                **common,
+                "type": type_,
+                "category": category,
+                "count": int(m['count']),
+                "sumCents": int(m['sumCents']),
+                "sumSquares": float(m['sumSquares']),
+                "minCents": int(m['minCents']),
+                "maxCents": int(m['maxCents']),
+                "sketch": sketches.get((type_, category), {})
+            })
+        return rows
+
+    @staticmethod
+    def _from_rows(rows: pd.DataFrame) -> AggregateState:
+        """AggregateState of persisted rows (uncategorized rows get a None category again)"""
+        if rows.empty:
+            return AggregateState.empty(MONTH_KEYS)
+
+        keys = rows[MONTH_KEYS].assign(category=rows['category'].where(rows['category'] != "", None))
+        moments = pd.DataFrame({
+            'count': rows['count'].astype(np.int64).to_numpy(),
+            'sumCents': rows['sumCents'].astype(np.int64).to_numpy(),
+            'sumSquares': rows['sumSquares'].astype(float).to_numpy(),
+            'minCents': rows['minCents'].astype(np.int64).to_numpy(),
+            'maxCents': rows['maxCents'].astype(np.int64).to_numpy()
+        }, index=pd.MultiIndex.from_frame(keys))
+
+        sketch = pd.DataFrame(
+            [
+                (*key, int(bucket), int(n))
+                for key, buckets in zip(keys.itertuples(index=False, name=None), rows['sketch'])
+                for bucket, n in buckets.items()
+            ],
+            columns=MONTH_KEYS + ['bucket', 'count']
+        )
+        sketch['bucket'] = sketch['bucket'].astype(np.int64)
+        sketch['count'] = sketch['count'].astype(np.int64)
+        return AggregateState(MONTH_KEYS, moments, sketch)
+
+    @staticmethod
+    def _month(state: AggregateState, month: pd.Period) -> AggregateState:
+        label = str(month)
+        moments = state.moments[state.moments.index.get_level_values('month') == label]
+        sketch = state.sketch[state.sketch['month'] == label]
+        return AggregateState(state.keys, moments, sketch)
+
+
+_monthly_state_store = None
+
+
+def get_monthly_state_store() -> MonthlyStateStore:
+    """Get or create the process-wide MonthlyStateStore"""
+    global _monthly_state_store
+    if _monthly_state_store is None:
+        _monthly_state_store = MonthlyStateStore()
+    return _monthly_state_store
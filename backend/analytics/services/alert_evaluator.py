@@ -0,0 +1,376 @@
+"""
+Alert Evaluator - Batch alert rules over transactions, budgets and accounts
+
+Evaluates budget overruns, unusually large transactions and low balances
+for many users at once as joins over frames, drops alerts already raised
+(per rule key, within the rule's dedup window) and bulk-inserts the rest
+into the alerts table. Thresholds mirror the Node AlertService defaults
+and can be overridden per user in users.metadata.alertConfig.
+
+Usage (from backend/):
+    python -m analytics.services.alert_evaluator
+"""
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from loguru import logger
+from sqlalchemy import text
+
+from analytics.config import get_settings
+from analytics.database.connection import get_db_connection
+from analytics.database.queries import (
+    fetch_accounts,
+    fetch_active_user_ids,
+    fetch_alert_configs,
+    fetch_alert_keys,
+    fetch_transactions,
+    insert_alerts
+)
+from analytics.services.budgets import load_budget_usage
+from analytics.services.encoding import type_mask
+
+# Same defaults as SmartAlertConfig in src/services/AlertService.ts
+DEFAULT_ALERT_CONFIG: Dict[str, Any] = {
+    "budgetExceededThreshold": 80,  # percentage of the budget
+    "lowBalanceThreshold": 100,
+    "unusualTransactionMultiplier": 3,  # times the user's average expense
+    "enableBudgetAlerts": True,
+    "enableSpendingAlerts": True,
+    "enableBalanceAlerts": True,
+    "cooldownHours": 24
+}
+
+BASELINE_DAYS = 90
+LARGE_TRANSACTION_LOOKBACK_DAYS = 7
+MAX_LARGE_TRANSACTION_ALERTS = 3
+USERS_PER_CHUNK = 500
+# pg advisory lock id, so only one instance evaluates at a time
+ADVISORY_LOCK_ID = 7_341_033
+# Credit card and loan balances are debts, not available money
+NON_CASH_ACCOUNTS = ("CREDIT_CARD", "LOAN")
+
+
+class AlertEvaluator:
+    """
+    Scheduled batch evaluation of alert rules
+
+    `run()` walks all active users in chunks; `start()` schedules it on the
+    event loop every `interval_minutes`, executing in a worker thread.
+    """
+
+    def __init__(self, interval_minutes: float = 60):
+        self.interval_minutes = interval_minutes
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the evaluation schedule (idempotent; disabled when interval <= 0)"""
+        if self.running or self.interval_minutes <= 0:
+            return
+        self._task = asyncio.create_task(self._schedule())
+        logger.info(f"🔔 Alert evaluator scheduled every {self.interval_minutes} min")
+
+    async def stop(self):
+        """Stop the evaluation schedule"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _schedule(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.interval_minutes * 60)
+            try:
+                await loop.run_in_executor(None, self.run)
+            except Exception as e:
+                logger.error(f"Alert evaluation failed: {e}")
+
+    def run(self, user_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Evaluate and insert alerts for the given (default: all active) users
+
+        Skipped when another instance holds the evaluation lock.
+        """
+        started = time.perf_counter()
+        summary: Dict[str, Any] = {"users": 0, "inserted": 0, "byType": {}, "skipped": False}
+
+        engine = get_db_connection()
+        with engine.connect() as lock_conn:
+            if not lock_conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID}).scalar():
+                logger.info("Alert evaluation already running elsewhere, skipping")
+                summary["skipped"] = True
+                return summary
+
+            try:
+                user_ids = user_ids if user_ids is not None else fetch_active_user_ids()
+                for i in range(0, len(user_ids), USERS_PER_CHUNK):
+                    chunk = user_ids[i:i + USERS_PER_CHUNK]
+                    alerts = self.evaluate(chunk)
+                    insert_alerts(alerts)
+
+                    summary["users"] += len(chunk)
+                    summary["inserted"] += len(alerts)
+                    for alert in alerts:
+                        summary["byType"][alert["type"]] = summary["byType"].get(alert["type"], 0) + 1
+            finally:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+
+        summary["seconds"] = round(time.perf_counter() - started, 3)
+        summary["finishedAt"] = datetime.utcnow().isoformat()
+        self.last_run = summary
+        logger.info(f"🔔 Alert evaluation: {summary['inserted']} alerts for {summary['users']} users in {summary['seconds']}s")
+        return summary
+
+    def evaluate(self, user_ids: List[str], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """New (not yet raised) alerts for a chunk of users, ready for `insert_alerts`"""
+        now = now or datetime.now()
+        covered_from = now - timedelta(days=BASELINE_DAYS)
+
+        configs = self.load_configs(user_ids)
+        transactions = fetch_transactions(user_ids, covered_from)
+
+        candidates = (
+            self._budget_alerts(load_budget_usage(user_ids, now, transactions, covered_from), configs)
+            + self._large_transaction_alerts(transactions, configs, now)
+            + self._low_balance_alerts(fetch_accounts(user_ids), configs, now)
+        )
+
+        return self._deduplicate(candidates, user_ids)
+
+    def load_configs(self, user_ids: List[str]) -> pd.DataFrame:
+        """Effective rule config per user (defaults + metadata overrides)"""
+        overrides = fetch_alert_configs(user_ids)
+        return pd.DataFrame(
+            [
+                {**DEFAULT_ALERT_CONFIG, **{k: v for k, v in overrides.get(u, {}).items() if k in DEFAULT_ALERT_CONFIG}}
+                for u in user_ids
+            ],
+            index=pd.Index(user_ids, name='userId')
+        )
+
+    def _budget_alerts(self, usage: pd.DataFrame, configs: pd.DataFrame) -> List[Dict[str, Any]]:
+        if usage.empty:
+            return []
+
+        threshold = usage['userId'].map(configs['budgetExceededThreshold']).astype(float)
+        enabled = usage['userId'].map(configs['enableBudgetAlerts']).astype(bool)
+        hits = usage.assign(threshold=threshold)[enabled & (usage['percentage'] >= threshold)]
+
+        alerts = []
+        for b in hits.itertuples(index=False):
+            exceeded = b.percentage >= 100
+            alerts.append({
+                "userId": b.userId,
+                "type": "BUDGET_EXCEEDED",
+                "severity": "HIGH" if exceeded else "MEDIUM",
+                "title": "Orçamento excedido" if exceeded else "Orçamento próximo do limite",
+                "message": f"Você já gastou {b.percentage:.0f}% do orçamento '{b.name}' (R$ {b.spent:.2f} de R$ {b.amount:.2f})",
+                "description": None,
+                "data": {
+                    "amount": float(b.spent),
+                    "category": b.category_name,
+                    "budget": {
+                        "id": b.id,
+                        "name": b.name,
+                        "amount": float(b.amount),
+                        "spent": float(b.spent),
+                        "remaining": float(b.remaining),
+                        "percentage": round(float(b.percentage), 1),
+                        "period": b.period,
+                        "startDate": b.startDate.isoformat(),
+                        "endDate": b.endDate.isoformat()
+                    },
+                    "metadata": {
+                        "dedupKey": f"budget:{b.id}:{'exceeded' if exceeded else 'threshold'}",
+                        "source": "analytics"
+                    }
+                },
+                "rule": self._rule("Budget Threshold", "budgetPercentage", "gte", b.threshold, configs, b.userId),
+                "actionUrl": None,
+                "actionText": None,
+                "expiresAt": b.endDate,
+                "channels": ["IN_APP"],
+                # One alert per level per budget period
+                "dedupSince": b.startDate
+            })
+
+        return alerts
+
+    def _large_transaction_alerts(
+        self,
+        transactions: pd.DataFrame,
+        configs: pd.DataFrame,
+        now: datetime
+    ) -> List[Dict[str, Any]]:
+        expenses = transactions[type_mask(transactions, 'EXPENSE')]
+        if expenses.empty:
+            return []
+
+        amount = expenses['amount'].astype(float)
+        baseline = amount.groupby(expenses['userId']).transform('mean')
+        multiplier = expenses['userId'].map(configs['unusualTransactionMultiplier']).astype(float)
+        enabled = expenses['userId'].map(configs['enableSpendingAlerts']).astype(bool)
+        recent = expenses['date'] >= now - timedelta(days=LARGE_TRANSACTION_LOOKBACK_DAYS)
+
+        hits = (
+            expenses.assign(baseline=baseline, limit=baseline * multiplier)
+            [enabled & recent & (amount > baseline * multiplier)]
+            .sort_values('amount', ascending=False)
+            .groupby('userId', sort=False)
+            .head(MAX_LARGE_TRANSACTION_ALERTS)
+        )
+
+        alerts = []
+        for t in hits.itertuples(index=False):
+            change = float(t.amount - t.baseline)
+            alerts.append({
+                "userId": t.userId,
+                "type": "UNUSUAL_TRANSACTION",
+                "severity": "MEDIUM",
+                "title": "Transação incomum detectada",
+                "message": f"Transação de R$ {t.amount:.2f} está acima da média (R$ {t.baseline:.2f})",
+                "description": t.description,
+                "data": {
+                    "amount": float(t.amount),
+                    "category": t.category_name,
+                    "transaction": {
+                        "id": t.id,
+                        "description": t.description,
+                        "date": t.date.isoformat(),
+                        "category": t.category_name
+                    },
+                    "comparison": {
+                        "current": float(t.amount),
+                        "previous": float(t.baseline),
+                        "change": change,
+                        "changePercentage": change / t.baseline * 100 if t.baseline else 0.0
+                    },
+                    "metadata": {"dedupKey": f"transaction:{t.id}", "source": "analytics"}
+                },
+                "rule": self._rule("Unusual Transaction Detection", "transactionAmount", "gt", t.limit, configs, t.userId),
+                "actionUrl": "/transacoes",
+                "actionText": "Ver transações",
+                "expiresAt": now + timedelta(hours=72),
+                "channels": ["IN_APP"],
+                "dedupSince": now - timedelta(days=BASELINE_DAYS)
+            })
+
+        return alerts
+
+    def _low_balance_alerts(
+        self,
+        accounts: pd.DataFrame,
+        configs: pd.DataFrame,
+        now: datetime
+    ) -> List[Dict[str, Any]]:
+        accounts = accounts[~accounts['type'].isin(NON_CASH_ACCOUNTS)]
+        if accounts.empty:
+            return []
+
+        balance = accounts['balance'].astype(float)
+        threshold = accounts['userId'].map(configs['lowBalanceThreshold']).astype(float)
+        enabled = accounts['userId'].map(configs['enableBalanceAlerts']).astype(bool)
+        cooldown = accounts['userId'].map(configs['cooldownHours']).astype(float)
+        hits = accounts.assign(balance=balance, threshold=threshold, cooldown=cooldown)[enabled & (balance < threshold)]
+
+        return [
+            {
+                "userId": a.userId,
+                "type": "LOW_BALANCE",
+                "severity": "HIGH",
+                "title": "Saldo baixo",
+                "message": f"Sua conta {a.name} está com saldo baixo: R$ {a.balance:.2f}",
+                "description": None,
+                "data": {
+                    "amount": float(a.balance),
+                    "account": a.name,
+                    "metadata": {"dedupKey": f"account:{a.id}", "source": "analytics"}
+                },
+                "rule": self._rule("Low Balance Detection", "balance", "lt", a.threshold, configs, a.userId),
+                "actionUrl": "/contas",
+                "actionText": "Ver contas",
+                "expiresAt": now + timedelta(hours=24),
+                "channels": ["IN_APP"],
+                "dedupSince": now - timedelta(hours=a.cooldown)
+            }
+            for a in hits.itertuples(index=False)
+        ]
+
+    def _rule(
+        self,
+        name: str,
+        field: str,
+        operator: str,
+        value: float,
+        configs: pd.DataFrame,
+        user_id: str
+    ) -> Dict[str, Any]:
+        """AlertRule JSON in the same shape the Node service stores"""
+        return {
+            "name": name,
+            "conditions": [{"field": field, "operator": operator, "value": round(float(value), 2)}],
+            "enabled": True,
+            "channels": ["IN_APP"],
+            "cooldownHours": int(configs.at[user_id, 'cooldownHours'])
+        }
+
+    def _deduplicate(self, candidates: List[Dict[str, Any]], user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Drop candidates whose (user, type, dedupKey) was raised inside its window"""
+        if not candidates:
+            return []
+
+        keys = pd.DataFrame({
+            "userId": [c["userId"] for c in candidates],
+            "type": [c["type"] for c in candidates],
+            "dedupKey": [c["data"]["metadata"]["dedupKey"] for c in candidates],
+            "since": pd.to_datetime([c["dedupSince"] for c in candidates])
+        })
+
+        existing = fetch_alert_keys(user_ids, keys['since'].min())
+        matched = keys.reset_index().merge(existing, on=['userId', 'type', 'dedupKey'])
+        raised = matched.loc[matched['triggeredAt'] >= matched['since'], 'index'].unique()
+
+        keep = ~keys.index.isin(raised) & ~keys.duplicated(['userId', 'type', 'dedupKey'])
+
+        return [
+            {k: v for k, v in candidate.items() if k != "dedupSince"}
+            for candidate, kept in zip(candidates, keep)
+            if kept
+        ]
+
+
+# Singleton instance
+_alert_evaluator = None
+
+def get_alert_evaluator() -> AlertEvaluator:
+    """Get or create alert evaluator instance"""
+    global _alert_evaluator
+    if _alert_evaluator is None:
+        _alert_evaluator = AlertEvaluator(get_settings().alert_evaluation_interval_minutes)
+    return _alert_evaluator
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=Path(__file__).resolve().parents[2] / '.env')
+
+    summary = get_alert_evaluator().run()
+    sys.exit(0 if not summary["skipped"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Anomaly Stream - Real-time per-category anomaly scoring
+
+Keeps running amount statistics per (user, category) of EXPENSE
+transactions in category_stats: Welford count/mean/M2 for the z-score and
+a log-bucket sketch (services.aggregates) for a robust median/MAD score.
+Ingesting a transaction scores it against the statistics so far and
+folds it in with O(1) work under a row lock; the score is stored in
+anomaly_scores, so listing a user's anomalies is a read.
+
+Statistics are seeded from the last LOOKBACK_DAYS days on the first read
+or ingest for a user, and reseeded by the nightly batch, which also drops
+edited and deleted transactions from them.
+"""
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from sqlalchemy import text
+
+from analytics.database.connection import get_db_connection
+from analytics.database.queries import fetch_transactions
+from analytics.services.aggregates import bucket_values, sketch_buckets
+from analytics.services.encoding import type_mask
+from analytics.services.money import CENTS, cents_of
+
+# Same window and minimum group size as FinancialAdvisorAgent.find_anomalies
+LOOKBACK_DAYS = 60
+MIN_COUNT = 3
+# Scale that makes the MAD a consistent estimator of the standard deviation
+MAD_SCALE = 0.6745
+# Seeding takes per-user advisory locks (exclusive; ingests take them shared) in
+# (SEED_LOCK_NAMESPACE, hashtext(userId) & SEED_LOCK_SLOTS - 1), so a batch seed holds
+# a bounded number of locks
+SEED_LOCK_NAMESPACE = 41041
+SEED_LOCK_SLOTS = 256
+
+
+def welford_update(count: int, mean: float, m2: float, value: float) -> Tuple[int, float, float]:
+    """Running (count, mean, sum of squared deviations) with one more value"""
+    count += 1
+    delta = value - mean
+    mean += delta / count
+    m2 += delta * (value - mean)
+    return count, mean, m2
+
+
+def sketch_median_mad(sketch: Dict[str, int]) -> Tuple[Optional[float], Optional[float]]:
+    """Approximate median and median absolute deviation (currency units) from a bucket sketch"""
+    if not sketch:
+        return None, None
+
+    buckets = np.array([int(b) for b in sketch], dtype=np.int64)
+    counts = np.array(list(sketch.values()), dtype=np.int64)
+    values = bucket_values(buckets) / CENTS
+
+    median = _weighted_median(values, counts)
+    return median, _weighted_median(np.abs(values - median), counts)
+
+
+def _weighted_median(values: np.ndarray, counts: np.ndarray) -> float:
+    order = np.argsort(values, kind='stable')
+    cumulative = np.cumsum(counts[order])
+    return float(values[order][np.searchsorted(cumulative, (cumulative[-1] + 1) // 2)])
+
+
+def score_amount(count: int, mean: float, m2: float, sketch: Dict[str, int], amount: float) -> Dict[str, Any]:
+    """z-score and robust (median/MAD) score of an amount against running statistics"""
+    std = float(np.sqrt(m2 / (count - 1))) if count > 1 else 0.0
+    median, mad = sketch_median_mad(sketch)
+    scored = count >= MIN_COUNT
+
+    return {
+        "zScore": (amount - mean) / std if scored and std > 0 else None,
+        "robustScore": MAD_SCALE * (amount - median) / mad if scored and mad else None,
+        "mean": mean,
+        "std": std,
+        "median": median,
+        "count": count
+    }
+
+
+class AnomalyStream:
+    """Ingest-time anomaly scoring backed by category_stats and anomaly_scores"""
+
+    def ingest(self, transaction: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Score a new EXPENSE transaction and fold it into its category statistics
+
+        `transaction` has id, userId, amount, type, date and category (name).
+        Re-ingesting the same id returns the stored score without updating
+        the statistics again: the score row is checked under the category
+        row lock, so concurrent deliveries of one transaction fold it in once.
+        """
+        if transaction["type"] != 'EXPENSE' or not transaction.get("category"):
+            return {"transactionId": transaction["id"], "scored": False, "severity": None}
+
+        user_id = transaction["userId"]
+        category = transaction["category"]
+        amount = abs(float(transaction["amount"]))
+        bucket = str(int(sketch_buckets(np.array([round(amount * CENTS)]))[0]))
+
+        if not self.is_seeded(user_id):
+            # The window may already hold this transaction; its seeded score is returned below
+            self.seed(
+                fetch_transactions([user_id], datetime.now() - timedelta(days=LOOKBACK_DAYS)),
+                [user_id],
+                if_missing=True
+            )
+
+        engine = get_db_connection()
+        with engine.begin() as conn:
+            self._lock_users(conn, [user_id], shared=True)
+            conn.execute(text("""
+                INSERT INTO category_stats (id, "userId", category, count, mean, m2, sketch, "updatedAt")
+                VALUES (:id, :user_id, :category, 0, 0, 0, '{}'::jsonb, NOW())
+                ON CONFLICT ("userId", category) DO NOTHING
+            """), {"id": uuid.uuid4().hex, "user_id": user_id, "category": category})
+            count, mean, m2, sketch = conn.execute(text("""
+                SELECT count, mean, m2, sketch
+                FROM category_stats
+                WHERE "userId" = :user_id AND category = :category
+                FOR UPDATE
+            """), {"user_id": user_id, "category": category}).fetchone()
+
+            # Checked under the row lock: a concurrent delivery of this id has committed by now
+            existing = conn.execute(
+                text('SELECT "zScore", "robustScore", mean, std FROM anomaly_scores WHERE "transactionId" = :id'),
+                {"id": transaction["id"]}
+            ).fetchone()
+            if existing is not None:
+                return self._result(transaction, amount, {
+                    "zScore": existing[0], "robustScore": existing[1], "mean": existing[2], "std": existing[3]
+                })
+
+            # Scored against the history before this transaction, then folded in
+            score = score_amount(count, mean, m2, sketch, amount)
+            count, mean, m2 = welford_update(count, mean, m2, amount)
+            sketch[bucket] = sketch.get(bucket, 0) + 1
+
+            conn.execute(text("""
+                UPDATE category_stats
+                SET count = :count, mean = :mean, m2 = :m2, sketch = CAST(:sketch AS jsonb), "updatedAt" = NOW()
+                WHERE "userId" = :user_id AND category = :category
+            """), {
+                "count": count, "mean": mean, "m2": m2, "sketch": json.dumps(sketch),
+                "user_id": user_id, "category": category
+            })
+            self._save_scores(conn, [{
+                "transactionId": transaction["id"],
+                "userId": user_id,
+                "category": category,
+                "amount": amount,
+                "date": transaction["date"],
+                **score
+            }])
+
+        return self._result(transaction, amount, score)
+
+    def seed(self, df: pd.DataFrame, user_ids: List[str], if_missing: bool = False):
+        """
+        Replace the users' statistics and scores with those of a frame
+
+        `df` holds the users' COMPLETED transactions of the last
+        LOOKBACK_DAYS days. Scores use the statistics of the whole window,
+        like the on-demand scan. Seeds of the same user are serialized; with
+        `if_missing`, a user seeded meanwhile is left as is.
+        """
+        expenses = df[type_mask(df, 'EXPENSE') & df['category_name'].notna()]
+        rows = pd.DataFrame({
+            'transactionId': expenses['id'].to_numpy(),
+            'userId': expenses['userId'].to_numpy(),
+            'category': expenses['category_name'].astype(object).to_numpy(),
+            'amount': expenses['amount'].astype(float).abs().to_numpy(),
+            'date': expenses['date'].to_numpy(),
+            'bucket': sketch_buckets(cents_of(expenses).to_numpy())
+        })
+
+        grouped = rows.groupby(['userId', 'category'], sort=False)['amount']
+        count = grouped.transform('size')
+        mean = grouped.transform('mean')
+        std = grouped.transform('std').fillna(0.0)
+
+        stats = grouped.agg(['size', 'mean', 'var']).fillna(0.0)
+        stats['m2'] = stats['var'] * (stats['size'] - 1)
+        sketches = rows.groupby(['userId', 'category', 'bucket'], sort=False).size()
+        sketch_by_key: Dict[Tuple[str, str], Dict[str, int]] = {}
+        for (user_id, category, bucket), n in sketches.items():
+            sketch_by_key.setdefault((user_id, category), {})[str(bucket)] = int(n)
+
+        # Robust scores against each group's sketch
+        medians = {key: sketch_median_mad(sketch) for key, sketch in sketch_by_key.items()}
+        keys = list(zip(rows['userId'], rows['category']))
+        median = np.array([medians[k][0] for k in keys], dtype=float)
+        mad = np.array([medians[k][1] or np.nan for k in keys], dtype=float)
+        scored = (count >= MIN_COUNT).to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_score = np.where(scored & (std > 0).to_numpy(), (rows['amount'] - mean) / std, np.nan)
+            robust = np.where(scored, MAD_SCALE * (rows['amount'].to_numpy() - median) / mad, np.nan)
+
+        scores = rows.drop(columns='bucket').assign(
+            zScore=z_score, robustScore=robust, mean=mean.to_numpy(), std=std.to_numpy()
+        )
+        scores = scores.astype(object).where(scores.notna(), None)
+
+        engine = get_db_connection()
+        with engine.begin() as conn:
+            self._lock_users(conn, user_ids)
+            if if_missing and all(self._has_stats(conn, user_id) for user_id in user_ids):
+                return
+            conn.execute(text('DELETE FROM category_stats WHERE "userId" = ANY(:user_ids)'), {"user_ids": list(user_ids)})
+            conn.execute(
+                text('DELETE FROM anomaly_scores WHERE "userId" = ANY(:user_ids) AND date < :since'),
+                {"user_ids": list(user_ids), "since": datetime.now() - timedelta(days=LOOKBACK_DAYS)}
+            )
+            if not stats.empty:
+                conn.execute(text("""
+                    INSERT INTO category_stats (id, "userId", category, count, mean, m2, sketch, "updatedAt")
+                    VALUES (:id, :user_id, :category, :count, :mean, :m2, CAST(:sketch AS jsonb), NOW())
+                """), [
+                    {
+                        "id": uuid.uuid4().hex,
+                        "user_id": user_id,
+                        "category": category,
+                        "count": int(row['size']),
+                        "mean": float(row['mean']),
+                        "m2": float(row['m2']),
+                        "sketch": json.dumps(sketch_by_key[(user_id, category)])
+                    }
+                    for (user_id, category), row in stats.iterrows()
+                ])
+            self._save_scores(conn, scores.to_dict('records'))
+
+        logger.debug(f"Seeded anomaly statistics for {len(user_ids)} users ({len(stats)} categories)")
+
+    def stored_anomalies(self, user_id: str, sensitivity: float = 2.0) -> Optional[List[Dict[str, Any]]]:
+        """
+        Stored anomalies of the last LOOKBACK_DAYS days, as find_anomalies formats them
+
+        Returns None when the user's statistics were never seeded.
+        """
+        if not self.is_seeded(user_id):
+            return None
+
+        engine = get_db_connection()
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT "transactionId", date, category, amount, mean, std, "zScore", "robustScore"
+                FROM anomaly_scores
+                WHERE "userId" = :user_id
+                    AND date >= :since
+                    AND ABS("zScore") > :sensitivity
+                ORDER BY date DESC
+            """), {
+                "user_id": user_id,
+                "since": datetime.now() - timedelta(days=LOOKBACK_DAYS),
+                "sensitivity": sensitivity
+            }).fetchall()
+
+        return [
+            {
+                "transaction_id": r[0],
+                "date": r[1].isoformat() if r[1] else None,
+                "category": r[2],
+                "amount": float(r[3]),
+                "expected_range": {
+                    "min": float(r[4] - sensitivity * r[5]),
+                    "max": float(r[4] + sensitivity * r[5])
+                },
+                "severity": "high" if abs(r[6]) > 3 else "medium",
+                "z_score": round(float(r[6]), 2),
+                "robust_score": round(float(r[7]), 2) if r[7] is not None else None,
+                "description": f"Transação incomum: R$ {float(r[3]):.2f} (média: R$ {r[4]:.2f})"
+            }
+            for r in rows
+        ]
+
+    def is_seeded(self, user_id: str) -> bool:
+        """Whether the user has statistics (seeded or ingested)"""
+        engine = get_db_connection()
+        with engine.connect() as conn:
+            return self._has_stats(conn, user_id)
+
+    @staticmethod
+    def _has_stats(conn, user_id: str) -> bool:
+        row = conn.execute(
+            text('SELECT 1 FROM category_stats WHERE "userId" = :user_id LIMIT 1'),
+            {"user_id": user_id}
+        ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _lock_users(conn, user_ids: List[str], shared: bool = False):
+        """Take the users' seed locks until the end of the transaction (in slot order, so seeds can't deadlock)"""
+        function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+        conn.execute(text(f"""
+            SELECT {function}(:namespace, slot)
+            FROM (
+                SELECT DISTINCT hashtext(u) & :mask AS slot
+                FROM unnest(CAST(:user_ids AS text[])) AS u
+                ORDER BY slot
+            ) slots
+        """), {"namespace": SEED_LOCK_NAMESPACE, "mask": SEED_LOCK_SLOTS - 1, "user_ids": list(user_ids)})
+
+    def _save_scores(self, conn, scores: List[Dict[str, Any]]):
+        if not scores:
+            return
+
+        conn.execute(text("""
+            INSERT INTO anomaly_scores (
+                id, "transactionId", "userId", category, amount, date, "zScore", "robustScore", mean, std, "scoredAt"
+            )
+            VALUES (
+                :id, :transactionId, :userId, :category, :amount, :date, :zScore, :robustScore, :mean, :std, NOW()
+            )
+            ON CONFLICT ("transactionId") DO UPDATE
+            SET category = EXCLUDED.category,
+                amount = EXCLUDED.amount,
+                date = EXCLUDED.date,
+                "zScore" = EXCLUDED."zScore",
+                "robustScore" = EXCLUDED."robustScore",
+                mean = EXCLUDED.mean,
+                std = EXCLUDED.std,
+                "scoredAt" = EXCLUDED."scoredAt"
+        """), [
+            {
+                "id": uuid.uuid4().hex,
+                "transactionId": s["transactionId"],
+                "userId": s["userId"],
+                "category": s["category"],
+                "amount": s["amount"],
+                "date": s["date"],
+                "zScore": s["zScore"],
+                "robustScore": s["robustScore"],
+                "mean": s["mean"],
+                "std": s["std"]
+            }
+            for s in scores
+        ])
+
+    def _result(self, transaction: Dict[str, Any], amount: float, score: Dict[str, Any]) -> Dict[str, Any]:
+        z_score = score["zScore"]
+        return {
+            "transactionId": transaction["id"],
+            "scored": z_score is not None,
+            "zScore": round(z_score, 2) if z_score is not None else None,
+            "robustScore": round(score["robustScore"], 2) if score["robustScore"] is not None else None,
+            "mean": round(float(score["mean"]), 2),
+            "std": round(float(score["std"]), 2),
+            "amount": amount,
+            "severity": (
+                "high" if z_score is not None and abs(z_score) > 3
+                else "medium" if z_score is not None and abs(z_score) > 2
+                else None
+            )
+        }
+
+
+_anomaly_stream = None
+
+
+def get_anomaly_stream() -> AnomalyStream:
+    """Get or create the process-wide AnomalyStream"""
+    global _anomaly_stream
+    if _anomaly_stream is None:
+        _anomaly_stream = AnomalyStream()
+    return _anomaly_stream
@@ -0,0 +1,227 @@
+"""
+Batch Runner - Nightly analytics for every active user
+
+Splits active users into partitions by a stable hash of userId and runs
+the partitions in a process pool. Each partition loads transactions and
+goals for all of its users with one query each, computes insights,
+anomalies, at-risk goals, cash-flow projections and category analysis
+with grouped operations over the whole chunk, and upserts the results
+into analytics_snapshots, which the API serves without recomputing. The
+real-time anomaly statistics are reseeded from the same window, and each
+partition returns histograms of its users' savings rates and category
+spend, merged into the peer distributions (services.peer_distributions).
+The distributions are only replaced when every partition succeeded.
+
+Usage (from backend/):
+    python -m analytics.services.batch_runner [--partitions N] [--workers N]
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+import uuid
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from analytics.agents.financial_advisor import FinancialAdvisorAgent
+from analytics.agents.goals_advisor import GoalsAdvisorAgent
+from analytics.config import get_settings
+from analytics.database.queries import (
+    fetch_active_user_ids,
+    fetch_goals,
+    fetch_transactions,
+    save_population_distributions,
+    save_snapshots
+)
+from analytics.services.anomaly_stream import LOOKBACK_DAYS, get_anomaly_stream
+from analytics.services.budgets import load_budget_usage
+from analytics.services.cash_flow import HISTORY_DAYS, HORIZONS, load_projections
+from analytics.services.category_analysis import PERIOD_MONTHS, get_category_analyzer, window_days
+from analytics.services.feature_store import get_feature_store
+from analytics.services.peer_distributions import distribution_rows, merge_sketches, population_sketches
+
+# Same windows the on-demand endpoints use
+INSIGHTS_DAYS = 30
+ANOMALY_DAYS = LOOKBACK_DAYS
+GOALS_DAYS = 90
+MIN_ANOMALY_TRANSACTIONS = 10
+# The longest horizon; shorter ones are its prefixes (see "checkpoints")
+PROJECTION_DAYS = max(HORIZONS)
+
+
+def partition_for(user_id: str, partitions: int) -> int:
+    """Stable partition index for a user (same across runs and processes)"""
+    return zlib.crc32(user_id.encode("utf-8")) % partitions
+
+
+def partition_users(user_ids: List[str], partitions: int) -> List[Tuple[int, List[str]]]:
+    """Non-empty (index, user ids) chunks"""
+    chunks: Dict[int, List[str]] = {}
+    for user_id in user_ids:
+        chunks.setdefault(partition_for(user_id, partitions), []).append(user_id)
+    return sorted(chunks.items())
+
+
+def process_partition(user_ids: List[str], run_id: str, computed_at: datetime) -> Dict[str, Any]:
+    """
+    Compute and store snapshots for one chunk of users
+
+    Runs inside a worker process; returns counters for the run summary.
+    """
+    started = time.perf_counter()
+
+    category_months = PERIOD_MONTHS["month"]
+    covered_from = computed_at - timedelta(
+        days=max(GOALS_DAYS, HISTORY_DAYS, window_days(computed_at, category_months))
+    )
+    frame = fetch_transactions(user_ids, covered_from)
+    goals = fetch_goals(user_ids)
+    budget_usage = load_budget_usage(user_ids, computed_at, frame, covered_from)
+    projections = load_projections(user_ids, computed_at, PROJECTION_DAYS, frame, goals)
+    category_analysis = get_category_analyzer().analyze_batch(frame, user_ids, computed_at, category_months)
+    budgets_by_user = dict(tuple(budget_usage.groupby('userId')))
+
+    store = get_feature_store()
+    advisor = FinancialAdvisorAgent()
+    goals_agent = GoalsAdvisorAgent()
+
+    goal_features = store.compute_features_batch(
+        frame[frame['date'] >= computed_at - timedelta(days=GOALS_DAYS)],
+        GOALS_DAYS
+    )
+    insight_features = store.compute_features_batch(
+        frame[frame['date'] >= computed_at - timedelta(days=INSIGHTS_DAYS)],
+        INSIGHTS_DAYS
+    )
+
+    recent = frame[frame['date'] >= computed_at - timedelta(days=ANOMALY_DAYS)]
+    counts = recent['userId'].value_counts()
+    eligible = counts.index[counts >= MIN_ANOMALY_TRANSACTIONS]
+    anomalies = advisor.find_anomalies(recent[recent['userId'].isin(eligible)])
+    get_anomaly_stream().seed(recent, user_ids)
+
+    at_risk = goals_agent.assess_goal_risk(
+        goals,
+        {user_id: features['availableMonthly'] for user_id, features in goal_features.items()}
+    )
+
+    no_data = frame.iloc[0:0]
+    rows = []
+    for user_id in user_ids:
+        features = insight_features.get(user_id) or store.compute_features(no_data, INSIGHTS_DAYS, user_id=user_id)
+        insights = advisor.build_insights(features, INSIGHTS_DAYS, budgets_by_user.get(user_id))
+        rows.extend([
+            {"userId": user_id, "kind": "insights", "data": insights},
+            {"userId": user_id, "kind": "anomalies", "data": anomalies.get(user_id, [])},
+            {"userId": user_id, "kind": "at_risk_goals", "data": at_risk.get(user_id, [])},
+            {"userId": user_id, "kind": "cash_flow_projection", "data": projections[user_id]},
+            {"userId": user_id, "kind": "category_analysis", "data": category_analysis[user_id]}
+        ])
+
+    save_snapshots(rows, run_id, computed_at)
+
+    return {
+        "users": len(user_ids),
+        "transactions": len(frame),
+        "anomalies": sum(len(v) for v in anomalies.values()),
+        "atRiskGoals": sum(len(v) for v in at_risk.values()),
+        "distributions": population_sketches(insight_features),
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
+
+def run_nightly(partitions: Optional[int] = None, workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Process every active user and return a run summary
+
+    Args:
+        partitions: Number of userId hash partitions (default: BATCH_PARTITIONS)
+        workers: Worker processes (default: BATCH_WORKERS); 1 runs inline
+    """
+    settings = get_settings()
+    partitions = max(1, partitions or settings.batch_partitions)
+    workers = max(1, workers or settings.batch_workers)
+
+    run_id = uuid.uuid4().hex
+    computed_at = datetime.now()
+    started = time.perf_counter()
+
+    chunks = partition_users(fetch_active_user_ids(), partitions)
+
+    summary: Dict[str, Any] = {
+        "runId": run_id,
+        "computedAt": computed_at.isoformat(),
+        "partitions": len(chunks),
+        "workers": min(workers, len(chunks)),
+        "users": 0,
+        "transactions": 0,
+        "anomalies": 0,
+        "atRiskGoals": 0,
+        "failedPartitions": []
+    }
+    logger.info(f"🌙 Nightly batch {run_id}: {sum(len(ids) for _, ids in chunks)} users in {len(chunks)} partitions")
+    distributions: Dict[Any, Dict[str, int]] = {}
+
+    def collect(index: int, result: Dict[str, Any]):
+        for key in ("users", "transactions", "anomalies", "atRiskGoals"):
+            summary[key] += result[key]
+        merge_sketches(distributions, result["distributions"])
+        logger.info(f"Partition {index}: {result['users']} users in {result['seconds']}s")
+
+    if workers == 1 or len(chunks) <= 1:
+        for index, user_ids in chunks:
+            try:
+                collect(index, process_partition(user_ids, run_id, computed_at))
+            except Exception as e:
+                logger.error(f"Partition {index} failed: {e}")
+                summary["failedPartitions"].append(index)
+    else:
+        # spawn: workers must not inherit the parent's pooled DB connections
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=summary["workers"], mp_context=context) as pool:
+            futures = {
+                pool.submit(process_partition, user_ids, run_id, computed_at): index
+                for index, user_ids in chunks
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    collect(index, future.result())
+                except Exception as e:
+                    logger.error(f"Partition {index} failed: {e}")
+                    summary["failedPartitions"].append(index)
+
+    # Peer percentiles need the whole population: any failed partition keeps the previous one
+    if summary["failedPartitions"]:
+        summary["distributionsSkipped"] = "failed partitions"
+        logger.warning(f"Keeping the previous population distributions: partitions {summary['failedPartitions']} failed")
+    elif summary["users"]:
+        rows = distribution_rows(distributions)
+        save_population_distributions(rows, run_id, computed_at)
+        summary["distributions"] = len(rows)
+
+    summary["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"🌙 Nightly batch {run_id} finished in {summary['seconds']}s")
+    return summary
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=Path(__file__).resolve().parents[2] / '.env')
+
+    parser = argparse.ArgumentParser(description="Nightly analytics batch")
+    parser.add_argument("--partitions", type=int, default=None, help="userId hash partitions")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    args = parser.parse_args()
+
+    summary = run_nightly(args.partitions, args.workers)
+    sys.exit(1 if summary["failedPartitions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
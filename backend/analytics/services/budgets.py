@@ -0,0 +1,145 @@
+"""
+Budget matching - Interval join of transactions to budget periods
+
+Assigns each expense to the budgets of its category whose
+[startDate, endDate] contains it using sorted merge_asof passes instead of
+per-budget filtering or a category cross join, so years of history stay
+O((n + m) log m) for n transactions and m budgets.
+"""
+import heapq
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.database.queries import fetch_budgets, fetch_transactions
+from analytics.services.encoding import type_mask
+from analytics.services.money import cents_of, from_cents, percent
+
+KEYS = ['userId', 'userCategoryId']
+
+
+def assign_budgets(budgets: pd.DataFrame, transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (budget, EXPENSE transaction inside the budget period)
+
+    Budgets of the same category may overlap (e.g. a monthly and a yearly
+    one); they are split into layers of non-overlapping intervals and each
+    layer is matched with a single merge_asof, so a transaction counts
+    towards every budget that contains it.
+
+    Returns columns: budgetId, userId, userCategoryId, date, amountCents
+    """
+    columns = ['budgetId', 'userId', 'userCategoryId', 'date', 'amountCents']
+
+    is_expense = type_mask(transactions, 'EXPENSE') & transactions['userCategoryId'].notna()
+    expenses = transactions.loc[is_expense, KEYS + ['date']]
+    intervals = budgets.loc[budgets['userCategoryId'].notna(), ['id'] + KEYS + ['startDate', 'endDate']]
+
+    if expenses.empty or intervals.empty:
+        return pd.DataFrame(columns=columns)
+
+    expenses = expenses.assign(
+        date=pd.to_datetime(expenses['date']).astype('datetime64[ns]'),
+        amountCents=cents_of(transactions.loc[is_expense])
+    ).sort_values('date')
+    intervals = intervals.assign(
+        startDate=pd.to_datetime(intervals['startDate']).astype('datetime64[ns]'),
+        endDate=pd.to_datetime(intervals['endDate']).astype('datetime64[ns]')
+    )
+
+    matches = []
+    for layer in _non_overlapping_layers(intervals):
+        matched = pd.merge_asof(
+            expenses,
+            layer.sort_values('startDate'),
+            left_on='date',
+            right_on='startDate',
+            by=KEYS,
+            direction='backward'
+        )
+        # Latest budget starting before the transaction; it must also not have ended
+        matched = matched[matched['date'] <= matched['endDate']]
+        matches.append(matched[['id'] + KEYS + ['date', 'amountCents']])
+
+    return pd.concat(matches, ignore_index=True).rename(columns={'id': 'budgetId'})
+
+
+def _non_overlapping_layers(intervals: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    """
+    Split budgets into layers with no overlap inside a category
+
+    Interval coloring sweep: budgets are taken by start date and each one
+    reuses the layer (of its category) that ended first if that layer ended
+    strictly before it starts; otherwise it opens a new layer. Periods are
+    closed, so a budget starting on another's endDate shares that instant
+    and goes to another layer. The number of layers is the maximum number
+    of budgets of a category covering one instant, not the number of budgets.
+    """
+    ordered = intervals.sort_values(KEYS + ['startDate'])
+    layers = np.empty(len(ordered), dtype=np.int64)
+    # Per category: heap of (latest end, layer), one entry per layer
+    open_layers: Dict[Tuple, List[Tuple[pd.Timestamp, int]]] = {}
+
+    rows = zip(zip(*[ordered[k] for k in KEYS]), ordered['startDate'], ordered['endDate'])
+    for i, (key, start, end) in enumerate(rows):
+        heap = open_layers.setdefault(key, [])
+        if heap and heap[0][0] < start:
+            layer = heapq.heapreplace(heap, (end, heap[0][1]))[1]
+        else:
+            layer = len(heap)
+            heapq.heappush(heap, (end, layer))
+        layers[i] = layer
+
+    for layer in range(int(layers.max()) + 1 if len(layers) else 0):
+        yield ordered[layers == layer]
+
+
+def compute_budget_usage(budgets: pd.DataFrame, transactions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Spending per budget period
+
+    Returns the budgets with `spentCents`, `spent`, `transactionCount`,
+    `remaining` and `percentage` columns added. Sums are exact integer
+    cents; `spent` and `remaining` are their currency views.
+    """
+    usage = budgets.copy()
+    budget_cents = cents_of(usage).astype(np.int64)
+    usage['amountCents'] = budget_cents
+    usage['amount'] = from_cents(budget_cents.to_numpy())
+
+    matches = assign_budgets(budgets, transactions)
+    totals = matches.groupby('budgetId')['amountCents'].agg(['sum', 'count'])
+
+    spent = usage['id'].map(totals['sum']).fillna(0).astype(np.int64)
+    usage['spentCents'] = spent
+    usage['spent'] = from_cents(spent.to_numpy())
+    usage['transactionCount'] = usage['id'].map(totals['count']).fillna(0).astype(int)
+    usage['remaining'] = from_cents((budget_cents - spent).to_numpy())
+    usage['percentage'] = percent(spent.to_numpy(), budget_cents.to_numpy())
+
+    return usage
+
+
+def load_budget_usage(
+    user_ids: List[str],
+    now: datetime,
+    transactions: Optional[pd.DataFrame] = None,
+    covered_from: Optional[datetime] = None
+) -> pd.DataFrame:
+    """
+    Current budgets of the users with their spending
+
+    `transactions` (COMPLETED, loaded from `covered_from`) is reused when it
+    covers every budget period; otherwise the needed range is loaded.
+    """
+    budgets = fetch_budgets(user_ids, now)
+    if budgets.empty:
+        return compute_budget_usage(budgets, pd.DataFrame(columns=KEYS + ['type', 'date', 'amountCents']))
+
+    start = budgets['startDate'].min()
+    if transactions is None or covered_from is None or covered_from > start:
+        transactions = fetch_transactions(user_ids, start)
+
+    return compute_budget_usage(budgets, transactions)
@@ -0,0 +1,105 @@
+"""
+Result Cache - In-process per-user cache for frames, features and reports
+
+Entries are keyed by (namespace, user_id, key) so everything computed for a
+user can be invalidated at once when their data changes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+_MISSING = object()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with per-entry TTL and per-user invalidation"""
+
+    def __init__(self, max_entries: int = 5000, default_ttl: float = 900.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[Tuple[str, str, Hashable], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: str, user_id: str, key: Hashable = None, default: Any = None) -> Any:
+        """Cached value, or `default` when missing or expired"""
+        cache_key = (namespace, user_id, key)
+        with self._lock:
+            entry = self._entries.get(cache_key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._entries[cache_key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, namespace: str, user_id: str, value: Any, key: Hashable = None, ttl: Optional[float] = None):
+        """Store a value, evicting least recently used entries beyond capacity"""
+        expires = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[(namespace, user_id, key)] = (expires, value)
+            self._entries.move_to_end((namespace, user_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str, namespace: Optional[str] = None, keys: Optional[Iterable[Hashable]] = None) -> int:
+        """Drop a user's entries (optionally only one namespace, or some keys of it); returns count removed"""
+        only = set(keys) if keys is not None else None
+        with self._lock:
+            keys = [
+                k for k in self._entries
+                if k[1] == user_id
+                and (namespace is None or k[0] == namespace)
+                and (only is None or k[2] in only)
+            ]
+            for k in keys:
+                del self._entries[k]
+        return len(keys)
+
+    def extend(self, user_id: str, ttl: float) -> int:
+        """Keep all of a user's entries for at least `ttl` more seconds; returns count extended"""
+        now = time.monotonic()
+        expires = now + ttl
+        with self._lock:
+            keys = [k for k, entry in self._entries.items() if k[1] == user_id and now <= entry[0] < expires]
+            for k in keys:
+                self._entries[k] = (expires, self._entries[k][1])
+        return len(keys)
+
+    def keys(self, user_id: str, namespace: str) -> List[Hashable]:
+        """Live keys cached for a user in a namespace"""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                k[2] for k, entry in self._entries.items()
+                if k[0] == namespace and k[1] == user_id and entry[0] >= now
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total * 100, 1) if total else 0.0
+            }
+
+
+# Singleton instance
+_result_cache = None
+
+def get_result_cache() -> ResultCache:
+    """Get or create result cache instance"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
@@ -0,0 +1,254 @@
+"""
+Cash-Flow Projector - Day-by-day projected balance
+
+Lays every user's expected cash movements on a calendar grid (users x days):
+recurring transactions on their next due dates, average discretionary
+spending on every day and goal contributions on the first day of each month
+until the goal deadline. The projected balance is the running sum of the
+grid from the current account balance, so a whole chunk of users is
+projected with a handful of array operations.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.database.queries import fetch_accounts, fetch_goals, fetch_transactions
+from analytics.services.alert_evaluator import NON_CASH_ACCOUNTS
+from analytics.services.encoding import type_mask
+from analytics.services.money import from_cents
+from analytics.services.recurring import detect_recurring, expand_occurrences
+
+HORIZONS = (30, 90, 365)
+# Enough history for several monthly and two quarterly occurrences
+HISTORY_DAYS = 180
+# Discretionary averages use at least a month, so new users don't extrapolate a few days
+MIN_DISCRETIONARY_DAYS = 30
+
+
+class CashFlowProjector:
+    """
+    Vectorized cash-flow projection for many users at once
+
+    Active recurring series (services.recurring) are projected on their
+    predicted dates; every other expense counts as discretionary spending.
+    """
+
+    def __init__(self, history_days: int = HISTORY_DAYS):
+        self.history_days = history_days
+
+    def project(
+        self,
+        user_ids: List[str],
+        transactions: pd.DataFrame,
+        balances: Dict[str, float],
+        goals: pd.DataFrame,
+        horizon_days: int = 90,
+        start: Optional[datetime] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Project the balance of every user for the next `horizon_days` days
+
+        Args:
+            user_ids: Users to project (users without data get a flat line)
+            transactions: COMPLETED transactions of the history window
+            balances: Current cash balance per userId
+            goals: Goals of the users (fetch_goals columns)
+            horizon_days: Days to project
+            start: Projection reference date (default: now)
+
+        Returns:
+            One projection dict per userId
+        """
+        start = pd.Timestamp(start or datetime.now()).normalize()
+        users = pd.Index(pd.unique(pd.Series(list(user_ids), dtype=object)))
+        dates = pd.date_range(start + timedelta(days=1), periods=horizon_days, freq='D')
+        shape = (len(users), horizon_days)
+
+        series, recurring_ids = detect_recurring(transactions, now=start)
+        series = series[series['active'] & series['userId'].isin(users)].reset_index(drop=True)
+        upcoming = expand_occurrences(series, start, dates[-1])
+
+        # Recurring occurrences scattered onto the grid
+        income = np.zeros(shape)
+        expenses = np.zeros(shape)
+        if not upcoming.empty:
+            idx = upcoming['series'].to_numpy()
+            rows = users.get_indexer(series['userId'])[idx]
+            cols = (upcoming['date'] - dates[0]).dt.days.to_numpy()
+            amounts = series['amount'].to_numpy(dtype=float)[idx]
+            is_income = (series['type'] == 'INCOME').to_numpy()[idx]
+            np.add.at(income, (rows[is_income], cols[is_income]), amounts[is_income])
+            np.add.at(expenses, (rows[~is_income], cols[~is_income]), amounts[~is_income])
+        series['upcomingDate'] = upcoming.groupby('series')['date'].min().reindex(series.index)
+
+        discretionary = self._discretionary_daily(transactions, recurring_ids, start).reindex(users, fill_value=0.0)
+        contributions, goal_rows = self._goal_contributions(goals, users, dates, start)
+
+        outflow = expenses + discretionary.to_numpy()[:, None] + contributions
+        opening = pd.Series(balances, dtype=float).reindex(users, fill_value=0.0).to_numpy()
+        balance = opening[:, None] + np.cumsum(income - outflow, axis=1)
+
+        lowest = balance.argmin(axis=1)
+        negative = balance < 0
+        first_negative = np.where(negative.any(axis=1), negative.argmax(axis=1), -1)
+
+        date_strings = dates.strftime('%Y-%m-%d').tolist()
+        checkpoints = [h for h in HORIZONS if h <= horizon_days] or [horizon_days]
+        series_by_user = {user_id: group for user_id, group in series.groupby('userId', sort=False)}
+
+        results = {}
+        for i, user_id in enumerate(users):
+            results[user_id] = {
+                "userId": user_id,
+                "horizonDays": horizon_days,
+                "startDate": start.strftime('%Y-%m-%d'),
+                "startingBalance": round(float(opening[i]), 2),
+                "endingBalance": round(float(balance[i, -1]), 2),
+                "lowestBalance": round(float(balance[i, lowest[i]]), 2),
+                "lowestBalanceDate": date_strings[lowest[i]],
+                "firstNegativeDate": date_strings[first_negative[i]] if first_negative[i] >= 0 else None,
+                "checkpoints": [
+                    {"days": h, "date": date_strings[h - 1], "balance": round(float(balance[i, h - 1]), 2)}
+                    for h in checkpoints
+                ],
+                "totals": {
+                    "recurringIncome": round(float(income[i].sum()), 2),
+                    "recurringExpenses": round(float(expenses[i].sum()), 2),
+                    "discretionarySpending": round(float(discretionary.iat[i] * horizon_days), 2),
+                    "goalContributions": round(float(contributions[i].sum()), 2)
+                },
+                "dailyDiscretionary": round(float(discretionary.iat[i]), 2),
+                "recurring": self._describe_series(series_by_user.get(user_id)),
+                "goals": goal_rows.get(user_id, []),
+                "daily": [
+                    {"date": d, "inflow": inflow, "outflow": out, "balance": bal}
+                    for d, inflow, out, bal in zip(
+                        date_strings,
+                        np.round(income[i], 2).tolist(),
+                        np.round(outflow[i], 2).tolist(),
+                        np.round(balance[i], 2).tolist()
+                    )
+                ]
+            }
+
+        return results
+
+    def _discretionary_daily(
+        self,
+        transactions: pd.DataFrame,
+        recurring_ids: pd.Index,
+        start: pd.Timestamp
+    ) -> pd.Series:
+        """Average daily non-recurring expenses per userId"""
+        expenses = transactions[type_mask(transactions, 'EXPENSE') & ~transactions['id'].isin(recurring_ids)]
+        if expenses.empty:
+            return pd.Series(dtype=float)
+
+        by_user = expenses.groupby('userId', sort=False)
+        first_seen = transactions.groupby('userId', sort=False)['date'].min().reindex(by_user.size().index)
+        days = ((start - first_seen.dt.normalize()).dt.days).clip(lower=MIN_DISCRETIONARY_DAYS, upper=self.history_days)
+        return by_user['amount'].sum().astype(float) / days
+
+    def _goal_contributions(
+        self,
+        goals: pd.DataFrame,
+        users: pd.Index,
+        dates: pd.DatetimeIndex,
+        start: pd.Timestamp
+    ):
+        """
+        Monthly goal contributions on the grid
+
+        Each ACTIVE goal with a future deadline receives the missing amount
+        split evenly over the month starts left until its deadline (all of
+        it tomorrow when no month start is left). Returns the (users x days)
+        outflow and the per-user contribution plan.
+        """
+        contributions = np.zeros((len(users), len(dates)))
+        if goals.empty:
+            return contributions, {}
+
+        remaining = goals['targetAmount'].astype(float) - goals['currentAmount'].astype(float)
+        active = goals[
+            (goals['status'] == 'ACTIVE')
+            & goals['targetDate'].notna()
+            & (goals['targetDate'] > start)
+            & (remaining > 0)
+            & goals['userId'].isin(users)
+        ]
+        if active.empty:
+            return contributions, {}
+
+        remaining = remaining[active.index].to_numpy()
+        deadline = active['targetDate'].dt.normalize()
+        # Month starts in (start, deadline]
+        months_left = ((deadline.dt.year - start.year) * 12 + deadline.dt.month - start.month).to_numpy()
+        monthly = remaining / np.maximum(months_left, 1)
+
+        month_start = (dates.day == 1)
+        due = month_start[None, :] & (dates.to_numpy()[None, :] <= deadline.to_numpy()[:, None])
+        due[months_left < 1, 0] = True
+
+        rows = users.get_indexer(active['userId'])
+        np.add.at(contributions, rows, due * monthly[:, None])
+
+        plan: Dict[str, List[Dict[str, Any]]] = {}
+        for goal, amount, months in zip(active.itertuples(index=False), monthly, months_left):
+            plan.setdefault(goal.userId, []).append({
+                "goalId": goal.id,
+                "name": goal.name,
+                "monthlyContribution": round(float(amount), 2),
+                "monthsLeft": int(max(months, 1)),
+                "targetDate": goal.targetDate.isoformat()
+            })
+
+        return contributions, plan
+
+    def _describe_series(self, series: Optional[pd.DataFrame]) -> List[Dict[str, Any]]:
+        if series is None:
+            return []
+
+        return [
+            {
+                "description": s.description,
+                "category": s.category,
+                "type": s.type,
+                "amount": round(float(s.amount), 2),
+                "cadence": s.cadence,
+                "occurrences": int(s.occurrences),
+                "nextDate": s.upcomingDate.strftime('%Y-%m-%d') if pd.notna(s.upcomingDate) else None
+            }
+            for s in series.sort_values('amount', ascending=False).itertuples(index=False)
+        ]
+
+
+def load_projections(
+    user_ids: List[str],
+    now: datetime,
+    horizon_days: int = 90,
+    transactions: Optional[pd.DataFrame] = None,
+    goals: Optional[pd.DataFrame] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Cash-flow projections for the users
+
+    `transactions` (COMPLETED) and `goals` are reused when given; otherwise
+    they are loaded. Only the last HISTORY_DAYS days of transactions are
+    used, so a longer frame (the nightly batch's) projects the same as an
+    on-demand request.
+    """
+    history_start = now - timedelta(days=HISTORY_DAYS)
+    if transactions is None:
+        transactions = fetch_transactions(user_ids, history_start)
+    else:
+        transactions = transactions[transactions['date'] >= history_start]
+    if goals is None:
+        goals = fetch_goals(user_ids)
+
+    accounts = fetch_accounts(user_ids)
+    cash = accounts[~accounts['type'].isin(NON_CASH_ACCOUNTS)]
+    balances = {user_id: from_cents(cents) for user_id, cents in cash.groupby('userId')['balanceCents'].sum().items()}
+
+    return CashFlowProjector().project(user_ids, transactions, balances, goals, horizon_days, now)
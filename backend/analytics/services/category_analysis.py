@@ -0,0 +1,382 @@
+"""
+Category Analysis - Monthly category spending matrices and clustering
+
+Builds a (user, category) x month spending matrix for any number of users,
+derives trend and volatility for every row with matrix operations, and
+groups each user's categories by spending profile with a batched NumPy
+k-means that clusters all users at once. Over a batch of users it also
+segments the users themselves by how their spending is split.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.services.cache import ResultCache, get_result_cache
+from analytics.services.encoding import fill_category, type_mask
+from analytics.services.feature_store import get_feature_store
+from analytics.services.money import CENTS, cents_of
+
+NAMESPACE = "category_analysis"
+# Complete months analyzed per period
+PERIOD_MONTHS = {"month": 6, "quarter": 12, "year": 24}
+CATEGORY_CLUSTERS = 3
+USER_SEGMENTS = 4
+# Results only change with the data (the key holds the watermark), so keep them a day
+CACHE_TTL = 24 * 3600
+# Relative monthly trend (% of the average) and volatility (std / mean) that label a profile
+TREND_THRESHOLD = 10.0
+VOLATILITY_THRESHOLD = 0.5
+
+
+def kmeans(
+    X: np.ndarray,
+    k: int,
+    mask: Optional[np.ndarray] = None,
+    max_iter: int = 50
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched k-means: clusters every group of points independently, all at once
+
+    Deterministic farthest-point initialization from each group's first
+    valid point, then Lloyd iterations on the whole (groups, points, k)
+    distance tensor until no label changes. Groups with fewer than `k`
+    points simply leave clusters empty.
+
+    Args:
+        X: (groups, points, features); masked points must be finite
+        k: Clusters per group
+        mask: (groups, points) valid points (default: all)
+        max_iter: Iteration cap
+
+    Returns:
+        labels (groups, points; -1 for masked points), centroids (groups, k, features)
+    """
+    groups, points, _ = X.shape
+    mask = np.ones((groups, points), dtype=bool) if mask is None else mask
+    X = np.where(mask[:, :, None], X, 0.0)
+    rows = np.arange(groups)
+
+    centroids = np.empty((groups, k, X.shape[2]))
+    centroids[:, 0] = X[rows, mask.argmax(axis=1)]
+    closest = np.full((groups, points), np.inf)
+    for j in range(1, k):
+        closest = np.minimum(closest, ((X - centroids[:, j - 1, None, :]) ** 2).sum(axis=2))
+        centroids[:, j] = X[rows, np.where(mask, closest, -1.0).argmax(axis=1)]
+
+    labels = np.full((groups, points), -1)
+    for _ in range(max_iter):
+        distances = ((X[:, :, None, :] - centroids[:, None, :, :]) ** 2).sum(axis=3)
+        assigned = np.where(mask, distances.argmin(axis=2), -1)
+        if np.array_equal(assigned, labels):
+            break
+        labels = assigned
+
+        members = labels[:, :, None] == np.arange(k)
+        counts = members.sum(axis=1)
+        sums = np.einsum('gnk,gnf->gkf', members, X)
+        centroids = np.where(counts[:, :, None] > 0, sums / np.maximum(counts, 1)[:, :, None], centroids)
+
+    return labels, centroids
+
+
+def analysis_months(now: datetime, months: int) -> pd.PeriodIndex:
+    """The `months` complete calendar months before `now`"""
+    current = pd.Period(now, freq='M')
+    return pd.period_range(current - months, current - 1, freq='M')
+
+
+def window_days(now: datetime, months: int) -> int:
+    """Days of history covering the analyzed months and the current one"""
+    return (pd.Timestamp(now) - analysis_months(now, months)[0].start_time).days + 1
+
+
+class CategoryAnalyzer:
+    """Category spending profiles for one user or a batch of users"""
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or get_result_cache()
+
+    async def analyze_user(self, user_id: str, period: str = "month", now: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Category analysis for one user, cached per user-month
+
+        The cache key holds the feature store watermark, so an entry lives
+        until the month turns or the user's transactions change.
+        """
+        now = now or datetime.now()
+        months = PERIOD_MONTHS.get(period, PERIOD_MONTHS["month"])
+        days = window_days(now, months)
+
+        store = get_feature_store()
+        watermark = (await store.get_features(user_id, days))["watermark"]
+        key = (period, now.strftime('%Y-%m'), watermark["updatedAt"], watermark["count"])
+
+        analysis = self.cache.get(NAMESPACE, user_id, key)
+        if analysis is None:
+            frame = await store.get_frame(user_id, days)
+            analysis = self.analyze_batch(frame, [user_id], now, months, segment_users=False)[user_id]
+            analysis["period"] = period
+            self.cache.set(NAMESPACE, user_id, analysis, key=key, ttl=CACHE_TTL)
+
+        return analysis
+
+    def analyze_batch(
+        self,
+        df: pd.DataFrame,
+        user_ids,
+        now: datetime,
+        months: int = PERIOD_MONTHS["month"],
+        segment_users: bool = True
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Category analysis for every user in a multi-user frame
+
+        Args:
+            df: COMPLETED transactions covering `window_days(now, months)`
+            user_ids: Users to analyze (users without expenses get empty results)
+            now: Reference date; the current month is reported month-to-date
+            months: Complete months in the matrix
+            segment_users: Also cluster the users of the batch by spending split
+        """
+        periods = analysis_months(now, months)
+        labels = [str(p) for p in periods]
+        current = pd.Period(now, freq='M')
+
+        expenses = df[type_mask(df, 'EXPENSE') & (df['date'] >= periods[0].start_time)]
+        month = expenses['date'].dt.to_period('M')
+        in_matrix = (month <= periods[-1]).to_numpy()
+        keys = pd.DataFrame({
+            'userId': expenses['userId'].to_numpy(),
+            'category': fill_category(expenses['category_name'], 'Outros').to_numpy()
+        })
+        row = keys.groupby(['userId', 'category'], sort=True).ngroup().to_numpy()
+        index = keys.drop_duplicates().sort_values(['userId', 'category'], ignore_index=True)
+
+        # (user, category) x month spending matrix, plus the current month to date,
+        # accumulated in exact integer cents
+        amount = cents_of(expenses).to_numpy()
+        col = (month.dt.year * 12 + month.dt.month).to_numpy() - (periods[0].year * 12 + periods[0].month)
+        matrix = np.zeros((len(index), months), dtype=np.int64)
+        np.add.at(matrix, (row[in_matrix], col[in_matrix]), amount[in_matrix])
+        month_to_date = np.zeros(len(index), dtype=np.int64)
+        np.add.at(month_to_date, row[~in_matrix], amount[~in_matrix])
+        matrix = matrix / CENTS
+        month_to_date = month_to_date / CENTS
+
+        stats = self._row_stats(matrix)
+        user_totals = pd.Series(stats['total']).groupby(index['userId'].to_numpy()).transform('sum').to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stats['share'] = np.where(user_totals > 0, stats['total'] / user_totals * 100, 0.0)
+
+        clusters = self._cluster_categories(index, stats)
+        segments = self._segment_users(index, stats) if segment_users else {}
+
+        results = {}
+        for user_id in user_ids:
+            results[user_id] = {
+                "userId": user_id,
+                "months": labels,
+                "currentMonth": str(current),
+                "categories": [],
+                "clusters": [],
+                "totals": {"monthly": [0.0] * months, "average": 0.0, "trend": 0.0, "currentMonth": 0.0},
+                "segment": segments.get(user_id),
+                "insights": []
+            }
+
+        starts = np.flatnonzero(index['userId'] != index['userId'].shift())
+        for start, end in zip(starts, np.append(starts[1:], len(index))):
+            user_id = index.at[start, 'userId']
+            if user_id not in results:
+                continue
+
+            result = results[user_id]
+            rows = range(start, end)
+            monthly_total = matrix[start:end].sum(axis=0)
+            total_stats = self._row_stats(monthly_total[None, :])
+
+            result["categories"] = sorted(
+                (
+                    {
+                        "category": index.at[i, 'category'],
+                        "monthly": np.round(matrix[i], 2).tolist(),
+                        "total": round(float(stats['total'][i]), 2),
+                        "average": round(float(stats['mean'][i]), 2),
+                        "share": round(float(stats['share'][i]), 1),
+                        "trend": round(float(stats['trend'][i]), 1),
+                        "volatility": round(float(stats['volatility'][i]), 2),
+                        "activeMonths": int(stats['active'][i]),
+                        "currentMonth": round(float(month_to_date[i]), 2),
+                        "cluster": int(clusters['labels'][i])
+                    }
+                    for i in rows
+                ),
+                key=lambda c: c["total"],
+                reverse=True
+            )
+            result["clusters"] = clusters['summaries'].get(user_id, [])
+            result["totals"] = {
+                "monthly": np.round(monthly_total, 2).tolist(),
+                "average": round(float(total_stats['mean'][0]), 2),
+                "trend": round(float(total_stats['trend'][0]), 1),
+                "currentMonth": round(float(month_to_date[start:end].sum()), 2)
+            }
+            result["insights"] = self._insights(result)
+
+        return results
+
+    def _row_stats(self, matrix: np.ndarray) -> Dict[str, np.ndarray]:
+        """Total, mean, relative trend (% of mean per month), volatility (CV) and active months per row"""
+        months = matrix.shape[1]
+        x = np.arange(months) - (months - 1) / 2
+        mean = matrix.mean(axis=1)
+        slope = (matrix @ x) / max(float((x ** 2).sum()), 1.0)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend = np.where(mean > 0, slope / mean * 100, 0.0)
+            volatility = np.where(mean > 0, matrix.std(axis=1) / mean, 0.0)
+
+        return {
+            'total': matrix.sum(axis=1),
+            'mean': mean,
+            'trend': trend,
+            'volatility': volatility,
+            'active': (matrix > 0).sum(axis=1)
+        }
+
+    def _cluster_categories(self, index: pd.DataFrame, stats: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """
+        Cluster each user's categories on (size, trend, volatility)
+
+        Features are standardized within each user, so clusters separate a
+        user's categories from each other rather than from other users'.
+        """
+        if index.empty:
+            return {'labels': np.empty(0, dtype=int), 'summaries': {}}
+
+        user_codes, users = pd.factorize(index['userId'])
+        position = index.groupby('userId', sort=False).cumcount().to_numpy()
+        features = np.column_stack([np.log1p(stats['mean']), stats['trend'] / 100, stats['volatility']])
+
+        # Pad into (users, categories, features) so every user is clustered in one call
+        X = np.zeros((len(users), position.max() + 1, features.shape[1]))
+        mask = np.zeros(X.shape[:2], dtype=bool)
+        X[user_codes, position] = features
+        mask[user_codes, position] = True
+
+        count = mask.sum(axis=1)[:, None, None]
+        mean = X.sum(axis=1, keepdims=True) / count
+        std = np.sqrt((((X - mean) * mask[:, :, None]) ** 2).sum(axis=1, keepdims=True) / count)
+        X = np.where(std > 0, (X - mean) / np.where(std > 0, std, 1.0), 0.0)
+
+        labels, _ = kmeans(X, CATEGORY_CLUSTERS, mask)
+        row_labels = labels[user_codes, position]
+
+        # Describe clusters in original units; numbered by total spending
+        rows = pd.DataFrame({
+            'userId': index['userId'].to_numpy(),
+            'category': index['category'].to_numpy(),
+            'cluster': row_labels,
+            'total': stats['total'],
+            'share': stats['share'],
+            'trend': stats['trend'],
+            'volatility': stats['volatility']
+        })
+        summary = rows.groupby(['userId', 'cluster'], sort=False).agg(
+            total=('total', 'sum'),
+            share=('share', 'sum'),
+            trend=('trend', 'mean'),
+            volatility=('volatility', 'mean'),
+            categories=('category', list)
+        ).reset_index().sort_values(['userId', 'total'], ascending=[True, False])
+        summary['id'] = summary.groupby('userId', sort=False).cumcount()
+        summary['profile'] = np.select(
+            [summary['trend'] >= TREND_THRESHOLD, summary['trend'] <= -TREND_THRESHOLD,
+             summary['volatility'] >= VOLATILITY_THRESHOLD],
+            ["rising", "declining", "volatile"],
+            default="steady"
+        )
+
+        renumber = summary.set_index(['userId', 'cluster'])['id']
+        row_labels = renumber.reindex(pd.MultiIndex.from_arrays([rows['userId'], rows['cluster']])).to_numpy()
+
+        summaries: Dict[str, list] = {}
+        for s in summary.itertuples(index=False):
+            summaries.setdefault(s.userId, []).append({
+                "id": int(s.id),
+                "profile": s.profile,
+                "categories": s.categories,
+                "total": round(float(s.total), 2),
+                "share": round(float(s.share), 1),
+                "trend": round(float(s.trend), 1),
+                "volatility": round(float(s.volatility), 2)
+            })
+
+        return {'labels': row_labels, 'summaries': summaries}
+
+    def _segment_users(self, index: pd.DataFrame, stats: Dict[str, np.ndarray]) -> Dict[str, Dict[str, Any]]:
+        """
+        Cluster the users of the batch by how their spending splits across categories
+
+        Segments are relative to the users analyzed together (a nightly
+        partition is a random sample of the user base).
+        """
+        spending = index.assign(share=stats['share'] / 100)
+        spending = spending[stats['total'] > 0]
+        if spending.empty:
+            return {}
+
+        shares = spending.pivot_table(index='userId', columns='category', values='share', fill_value=0.0)
+        k = min(USER_SEGMENTS, len(shares))
+        labels, centroids = kmeans(shares.to_numpy()[None, :, :], k)
+        labels, centroids = labels[0], centroids[0]
+        sizes = np.bincount(labels, minlength=k)
+
+        categories = shares.columns.to_numpy()
+        top = np.argsort(-centroids, axis=1)[:, :3]
+        described = [
+            {
+                "id": int(j),
+                "size": int(sizes[j]),
+                "topCategories": [
+                    {"category": categories[c], "share": round(float(centroids[j, c] * 100), 1)}
+                    for c in top[j] if centroids[j, c] > 0
+                ]
+            }
+            for j in range(k)
+        ]
+
+        return {user_id: described[label] for user_id, label in zip(shares.index, labels)}
+
+    def _insights(self, analysis: Dict[str, Any]) -> list:
+        insights = []
+
+        rising = [c for c in analysis["categories"] if c["trend"] >= TREND_THRESHOLD and c["activeMonths"] >= 2]
+        if rising:
+            top = max(rising, key=lambda c: c["total"])
+            insights.append(f"Gastos com '{top['category']}' crescem {top['trend']:.0f}% ao mês")
+
+        volatile = [c for c in analysis["categories"] if c["volatility"] >= VOLATILITY_THRESHOLD and c["share"] >= 10]
+        if volatile:
+            insights.append(f"'{volatile[0]['category']}' varia muito de um mês para outro")
+
+        average = analysis["totals"]["average"]
+        if average > 0 and analysis["totals"]["currentMonth"] > average:
+            insights.append(
+                f"Este mês você já gastou R$ {analysis['totals']['currentMonth']:.2f}, acima da média de R$ {average:.2f}"
+            )
+
+        return insights
+
+
+# Singleton instance
+_category_analyzer = None
+
+def get_category_analyzer() -> CategoryAnalyzer:
+    """Get or create category analyzer instance"""
+    global _category_analyzer
+    if _category_analyzer is None:
+        _category_analyzer = CategoryAnalyzer()
+    return _category_analyzer
@@ -0,0 +1,217 @@
+"""
+Change Listener - LISTEN/NOTIFY driven cache invalidation
+
+Triggers on transactions, goals and budgets publish the changed user (and,
+for transactions, the month of the row) on CHANNEL. They are created by
+the Prisma migration add_analytics_change_notifications; the service only
+LISTENs. Postgres folds identical payloads raised inside one transaction,
+so a bulk import arrives as one message per user-month instead of one per
+row. The listener batches messages per user
+and, once a user has been quiet for the debounce interval (or the max
+delay has passed), drops that user's stale results, refreshes the
+incremental feature windows and monthly states in one pass and then tells
+subscribers which tables changed.
+
+Every cache still validates against its data watermark, so a missed
+notification (e.g. while reconnecting) costs a slower request, not a
+stale answer.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from loguru import logger
+
+from analytics.agents.goals_advisor import PREDICTIONS_NAMESPACE
+from analytics.config import get_settings
+from analytics.database.connection import get_db_connection
+from analytics.services.aggregates import get_monthly_state_store
+from analytics.services.cache import ResultCache, get_result_cache
+from analytics.services.category_analysis import NAMESPACE as CATEGORY_ANALYSIS_NAMESPACE
+from analytics.services.feature_store import get_feature_store
+
+# Must match the channel of analytics_notify_change() in the migration
+CHANNEL = "analytics_changes"
+TABLES = ("transactions", "goals", "budgets")
+RECONNECT_SECONDS = 5.0
+
+ChangeCallback = Callable[[str, Set[str]], Awaitable[None]]
+
+
+class ChangeListener:
+    """
+    Debounced per-user change batches from a dedicated LISTEN connection
+
+    The connection is read from the event loop (`add_reader`), so waiting
+    for notifications costs no thread; batches are flushed on a short tick.
+    """
+
+    def __init__(
+        self,
+        debounce_seconds: float = 2.0,
+        max_delay_seconds: float = 30.0,
+        cache: Optional[ResultCache] = None
+    ):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max(max_delay_seconds, debounce_seconds)
+        self.cache = cache or get_result_cache()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: List[ChangeCallback] = []
+        self._task: Optional[asyncio.Task] = None
+        self.connected = False
+        self.received = 0
+        self.flushed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start listening (idempotent)"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📣 Change listener started on '{CHANNEL}' (debounce {self.debounce_seconds}s)")
+
+    async def stop(self):
+        """Stop listening; pending batches are dropped (the watermarks cover them)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def subscribe(self, callback: ChangeCallback):
+        """Call `callback(user_id, tables)` after each user's batch is applied"""
+        self._subscribers.append(callback)
+
+    def record(self, payload: str, now: Optional[float] = None):
+        """Add one notification payload to its user's pending batch"""
+        try:
+            change = json.loads(payload)
+            user_id, table = change["userId"], change["table"]
+        except (ValueError, KeyError, TypeError):
+            logger.debug(f"Ignoring malformed change notification: {payload!r}")
+            return
+        if not user_id or table not in TABLES:
+            return
+
+        now = now if now is not None else time.monotonic()
+        self.received += 1
+        batch = self._pending.setdefault(user_id, {"tables": set(), "months": set(), "first": now})
+        batch["tables"].add(table)
+        if change.get("month"):
+            batch["months"].add(change["month"])
+        batch["last"] = now
+
+    async def flush(self, now: Optional[float] = None, force: bool = False) -> int:
+        """Apply every batch that is due (all of them with `force`); returns users flushed"""
+        now = now if now is not None else time.monotonic()
+        due = [
+            user_id for user_id, batch in self._pending.items()
+            if force
+            or now - batch["last"] >= self.debounce_seconds
+            or now - batch["first"] >= self.max_delay_seconds
+        ]
+        for user_id in due:
+            batch = self._pending.pop(user_id)
+            try:
+                await self.apply(user_id, batch["tables"], batch["months"])
+            except Exception as e:
+                logger.error(f"Applying changes for {user_id} failed: {e}")
+        self.flushed += len(due)
+        return len(due)
+
+    async def apply(self, user_id: str, tables: Set[str], months: Set[str]):
+        """Invalidate and refresh what a user's changes affect, then notify subscribers"""
+        if tables & {"transactions", "goals"}:
+            self.cache.invalidate(user_id, PREDICTIONS_NAMESPACE)
+        if "transactions" in tables:
+            self.cache.invalidate(user_id, CATEGORY_ANALYSIS_NAMESPACE)
+            await get_feature_store().refresh(user_id)
+            if months:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, get_monthly_state_store().refresh, user_id, months)
+
+        for callback in self._subscribers:
+            try:
+                await callback(user_id, tables)
+            except Exception as e:
+                logger.error(f"Change subscriber failed for {user_id}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "connected": self.connected,
+            "channel": CHANNEL,
+            "received": self.received,
+            "flushed_users": self.flushed,
+            "pending_users": len(self._pending),
+            "debounce_seconds": self.debounce_seconds
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        tick = max(0.1, self.debounce_seconds / 2)
+        while True:
+            try:
+                conn = await loop.run_in_executor(None, self._connect)
+            except Exception as e:
+                logger.warning(f"Change listener could not connect: {e}")
+                await asyncio.sleep(RECONNECT_SECONDS)
+                continue
+
+            fd = conn.fileno()
+            lost = asyncio.Event()
+            loop.add_reader(fd, self._drain, conn, lost)
+            self.connected = True
+            try:
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=tick)
+                    except asyncio.TimeoutError:
+                        pass
+                    await self.flush()
+            finally:
+                self.connected = False
+                loop.remove_reader(fd)
+                conn.close()
+
+            logger.warning("Change listener connection lost, reconnecting")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def _connect(self):
+        # A dedicated connection: LISTEN must outlive any pooled checkout
+        raw = get_db_connection().raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        return conn
+
+    def _drain(self, conn, lost: asyncio.Event):
+        try:
+            conn.poll()
+        except Exception as e:
+            logger.warning(f"Change listener poll failed: {e}")
+            lost.set()
+            return
+        while conn.notifies:
+            self.record(conn.notifies.pop(0).payload)
+
+
+# Singleton instance
+_change_listener = None
+
+def get_change_listener() -> ChangeListener:
+    """Get or create change listener instance"""
+    global _change_listener
+    if _change_listener is None:
+        settings = get_settings()
+        _change_listener = ChangeListener(settings.change_debounce_seconds, settings.change_max_delay_seconds)
+    return _change_listener
@@ -0,0 +1,117 @@
+"""
+Encoding - Dictionary-encoded transaction columns
+
+The shared transaction loader stores `type`, `status` and `category_type`
+as categoricals over their Prisma enums and `category_name` as a
+categorical over the user's category dictionary, so filters compare
+integer codes and groupbys hash codes instead of Python strings. Each
+user's dictionary lists category names in first-seen order and is cached
+across requests, which keeps codes stable between a cached frame and the
+deltas merged into it. Boolean `isIncome`/`isExpense` masks are computed
+once at load time.
+"""
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.services.cache import ResultCache, get_result_cache
+
+NAMESPACE = "category_dictionary"
+# Names only ever get appended, so a dictionary can live as long as the process needs it
+DICTIONARY_TTL = 7 * 24 * 3600
+
+TRANSACTION_TYPE = pd.CategoricalDtype(['INCOME', 'EXPENSE', 'TRANSFER'])
+TRANSACTION_STATUS = pd.CategoricalDtype(['PENDING', 'COMPLETED', 'CANCELLED', 'FAILED'])
+CATEGORY_TYPE = pd.CategoricalDtype(['INCOME', 'EXPENSE', 'TRANSFER'])
+
+ENCODED_COLUMNS = {'type': TRANSACTION_TYPE, 'status': TRANSACTION_STATUS, 'category_type': CATEGORY_TYPE}
+TYPE_MASKS = {'INCOME': 'isIncome', 'EXPENSE': 'isExpense'}
+
+
+class CategoryDictionary:
+    """Per-user category names in first-seen order, cached in the ResultCache"""
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or get_result_cache()
+
+    def encode(self, user_ids: pd.Series, names: pd.Series) -> pd.Categorical:
+        """
+        Category names as a categorical over the users' dictionaries
+
+        Names not seen before are appended to their user's dictionary. Each
+        distinct string is hashed once (factorize) and mapped to its code.
+        """
+        codes, uniques = pd.factorize(names)
+        pairs = pd.DataFrame({'userId': user_ids.to_numpy(), 'code': codes}).drop_duplicates()
+        pairs = pairs[pairs['code'] >= 0]
+
+        seen = {user_id: user_codes.to_numpy() for user_id, user_codes in pairs.groupby('userId', sort=False)['code']}
+
+        names_in_order = {}
+        for user_id in pd.unique(user_ids.to_numpy()):
+            known = self.cache.get(NAMESPACE, user_id, default=())
+            known_set = set(known)
+            new = [name for name in uniques[seen.get(user_id, np.empty(0, dtype=np.int64))] if name not in known_set]
+            if new:
+                known = tuple(known) + tuple(new)
+                self.cache.set(NAMESPACE, user_id, known, ttl=DICTIONARY_TTL)
+            names_in_order.update(dict.fromkeys(known))
+
+        categories = pd.Index(list(names_in_order), dtype=object)
+        mapping = categories.get_indexer(uniques)
+        return pd.Categorical.from_codes(
+            np.where(codes >= 0, mapping[codes], -1),
+            dtype=pd.CategoricalDtype(categories)
+        )
+
+
+def encode_transactions(df: pd.DataFrame, dictionary: Optional[CategoryDictionary] = None) -> pd.DataFrame:
+    """Encode a fetch_transactions frame in place and add the type masks"""
+    for column, dtype in ENCODED_COLUMNS.items():
+        df[column] = df[column].astype(dtype)
+    df['category_name'] = (dictionary or get_category_dictionary()).encode(df['userId'], df['category_name'])
+    for value, column in TYPE_MASKS.items():
+        df[column] = (df['type'] == value).to_numpy()
+    return df
+
+
+def type_mask(df: pd.DataFrame, value: str) -> pd.Series:
+    """Rows of a transaction type, from the precomputed mask when the loader provided it"""
+    column = TYPE_MASKS.get(value)
+    if column in df.columns:
+        return df[column]
+    return df['type'] == value
+
+
+def fill_category(names: pd.Series, missing: str) -> pd.Series:
+    """Category names with NULLs replaced, keeping categoricals encoded"""
+    if isinstance(names.dtype, pd.CategoricalDtype) and missing not in names.cat.categories:
+        names = names.cat.add_categories([missing])
+    return names.fillna(missing)
+
+
+def concat_transactions(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate transaction frames keeping category_name encoded
+
+    Frames loaded before and after a user's dictionary grew have different
+    categories; they are aligned to the union first, since pd.concat would
+    fall back to object strings.
+    """
+    categoricals = [f['category_name'] for f in frames if isinstance(f['category_name'].dtype, pd.CategoricalDtype)]
+    if len(categoricals) == len(frames) and len(frames) > 1:
+        union = pd.Index(list(dict.fromkeys(c for s in categoricals for c in s.cat.categories)))
+        frames = [f.assign(category_name=f['category_name'].cat.set_categories(union)) for f in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+_category_dictionary = None
+
+
+def get_category_dictionary() -> CategoryDictionary:
+    """Get or create the process-wide CategoryDictionary"""
+    global _category_dictionary
+    if _category_dictionary is None:
+        _category_dictionary = CategoryDictionary()
+    return _category_dictionary
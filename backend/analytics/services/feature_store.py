@@ -0,0 +1,293 @@
+"""
+Feature Store - Shared per-user financial features
+
+Computes the compact feature vector (monthly income/expenses, savings rate,
+top categories, weekend share, net savings distribution) once per user and
+window, caches it together with the transaction frame and a data watermark,
+and refreshes incrementally by merging only rows updated since the watermark.
+Agents and routers read features from here instead of re-querying.
+"""
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from analytics.database.queries import fetch_transactions, fetch_transaction_watermark
+from analytics.services.cache import ResultCache, get_result_cache
+from analytics.services.encoding import concat_transactions, fill_category, type_mask
+from analytics.services.goal_simulator import GoalSimulator
+from analytics.services.money import cents_of, from_cents, percent
+
+NAMESPACE = "features"
+
+
+class FeatureStore:
+    """
+    Watermarked per-user feature cache
+
+    Each entry holds the user's transactions for the window (all statuses,
+    so status changes and deletions can be reconciled), the computed
+    features and the watermark they were computed at.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None):
+        self.cache = cache or get_result_cache()
+
+    async def get_features(self, user_id: str, window_days: int = 90) -> Dict[str, Any]:
+        """Feature vector for the last `window_days` days"""
+        return (await self._get_entry(user_id, window_days))["features"]
+
+    async def get_frame(self, user_id: str, window_days: int = 90) -> pd.DataFrame:
+        """COMPLETED transactions for the last `window_days` days"""
+        frame = (await self._get_entry(user_id, window_days))["frame"]
+        return frame[frame['status'] == 'COMPLETED']
+
+    async def get_window(self, user_id: str, window_days: int = 90) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        """COMPLETED transactions and feature vector of one window (one watermark check)"""
+        entry = await self._get_entry(user_id, window_days)
+        frame = entry["frame"]
+        return frame[frame['status'] == 'COMPLETED'], entry["features"]
+
+    def invalidate(self, user_id: str):
+        """Forget everything cached for a user"""
+        self.cache.invalidate(user_id, NAMESPACE)
+
+    async def refresh(self, user_id: str) -> int:
+        """
+        Bring every cached window of a user up to date
+
+        Each window merges the rows changed since its watermark, so the next
+        request finds a current entry. Returns the number of windows refreshed.
+        """
+        windows = self.cache.keys(user_id, NAMESPACE)
+        for window_days in windows:
+            await self._get_entry(user_id, window_days)
+        return len(windows)
+
+    async def _get_entry(self, user_id: str, window_days: int) -> Dict[str, Any]:
+        start = datetime.now() - timedelta(days=window_days)
+        watermark = fetch_transaction_watermark(user_id, start)
+        entry = self.cache.get(NAMESPACE, user_id, window_days)
+
+        if entry is not None and entry["watermark"] == watermark:
+            return entry
+
+        frame = None
+        if entry is not None and entry["watermark"]["updated_at"] is not None:
+            frame = self._merge_delta(user_id, entry, start, watermark)
+
+        if frame is None:
+            frame = fetch_transactions([user_id], start, completed_only=False)
+
+        entry = {
+            "frame": frame,
+            "features": self.compute_features(
+                frame[frame['status'] == 'COMPLETED'],
+                window_days,
+                user_id=user_id,
+                watermark=watermark
+            ),
+            "watermark": watermark
+        }
+        self.cache.set(NAMESPACE, user_id, entry, key=window_days)
+        return entry
+
+    def _merge_delta(
+        self,
+        user_id: str,
+        entry: Dict[str, Any],
+        start: datetime,
+        watermark: Dict[str, Any]
+    ) -> Optional[pd.DataFrame]:
+        """
+        Apply rows updated since the cached watermark to the cached frame
+
+        Returns None when the merged frame does not reconcile with the
+        watermark count (e.g. rows were deleted), forcing a full reload.
+        """
+        delta = fetch_transactions(
+            [user_id],
+            start,
+            updated_after=entry["watermark"]["updated_at"],
+            completed_only=False
+        )
+
+        frame = entry["frame"]
+        frame = frame[(frame['date'] >= start) & ~frame['id'].isin(delta['id'])]
+        frame = concat_transactions([frame, delta]) if not delta.empty else frame
+
+        if len(frame) != watermark["count"]:
+            logger.debug(f"Feature store delta for {user_id} did not reconcile, reloading")
+            return None
+
+        return frame
+
+    def compute_features(
+        self,
+        df: pd.DataFrame,
+        window_days: int,
+        user_id: Optional[str] = None,
+        watermark: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Vectorized feature vector from a frame of COMPLETED transactions"""
+        features = self._empty_features(user_id, window_days)
+        features["watermark"] = {
+            "updatedAt": watermark["updated_at"].isoformat() if watermark and watermark["updated_at"] else None,
+            "count": watermark["count"] if watermark else len(df)
+        }
+
+        if not df.empty:
+            key = user_id or ""
+            features.update(self._grouped_features(df.assign(userId=key))[key])
+
+        return features
+
+    def compute_features_batch(self, df: pd.DataFrame, window_days: int) -> Dict[str, Dict[str, Any]]:
+        """
+        Feature vectors for every user in a multi-user frame
+
+        Same values as `compute_features`, computed with grouped operations
+        over the whole frame. Users without rows are not included.
+        """
+        if df.empty:
+            return {}
+
+        return {
+            user_id: {**self._empty_features(user_id, window_days), **values}
+            for user_id, values in self._grouped_features(df).items()
+        }
+
+    def _empty_features(self, user_id: Optional[str], window_days: int) -> Dict[str, Any]:
+        return {
+            "userId": user_id,
+            "windowDays": window_days,
+            "computedAt": datetime.utcnow().isoformat(),
+            "watermark": {"updatedAt": None, "count": 0},
+            "transactionCount": 0,
+            "monthsCovered": 1.0,
+            "totalIncome": 0.0,
+            "totalExpenses": 0.0,
+            "monthlyIncome": 0.0,
+            "monthlyExpenses": 0.0,
+            "availableMonthly": 0.0,
+            "savingsRate": 0.0,
+            "weekendShare": 0.0,
+            "weekendExpenses": 0.0,
+            "categoriesCount": 0,
+            "topCategories": [],
+            "expensesByCategory": {},
+            "expenseTrend": {"firstHalf": 0.0, "secondHalf": 0.0},
+            "netSavings": {"mu": 0.0, "sigma": 0.0}
+        }
+
+    def _grouped_features(self, df: pd.DataFrame) -> Dict[str, Dict[str, Any]]:
+        """Computed feature values per userId for a non-empty frame"""
+        # Totals are summed in exact integer cents and converted on output
+        amount = cents_of(df).to_numpy()
+        is_income = type_mask(df, 'INCOME').to_numpy()
+        is_expense = type_mask(df, 'EXPENSE').to_numpy()
+        weekend = df['date'].dt.dayofweek.to_numpy() >= 5
+
+        rows = pd.DataFrame({
+            'userId': df['userId'].to_numpy(),
+            'date': df['date'].to_numpy(),
+            'category': df['category_name'].array,
+            'income': np.where(is_income, amount, 0),
+            'expense': np.where(is_expense, amount, 0),
+            'weekendExpense': np.where(is_expense & weekend, amount, 0),
+            'isIncome': is_income,
+            'isExpense': is_expense
+        })
+
+        totals = rows.groupby('userId', sort=False).agg(
+            count=('date', 'size'),
+            first=('date', 'min'),
+            last=('date', 'max'),
+            income=('income', 'sum'),
+            expenses=('expense', 'sum'),
+            weekendExpenses=('weekendExpense', 'sum'),
+            hasIncome=('isIncome', 'any'),
+            hasExpense=('isExpense', 'any'),
+            categories=('category', 'nunique')
+        )
+        # Same month basis the goals agent has always used: span of the data, at least 1
+        totals['months'] = ((totals['last'] - totals['first']).dt.days / 30).clip(lower=1.0)
+
+        expenses = rows[is_expense].copy()
+        expenses['category'] = fill_category(expenses['category'], 'Outros')
+
+        # Spending trend: expenses after vs up to the midpoint of each user's expense dates
+        by_user = expenses.groupby('userId', sort=False)['date']
+        first, last = by_user.transform('min'), by_user.transform('max')
+        later = expenses['date'] > first + (last - first) / 2
+        second_half = expenses['expense'].where(later, 0).groupby(expenses['userId'], sort=False).sum()
+
+        by_category = (
+            expenses.groupby(['userId', 'category'], sort=False, observed=True)['expense']
+            .agg(total='sum', n='count', average='mean')
+            .reset_index()
+            .sort_values(['userId', 'total'], ascending=[True, False])
+        )
+        by_category['rank'] = by_category.groupby('userId', sort=False).cumcount()
+
+        net_savings = GoalSimulator.fit_net_savings_by_user(df)
+
+        results = {}
+        for user_id, t in totals.to_dict('index').items():
+            months = t['months']
+            total_income = from_cents(t['income'])
+            total_expenses = from_cents(t['expenses'])
+            monthly_income = total_income / months if t['hasIncome'] else 0.0
+            monthly_expenses = total_expenses / months if t['hasExpense'] else 0.0
+            later_total = from_cents(second_half.get(user_id, 0))
+
+            results[user_id] = {
+                "transactionCount": int(t['count']),
+                "monthsCovered": round(float(months), 2),
+                "totalIncome": total_income,
+                "totalExpenses": total_expenses,
+                "monthlyIncome": monthly_income,
+                "monthlyExpenses": monthly_expenses,
+                "availableMonthly": monthly_income - monthly_expenses,
+                "savingsRate": percent(t['income'] - t['expenses'], t['income']) if t['income'] > 0 else 0.0,
+                "weekendShare": percent(t['weekendExpenses'], t['expenses']),
+                "weekendExpenses": from_cents(t['weekendExpenses']),
+                "categoriesCount": int(t['categories']),
+                "topCategories": [],
+                "expensesByCategory": {},
+                "expenseTrend": {
+                    "firstHalf": from_cents(t['expenses'] - second_half.get(user_id, 0)),
+                    "secondHalf": later_total
+                },
+                "netSavings": {
+                    "mu": float(net_savings.at[user_id, 'mu']),
+                    "sigma": float(net_savings.at[user_id, 'sigma'])
+                }
+            }
+
+        for row in by_category.itertuples(index=False):
+            features = results[row.userId]
+            features["expensesByCategory"][str(row.category)] = from_cents(row.total) / totals.at[row.userId, 'months']
+            if row.rank < 5:
+                features["topCategories"].append({
+                    "category": row.category,
+                    "total": from_cents(row.total),
+                    "count": int(row.n),
+                    "average": from_cents(row.average),
+                    "share": percent(row.total, totals.at[row.userId, 'expenses'])
+                })
+
+        return results
+
+
+# Singleton instance
+_feature_store = None
+
+def get_feature_store() -> FeatureStore:
+    """Get or create feature store instance"""
+    global _feature_store
+    if _feature_store is None:
+        _feature_store = FeatureStore()
+    return _feature_store
@@ -0,0 +1,179 @@
+"""
+Loop Monitor - Event-loop lag and blocking-call detector
+
+A heartbeat coroutine measures event-loop lag continuously while a watchdog
+thread checks that the heartbeat keeps ticking. When the loop is stalled for
+longer than the threshold, the watchdog captures the loop thread's stack and
+attributes the stall to the router and agent/service function running on it
+(typically a sync DB or OpenAI call inside an async handler).
+"""
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from analytics.config import get_settings
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+
+
+class LoopMonitor:
+    """
+    Watchdog for the asyncio event loop
+
+    Only active when LOOP_MONITOR_ENABLED is set; stack capture relies on
+    sys._current_frames() and is meant as an instrumentation mode.
+    """
+
+    def __init__(self, threshold_ms: float = 100.0, max_events: int = 100):
+        self.threshold = threshold_ms / 1000
+        self.heartbeat = max(0.005, self.threshold / 4)
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._culprits: Counter = Counter()
+        self._handlers: Counter = Counter()
+        self._lock = threading.Lock()
+        self._last_beat = time.monotonic()
+        self._open_event: Optional[Dict[str, Any]] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.blocks_total = 0
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start heartbeat task and watchdog thread (idempotent)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"🔎 Loop monitor started (threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        """Stop heartbeat task and watchdog thread"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for the health surface"""
+        with self._lock:
+            return {
+                "enabled": self.running,
+                "threshold_ms": self.threshold * 1000,
+                "lag_ms": round(self.lag_ms, 2),
+                "max_lag_ms": round(self.max_lag_ms, 2),
+                "blocks_total": self.blocks_total,
+                "top_culprits": dict(self._culprits.most_common(5)),
+                "top_handlers": dict(self._handlers.most_common(5))
+            }
+
+    def events(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent blocking events, newest first"""
+        with self._lock:
+            return list(self._events)[-limit:][::-1]
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.heartbeat
+            await asyncio.sleep(self.heartbeat)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            with self._lock:
+                self._last_beat = time.monotonic()
+                # Exponential moving average keeps the gauge stable between scrapes
+                self.lag_ms = self.lag_ms * 0.9 + lag_ms * 0.1
+                self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+                if self._open_event is not None:
+                    self._open_event["blocked_ms"] = round(lag_ms + self.heartbeat * 1000, 1)
+                    self._open_event = None
+
+    def _watch(self):
+        while not self._stop.wait(self.heartbeat):
+            with self._lock:
+                stalled = time.monotonic() - self._last_beat
+                if stalled < self.threshold or self._open_event is not None:
+                    continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            event = self._describe(frame, stalled)
+            with self._lock:
+                self._open_event = event
+                self._events.append(event)
+                self.blocks_total += 1
+                self._culprits[event["culprit"]] += 1
+                self._handlers[event["handler"]] += 1
+            logger.warning(
+                f"Event loop blocked >{stalled * 1000:.0f}ms in {event['culprit']} "
+                f"(handler: {event['handler']})"
+            )
+
+    def _describe(self, frame, stalled: float) -> Dict[str, Any]:
+        stack = traceback.extract_stack(frame)
+        own = [f for f in stack if self._is_own_code(f.filename)]
+
+        # Outermost router frame is the endpoint, innermost own frame is the culprit
+        handler = next((f for f in own if "/routers/" in f.filename.replace("\\", "/")), None)
+        culprit = own[-1] if own else (stack[-1] if stack else None)
+
+        return {
+            "detected_at": datetime.utcnow().isoformat(),
+            "blocked_ms": round(stalled * 1000, 1),
+            "culprit": self._label(culprit),
+            "handler": self._label(handler),
+            "stack": [f"{self._label(f)}:{f.lineno}" for f in stack[-15:]]
+        }
+
+    def _is_own_code(self, filename: str) -> bool:
+        try:
+            path = Path(filename).resolve()
+        except (OSError, ValueError):
+            return False
+        return path != Path(__file__).resolve() and PACKAGE_DIR in path.parents
+
+    def _label(self, frame_summary) -> str:
+        if frame_summary is None:
+            return "unknown"
+        path = Path(frame_summary.filename)
+        try:
+            module = path.resolve().relative_to(PACKAGE_DIR).with_suffix("").as_posix().replace("/", ".")
+        except ValueError:
+            module = path.stem
+        return f"{module}.{frame_summary.name}"
+
+
+# Singleton instance
+_loop_monitor = None
+
+def get_loop_monitor() -> LoopMonitor:
+    """Get or create loop monitor instance"""
+    global _loop_monitor
+    if _loop_monitor is None:
+        settings = get_settings()
+        _loop_monitor = LoopMonitor(threshold_ms=settings.loop_block_threshold_ms)
+    return _loop_monitor
@@ -0,0 +1,71 @@
+"""
+Money - Integer-cents money columns
+
+Amounts are Decimal(15,2) in the database. The shared loaders cast them to
+bigint cents in SQL, so frames hold native int64 arrays instead of Decimal
+objects: totals are exact and aggregate at integer speed, and conversion
+to currency units happens once, when results are serialized.
+
+Each `<name>Cents` column comes with a float64 `<name>` view for
+statistics (means, z-scores, thresholds) that don't need exact cents.
+"""
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+CENTS = 100
+MONEY_DTYPE = np.int64
+
+
+def to_cents(values) -> np.ndarray:
+    """int64 cents from currency amounts (floats, Decimals, ints), rounded half away from zero"""
+    amounts = np.asarray(values, dtype=float)
+    return (np.sign(amounts) * np.floor(np.abs(amounts) * CENTS + 0.5)).astype(MONEY_DTYPE)
+
+
+def from_cents(cents) -> Union[float, np.ndarray]:
+    """Currency units for serialization: a float for scalars, a float array otherwise"""
+    if np.ndim(cents) == 0:
+        return round(float(cents) / CENTS, 2)
+    return np.round(np.asarray(cents, dtype=float) / CENTS, 2)
+
+
+def with_units(df: pd.DataFrame, *columns: str) -> pd.DataFrame:
+    """
+    Normalize `<name>Cents` columns to int64 and add their float `<name>` views
+
+    Loaders call this right after the query (NULL amounts become 0).
+    """
+    for column in columns:
+        cents = pd.to_numeric(df[column]).fillna(0).astype(MONEY_DTYPE)
+        df[column] = cents
+        df[column[:-len('Cents')]] = cents / CENTS
+    return df
+
+
+def cents_of(df: pd.DataFrame, column: str = 'amount') -> pd.Series:
+    """Integer cents of a money column, from `<column>Cents` when the loader provided it"""
+    if f'{column}Cents' in df.columns:
+        return df[f'{column}Cents']
+    return pd.Series(to_cents(df[column].to_numpy()), index=df.index, dtype=MONEY_DTYPE)
+
+
+def total(cents) -> float:
+    """Exact sum of integer cents, in currency units"""
+    return from_cents(int(np.asarray(cents, dtype=MONEY_DTYPE).sum()))
+
+
+def mean(cents) -> float:
+    """Mean of integer cents, in currency units (0 for no values)"""
+    cents = np.asarray(cents, dtype=MONEY_DTYPE)
+    return from_cents(cents.sum() / cents.size) if cents.size else 0.0
+
+
+def percent(part, whole):
+    """part / whole * 100, 0 where whole is 0 (scalars or arrays)"""
+    part = np.asarray(part, dtype=float)
+    whole = np.asarray(whole, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = np.where(whole != 0, part / whole * 100, 0.0)
+    return float(result) if result.ndim == 0 else result
@@ -0,0 +1,166 @@
+"""
+Peer Distributions - Population percentiles from precomputed histograms
+
+The nightly batch folds every active user's 30-day savings rate and
+monthly spend per category into mergeable bucket histograms (one per
+partition, merged by the parent) and stores them in
+population_distributions. Requests only read those aggregates: the
+histograms are loaded into memory as sorted buckets with cumulative
+counts, so a user's percentile is one binary search per metric and no
+other user's data is queried at request time.
+
+Savings rates use fixed SAVINGS_RATE_STEP buckets over [-100, 100]%;
+spending uses the log-spaced amount buckets of services.aggregates.
+Categories are user-defined names, so only names shared by at least
+MIN_PEERS users are kept.
+"""
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from analytics.database.queries import fetch_population_distributions
+from analytics.services.aggregates import sketch_buckets
+from analytics.services.money import CENTS
+
+SAVINGS_RATE = "savings_rate"
+CATEGORY_SPEND = "category_monthly_spend"
+SAVINGS_RATE_STEP = 0.5
+# Fewer users than this make an unstable (and too revealing) reference
+MIN_PEERS = 50
+# Distributions change nightly; reloading hourly is plenty
+RELOAD_SECONDS = 3600
+
+DistributionKey = Tuple[str, str]
+Sketch = Dict[str, int]
+
+
+def savings_rate_bucket(rate: float) -> int:
+    return int(np.floor(np.clip(rate, -100, 100 - 1e-9) / SAVINGS_RATE_STEP))
+
+
+def spend_bucket(monthly_amount: float) -> int:
+    return int(sketch_buckets(np.array([round(monthly_amount * CENTS)]))[0])
+
+
+def population_sketches(features_by_user: Dict[str, Dict[str, Any]]) -> Dict[DistributionKey, Sketch]:
+    """
+    Histograms of one chunk of users' feature vectors
+
+    Savings rate over users with income; monthly spend per category over
+    users with spending in it.
+    """
+    sketches: Dict[DistributionKey, Sketch] = {}
+
+    def add(key: DistributionKey, bucket: int):
+        sketch = sketches.setdefault(key, {})
+        sketch[str(bucket)] = sketch.get(str(bucket), 0) + 1
+
+    for features in features_by_user.values():
+        if features['totalIncome'] > 0:
+            add((SAVINGS_RATE, ""), savings_rate_bucket(features['savingsRate']))
+        for category, monthly in features['expensesByCategory'].items():
+            if monthly > 0:
+                add((CATEGORY_SPEND, category), spend_bucket(monthly))
+    return sketches
+
+
+def merge_sketches(into: Dict[DistributionKey, Sketch], sketches: Dict[DistributionKey, Sketch]):
+    """Add `sketches` into `into` (bucket counts are additive)"""
+    for key, sketch in sketches.items():
+        target = into.setdefault(key, {})
+        for bucket, n in sketch.items():
+            target[bucket] = target.get(bucket, 0) + n
+
+
+def distribution_rows(sketches: Dict[DistributionKey, Sketch]) -> List[Dict[str, Any]]:
+    """Rows for save_population_distributions, dropping populations under MIN_PEERS"""
+    rows = []
+    for (metric, category), sketch in sketches.items():
+        count = sum(sketch.values())
+        if count >= MIN_PEERS:
+            rows.append({"metric": metric, "category": category, "count": count, "sketch": sketch})
+    return rows
+
+
+class PeerDistributions:
+    """
+    In-memory population histograms with percentile lookups
+
+    Each distribution is a sorted bucket array with the count of users
+    below each bucket; `percentile` is a binary search into it.
+    """
+
+    def __init__(self, reload_seconds: float = RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._distributions: Dict[DistributionKey, Tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._loaded_at: Optional[float] = None
+        self.computed_at: Optional[datetime] = None
+
+    def load(self, rows: Optional[Iterable[Dict[str, Any]]] = None):
+        """Replace the distributions with stored rows (fetched when not given)"""
+        if rows is None:
+            rows = fetch_population_distributions()
+        distributions = {}
+        computed_at = None
+        for row in rows:
+            buckets = np.array([int(b) for b in row["sketch"]], dtype=np.int64)
+            counts = np.array(list(row["sketch"].values()), dtype=np.int64)
+            order = np.argsort(buckets)
+            buckets, counts = buckets[order], counts[order]
+            below = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            distributions[(row["metric"], row["category"])] = (buckets, counts, below)
+            computed_at = row.get("computedAt") or computed_at
+        self._distributions = distributions
+        self.computed_at = computed_at
+        self._loaded_at = time.monotonic()
+
+    def percentile(self, metric: str, value: float, category: str = "") -> Optional[float]:
+        """
+        Share (%) of the population below `value`, counting ties as half
+
+        None when the population has no distribution for the metric.
+        """
+        self._ensure_loaded()
+        distribution = self._distributions.get((metric, category))
+        if distribution is None:
+            return None
+
+        buckets, counts, below = distribution
+        bucket = savings_rate_bucket(value) if metric == SAVINGS_RATE else spend_bucket(value)
+        index = int(np.searchsorted(buckets, bucket))
+        total = below[-1] + counts[-1]
+        if index < len(buckets) and buckets[index] == bucket:
+            rank = below[index] + counts[index] / 2
+        else:
+            rank = below[index] if index < len(buckets) else total
+        return round(float(rank / total * 100), 1)
+
+    def population(self, metric: str, category: str = "") -> int:
+        """Users in a distribution (0 when absent)"""
+        self._ensure_loaded()
+        distribution = self._distributions.get((metric, category))
+        return int(distribution[1].sum()) if distribution is not None else 0
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_seconds:
+            return
+        try:
+            self.load()
+        except Exception as e:
+            # Keep serving the previous distributions; retry after the reload interval
+            logger.warning(f"Could not load population distributions: {e}")
+            self._loaded_at = time.monotonic()
+
+
+# Singleton instance
+_peer_distributions = None
+
+def get_peer_distributions() -> PeerDistributions:
+    """Get or create peer distributions instance"""
+    global _peer_distributions
+    if _peer_distributions is None:
+        _peer_distributions = PeerDistributions()
+    return _peer_distributions
@@ -0,0 +1,278 @@
+"""
+Platform KPIs - Service-wide volume, savings rate and category mix
+
+Operational dashboards read these without scanning `transactions`:
+
+- From the nightly rollups in analytics_snapshots when the latest run is
+  fresh and covers the requested window (the insights summaries for
+  volume and savings rate, the category analysis for the category mix).
+- Otherwise from samples. Volume and category mix come from a
+  TABLESAMPLE SYSTEM sample of heap pages, which reads only the sampled
+  pages; each page is kept independently, so totals are Horvitz-Thompson
+  estimates with page-cluster variances. The median savings rate comes
+  from exact totals of a BERNOULLI sample of users (index lookups), with
+  a distribution-free interval from the sample order statistics.
+
+Every result reports its source, window and 95% margins (0 for rollups,
+which are exact as of their run).
+"""
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.database.queries import (
+    fetch_sampled_active_user_ids,
+    fetch_sampled_transaction_pages,
+    fetch_snapshot_category_mix,
+    fetch_snapshot_kpis,
+    fetch_user_totals
+)
+from analytics.services.batch_runner import INSIGHTS_DAYS
+from analytics.services.category_analysis import PERIOD_MONTHS, analysis_months
+from analytics.services.money import from_cents, percent
+
+SOURCES = ("auto", "sample")
+CONFIDENCE = 0.95
+Z_95 = 1.96
+
+
+def page_total(values: np.ndarray, fraction: float) -> Tuple[float, float]:
+    """
+    Estimated table total and 95% margin from per-page totals of a SYSTEM sample
+
+    Each page is kept with probability `fraction`: the estimate is
+    sum(y) / f with variance (1 - f) / f^2 * sum(y^2).
+    """
+    values = np.asarray(values, dtype=float)
+    estimate = values.sum() / fraction
+    variance = (1 - fraction) / fraction ** 2 * np.square(values).sum()
+    return float(estimate), float(Z_95 * math.sqrt(variance))
+
+
+def median_interval(values: np.ndarray) -> Tuple[float, float, float]:
+    """Sample median with a distribution-free 95% interval (binomial order statistics)"""
+    values = np.sort(np.asarray(values, dtype=float))
+    n = len(values)
+    half_width = Z_95 * math.sqrt(n) / 2
+    lower = max(int(math.floor(n / 2 - half_width)), 1)
+    upper = min(int(math.ceil(n / 2 + half_width)) + 1, n)
+    return float(np.median(values)), float(values[lower - 1]), float(values[upper - 1])
+
+
+class PlatformKPIs:
+    """
+    Rollup-first KPIs with sampled fallbacks
+
+    Args:
+        sample_percent: Share of transaction pages read by sampled queries
+        user_sample_size: Users drawn for the sampled savings rate
+        max_rollup_age_hours: Oldest nightly run still served as the rollup
+    """
+
+    def __init__(self, sample_percent: float = 1.0, user_sample_size: int = 2000, max_rollup_age_hours: float = 36):
+        self.sample_percent = sample_percent
+        self.user_sample_size = user_sample_size
+        self.max_rollup_age_hours = max_rollup_age_hours
+
+    def volume(self, period_days: Optional[int] = None, source: str = "auto") -> Dict[str, Any]:
+        """Total income, expenses and transaction count over the last `period_days` (default: the rollup's 30)"""
+        rollup = self._rollup(period_days, source)
+        if rollup is not None:
+            return {
+                **self._rollup_meta(rollup, INSIGHTS_DAYS),
+                "total_income": round(rollup["totalIncome"], 2),
+                "total_expenses": round(rollup["totalExpenses"], 2),
+                "net": round(rollup["totalIncome"] - rollup["totalExpenses"], 2),
+                "transactions": rollup["transactions"],
+                "margins": {"total_income": 0.0, "total_expenses": 0.0, "net": 0.0, "transactions": 0.0}
+            }
+
+        now = datetime.now()
+        start = now - timedelta(days=period_days or INSIGHTS_DAYS)
+        pages, meta = self._sample_pages(start, now)
+        fraction = self.sample_percent / 100
+
+        by_page = pd.DataFrame({
+            "income": np.where(pages["type"] == "INCOME", pages["amountCents"], 0),
+            "expenses": np.where(pages["type"] == "EXPENSE", pages["amountCents"], 0),
+            "count": pages["count"]
+        }).groupby(pages["page"].to_numpy()).sum()
+        by_page["net"] = by_page["income"] - by_page["expenses"]
+        estimates = {name: page_total(by_page[name].to_numpy(), fraction) for name in by_page.columns}
+
+        money = {"total_income": "income", "total_expenses": "expenses", "net": "net"}
+        return {
+            **meta,
+            **{key: from_cents(estimates[name][0]) for key, name in money.items()},
+            "transactions": int(round(estimates["count"][0])),
+            "margins": {
+                **{key: from_cents(estimates[name][1]) for key, name in money.items()},
+                "transactions": round(estimates["count"][1], 1)
+            }
+        }
+
+    def savings_rate(self, period_days: Optional[int] = None, source: str = "auto") -> Dict[str, Any]:
+        """Median per-user savings rate (%) over users with income in the last `period_days`"""
+        rollup = self._rollup(period_days, source)
+        if rollup is not None:
+            median = rollup["medianSavingsRate"]
+            return {
+                **self._rollup_meta(rollup, INSIGHTS_DAYS),
+                "median_savings_rate": round(median, 1) if median is not None else None,
+                "interval": [round(median, 1)] * 2 if median is not None else None,
+                "users_with_income": rollup["usersWithIncome"]
+            }
+
+        now = datetime.now()
+        start = now - timedelta(days=period_days or INSIGHTS_DAYS)
+        seed = now.toordinal()
+        user_ids = fetch_sampled_active_user_ids(self.user_sample_size, seed)
+        totals = fetch_user_totals(user_ids, start, now) if user_ids else pd.DataFrame()
+
+        result = {
+            "source": "sample",
+            "period": {"start": start.isoformat(), "end": now.isoformat()},
+            "confidence": CONFIDENCE,
+            "sample": {"users": len(user_ids), "seed": seed},
+            "median_savings_rate": None,
+            "interval": None,
+            "users_with_income": 0
+        }
+        if totals.empty:
+            return result
+        with_income = totals[totals["incomeCents"] > 0]
+        if with_income.empty:
+            return result
+
+        rates = percent(
+            (with_income["incomeCents"] - with_income["expenseCents"]).to_numpy(),
+            with_income["incomeCents"].to_numpy()
+        )
+        median, lower, upper = median_interval(np.atleast_1d(rates))
+        result["median_savings_rate"] = round(median, 1)
+        result["interval"] = [round(lower, 1), round(upper, 1)]
+        result["users_with_income"] = len(with_income)
+        return result
+
+    def category_mix(self, period_days: Optional[int] = None, source: str = "auto") -> Dict[str, Any]:
+        """
+        Expense share per category name across all users
+
+        Without `period_days` the window is the category analysis' full
+        months (served from its rollup when fresh); with it, the last
+        `period_days` days, always sampled.
+        """
+        if period_days is None and source == "auto":
+            rollup = fetch_snapshot_category_mix(self._fresh_after())
+            if rollup is not None:
+                grand_total = sum(rollup["categories"].values())
+                categories = [
+                    {
+                        "category": name,
+                        "amount": round(amount, 2),
+                        "share": round(percent(amount, grand_total), 1),
+                        "users": rollup["users"][name],
+                        "margins": {"amount": 0.0, "share": 0.0}
+                    }
+                    for name, amount in sorted(rollup["categories"].items(), key=lambda c: c[1], reverse=True)
+                ]
+                return {
+                    "source": "rollup",
+                    "computed_at": rollup["computedAt"].isoformat(),
+                    "period": {"months": rollup["months"]},
+                    "confidence": CONFIDENCE,
+                    "total_expenses": round(grand_total, 2),
+                    "categories": categories
+                }
+
+        now = datetime.now()
+        if period_days is None:
+            months = analysis_months(now, PERIOD_MONTHS["month"])
+            start, end = months[0].start_time.to_pydatetime(), months[-1].end_time.to_pydatetime()
+        else:
+            start, end = now - timedelta(days=period_days), now
+        pages, meta = self._sample_pages(start, end)
+        fraction = self.sample_percent / 100
+
+        expenses = pages[pages["type"] == "EXPENSE"].assign(category=lambda d: d["category_name"].fillna("Outros"))
+        by_page = expenses.pivot_table(
+            index="page",
+            columns="category",
+            values="amountCents",
+            aggfunc="sum",
+            fill_value=0
+        ) if not expenses.empty else pd.DataFrame()
+        page_expenses = by_page.sum(axis=1).to_numpy(dtype=float)
+        sampled_total = page_expenses.sum()
+        grand_total, grand_margin = page_total(page_expenses, fraction)
+
+        categories = []
+        for name in by_page.columns:
+            values = by_page[name].to_numpy(dtype=float)
+            amount, amount_margin = page_total(values, fraction)
+            share = values.sum() / sampled_total
+            # Ratio estimator: linearized variance of sum(y_c) / sum(y)
+            residuals = values - share * page_expenses
+            share_margin = Z_95 * math.sqrt((1 - fraction) * np.square(residuals).sum()) / sampled_total
+            categories.append({
+                "category": name,
+                "amount": from_cents(amount),
+                "share": round(share * 100, 1),
+                "margins": {"amount": from_cents(amount_margin), "share": round(share_margin * 100, 1)}
+            })
+        categories.sort(key=lambda c: c["amount"], reverse=True)
+
+        return {
+            **meta,
+            "total_expenses": from_cents(grand_total),
+            "margins": {"total_expenses": from_cents(grand_margin)},
+            "categories": categories
+        }
+
+    def overview(self, period_days: Optional[int] = None, source: str = "auto") -> Dict[str, Any]:
+        """All KPIs for one window"""
+        return {
+            "volume": self.volume(period_days, source),
+            "savings_rate": self.savings_rate(period_days, source),
+            "category_mix": self.category_mix(period_days, source)
+        }
+
+    def _fresh_after(self) -> datetime:
+        # computedAt is written by the batch as naive local time (datetime.now())
+        return datetime.now() - timedelta(hours=self.max_rollup_age_hours)
+
+    def _rollup(self, period_days: Optional[int], source: str) -> Optional[Dict[str, Any]]:
+        """Latest insights rollup when it may answer the request"""
+        if source != "auto" or period_days not in (None, INSIGHTS_DAYS):
+            return None
+        return fetch_snapshot_kpis(self._fresh_after())
+
+    @staticmethod
+    def _rollup_meta(rollup: Dict[str, Any], days: int) -> Dict[str, Any]:
+        computed_at = rollup["computedAt"]
+        return {
+            "source": "rollup",
+            "computed_at": computed_at.isoformat(),
+            "period": {"start": (computed_at - timedelta(days=days)).isoformat(), "end": computed_at.isoformat()},
+            "confidence": CONFIDENCE,
+            "users": rollup["users"]
+        }
+
+    def _sample_pages(self, start: datetime, end: datetime) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+        # A stable seed per day: refreshes read the same pages and return the same estimate
+        seed = datetime.now().toordinal()
+        pages = fetch_sampled_transaction_pages(start, end, self.sample_percent, seed)
+        return pages, {
+            "source": "sample",
+            "period": {"start": start.isoformat(), "end": end.isoformat()},
+            "confidence": CONFIDENCE,
+            "sample": {
+                "percent": self.sample_percent,
+                "seed": seed,
+                "pages": int(pages["page"].nunique()) if not pages.empty else 0,
+                "rows": int(pages["count"].sum()) if not pages.empty else 0
+            }
+        }
@@ -0,0 +1,246 @@
+"""
+Prewarmer - Predictive cache warming for users about to return
+
+Session activity (creation and last access times) tells which users are
+regularly active in the coming hour of the day. Users that usually show
+up now but are not active yet get their insights, anomaly flags, goal
+predictions and report states computed ahead of time, so their first
+request is served from the caches instead of paying the load.
+
+Rounds only run while the process is below a CPU threshold and stop once
+they have spent their CPU budget. Every request carrying a user_id is
+tracked to report how often a returning user's first request finds a warm
+cache and how many warmed users actually came back.
+"""
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from loguru import logger
+
+from analytics.agents.financial_advisor import FinancialAdvisorAgent
+from analytics.agents.goals_advisor import GoalsAdvisorAgent
+from analytics.config import get_settings
+from analytics.database.queries import fetch_login_activity
+from analytics.services.cache import ResultCache, get_result_cache
+from analytics.services.category_analysis import CategoryAnalyzer
+from analytics.services.feature_store import NAMESPACE as FEATURES_NAMESPACE
+from analytics.services.report_calculator import ReportCalculator
+from analytics.services.resource_sampler import get_resource_sampler
+
+# Session history used for the prediction
+ACTIVITY_DAYS = 28
+# Regular users only, active in the coming hours on at least MIN_PROBABILITY of the days
+MIN_ACTIVE_DAYS = 10
+MIN_PROBABILITY = 0.3
+# A request after this long without one starts a new visit
+AWAY_MINUTES = 30
+# Same windows the dashboard endpoints read
+INSIGHTS_DAYS = 30
+REPORT_DAYS = 365
+
+
+class Prewarmer:
+    """
+    Scheduled warming of predicted returning users
+
+    `run()` predicts and warms one round; `start()` schedules it every
+    `interval_minutes`. Warming runs in a worker thread and is measured in
+    thread CPU time against `cpu_budget_seconds` per round.
+    """
+
+    def __init__(
+        self,
+        interval_minutes: float = 15,
+        lead_minutes: float = 60,
+        cpu_budget_seconds: float = 30,
+        max_cpu_percent: float = 50,
+        cache: Optional[ResultCache] = None
+    ):
+        self.interval_minutes = interval_minutes
+        self.lead_minutes = lead_minutes
+        self.cpu_budget_seconds = cpu_budget_seconds
+        self.max_cpu_percent = max_cpu_percent
+        self.cache = cache or get_result_cache()
+        self._task: Optional[asyncio.Task] = None
+        self._warmed: Dict[str, float] = {}
+        self._last_request: Dict[str, float] = {}
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.counters = {
+            "rounds": 0,
+            "busy_skips": 0,
+            "warmed": 0,
+            "cpu_seconds": 0.0,
+            "visits": 0,
+            "warm_visits": 0,
+            "returned": 0,
+            "expired": 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the warming schedule (idempotent; disabled when interval <= 0)"""
+        if self.running or self.interval_minutes <= 0:
+            return
+        self._task = asyncio.create_task(self._schedule())
+        logger.info(f"🔥 Prewarmer scheduled every {self.interval_minutes} min (budget {self.cpu_budget_seconds}s CPU)")
+
+    async def stop(self):
+        """Stop the warming schedule"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _schedule(self):
+        while True:
+            await asyncio.sleep(self.interval_minutes * 60)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Prewarming failed: {e}")
+
+    async def run(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Warm the users predicted to return within the lead time, within the CPU budget"""
+        now = now or datetime.utcnow()
+        self._expire()
+        summary: Dict[str, Any] = {"predicted": 0, "warmed": 0, "cpuSeconds": 0.0, "skipped": None}
+
+        sample = get_resource_sampler().latest()
+        if sample is not None and sample["cpu_percent"] > self.max_cpu_percent:
+            self.counters["busy_skips"] += 1
+            summary["skipped"] = "busy"
+            self.last_run = summary
+            return summary
+
+        candidates = self.predict(now)
+        summary["predicted"] = len(candidates)
+
+        loop = asyncio.get_running_loop()
+        for user_id in candidates:
+            if summary["cpuSeconds"] >= self.cpu_budget_seconds:
+                summary["skipped"] = "budget"
+                break
+            try:
+                summary["cpuSeconds"] += await loop.run_in_executor(None, self._warm_user, user_id)
+            except Exception as e:
+                logger.error(f"Prewarming {user_id} failed: {e}")
+                continue
+            self._warmed[user_id] = time.time()
+            summary["warmed"] += 1
+
+        self.counters["rounds"] += 1
+        self.counters["warmed"] += summary["warmed"]
+        self.counters["cpu_seconds"] += summary["cpuSeconds"]
+        summary["cpuSeconds"] = round(summary["cpuSeconds"], 3)
+        summary["finishedAt"] = datetime.utcnow().isoformat()
+        self.last_run = summary
+        logger.info(f"🔥 Prewarmed {summary['warmed']}/{summary['predicted']} users in {summary['cpuSeconds']}s CPU")
+        return summary
+
+    def predict(self, now: datetime) -> List[str]:
+        """
+        Users likely to become active within the lead time, most likely first
+
+        The likelihood is the share of the last ACTIVITY_DAYS days on which
+        the user was active in the hours the lead time covers. Users active
+        in the last AWAY_MINUTES or already warmed are skipped.
+        """
+        hours = sorted({(now + timedelta(hours=h)).hour for h in range(math.ceil(self.lead_minutes / 60) + 1)})
+        activity = fetch_login_activity(now - timedelta(days=ACTIVITY_DAYS), hours)
+        if activity.empty:
+            return []
+
+        activity['probability'] = activity['windowDays'] / ACTIVITY_DAYS
+        away = pd.to_datetime(activity['lastSeen']) < now - timedelta(minutes=AWAY_MINUTES)
+        likely = activity[
+            away
+            & (activity['activeDays'] >= MIN_ACTIVE_DAYS)
+            & (activity['probability'] >= MIN_PROBABILITY)
+            & ~activity['userId'].isin(list(self._warmed))
+        ]
+        return likely.sort_values('probability', ascending=False)['userId'].tolist()
+
+    async def warm(self, user_id: str):
+        """Compute what a user's dashboard reads, then keep it cached until the predicted visit"""
+        advisor = FinancialAdvisorAgent()
+        await advisor.generate_insights(user_id, INSIGHTS_DAYS)
+        await advisor.detect_anomalies(user_id)
+        await GoalsAdvisorAgent().analyze_all_goals(user_id)
+        await CategoryAnalyzer().analyze_user(user_id)
+        ReportCalculator().period_states(user_id, datetime.now() - timedelta(days=REPORT_DAYS))
+        self.cache.extend(user_id, self._horizon_seconds())
+
+    def _warm_user(self, user_id: str) -> float:
+        started = time.thread_time()
+        asyncio.run(self.warm(user_id))
+        return time.thread_time() - started
+
+    def record_request(self, user_id: str):
+        """Track a request; the first one of a visit counts towards the hit rate"""
+        now = time.time()
+        last = self._last_request.get(user_id)
+        self._last_request[user_id] = now
+        if last is not None and now - last < AWAY_MINUTES * 60:
+            return
+
+        self.counters["visits"] += 1
+        if self.cache.keys(user_id, FEATURES_NAMESPACE):
+            self.counters["warm_visits"] += 1
+        warmed_at = self._warmed.pop(user_id, None)
+        if warmed_at is not None and now - warmed_at <= self._horizon_seconds():
+            self.counters["returned"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        c = self.counters
+        settled = c["returned"] + c["expired"]
+        return {
+            "running": self.running,
+            **c,
+            "cpu_seconds": round(c["cpu_seconds"], 3),
+            "pending": len(self._warmed),
+            # Share of visits whose first request found cached features
+            "hit_rate": round(c["warm_visits"] / c["visits"] * 100, 1) if c["visits"] else 0.0,
+            # Share of warmed users that came back before their entries lapsed
+            "precision": round(c["returned"] / settled * 100, 1) if settled else 0.0,
+            "last_run": self.last_run
+        }
+
+    def _horizon_seconds(self) -> float:
+        return (self.lead_minutes + self.interval_minutes) * 60
+
+    def _expire(self):
+        now = time.time()
+        horizon = self._horizon_seconds()
+        expired = [u for u, at in self._warmed.items() if now - at > horizon]
+        for user_id in expired:
+            del self._warmed[user_id]
+        self.counters["expired"] += len(expired)
+        self._last_request = {u: at for u, at in self._last_request.items() if now - at < AWAY_MINUTES * 60}
+
+
+# Singleton instance
+_prewarmer = None
+
+def get_prewarmer() -> Prewarmer:
+    """Get or create prewarmer instance"""
+    global _prewarmer
+    if _prewarmer is None:
+        settings = get_settings()
+        _prewarmer = Prewarmer(
+            settings.prewarm_interval_minutes,
+            settings.prewarm_lead_minutes,
+            settings.prewarm_cpu_budget_seconds,
+            settings.prewarm_max_cpu_percent
+        )
+    return _prewarmer
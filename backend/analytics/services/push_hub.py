@@ -0,0 +1,152 @@
+"""
+Push Hub - WebSocket fan-out of recomputed insights, anomalies and goal risk
+
+Clients subscribe per user over a WebSocket instead of polling. When the
+change listener reports that a user's data changed, the hub recomputes the
+affected topics once for that user, compares each with what was last sent
+and pushes only the topics whose content changed to every connected tab.
+Users without open connections cost nothing.
+"""
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Set
+
+from fastapi import WebSocket
+from loguru import logger
+
+from analytics.agents.financial_advisor import FinancialAdvisorAgent
+from analytics.agents.goals_advisor import GoalsAdvisorAgent
+
+# Tables each topic is computed from
+TOPICS: Dict[str, Set[str]] = {
+    "insights": {"transactions", "budgets"},
+    "anomalies": {"transactions"},
+    "goals": {"transactions", "goals"}
+}
+INSIGHTS_PERIOD_DAYS = 30
+ANOMALY_SENSITIVITY = 2.0
+# Generation timestamps change on every computation; they are not content
+_VOLATILE_KEYS = ("timestamp", "generated_at")
+
+
+def _fingerprint(data: Any) -> str:
+    if isinstance(data, dict):
+        data = {k: v for k, v in data.items() if k not in _VOLATILE_KEYS}
+    encoded = json.dumps(data, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+class PushHub:
+    """
+    Per-user WebSocket connections with a last-sent fingerprint per topic
+
+    A per-user lock makes concurrent triggers (a change arriving while a
+    new tab connects) share one computation.
+    """
+
+    def __init__(self):
+        self._connections: Dict[str, Set[WebSocket]] = {}
+        self._sent: Dict[str, Dict[str, str]] = {}
+        self._latest: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.financial_agent = FinancialAdvisorAgent()
+        self.goals_agent = GoalsAdvisorAgent()
+        self.computations = 0
+        self.pushed = 0
+
+    async def connect(self, user_id: str, websocket: WebSocket):
+        """Register an accepted socket and send it the user's current state"""
+        self._connections.setdefault(user_id, set()).add(websocket)
+        async with self._lock(user_id):
+            if user_id not in self._latest:
+                await self._compute(user_id, TOPICS)
+            messages = list(self._latest.get(user_id, {}).values())
+        for message in messages:
+            await websocket.send_json(message)
+
+    def disconnect(self, user_id: str, websocket: WebSocket):
+        """Forget a socket; the user's state goes with their last socket"""
+        sockets = self._connections.get(user_id)
+        if sockets is None:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            for state in (self._connections, self._sent, self._latest, self._locks):
+                state.pop(user_id, None)
+
+    async def on_change(self, user_id: str, tables: Set[str]):
+        """Change listener callback: recompute affected topics and push what changed"""
+        if not self._connections.get(user_id):
+            return
+        topics = [topic for topic, sources in TOPICS.items() if sources & tables]
+        if not topics:
+            return
+        async with self._lock(user_id):
+            changed = await self._compute(user_id, topics)
+        latest = self._latest.get(user_id, {})
+        if changed:
+            await self.broadcast(user_id, [latest[topic] for topic in changed if topic in latest])
+
+    async def broadcast(self, user_id: str, messages: Iterable[Dict[str, Any]]):
+        """Send messages to every socket of a user, dropping sockets that fail"""
+        messages = list(messages)
+        for websocket in list(self._connections.get(user_id, ())):
+            try:
+                for message in messages:
+                    await websocket.send_json(message)
+                self.pushed += len(messages)
+            except Exception as e:
+                logger.debug(f"Dropping push socket of {user_id}: {e}")
+                self.disconnect(user_id, websocket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._connections),
+            "connections": sum(len(s) for s in self._connections.values()),
+            "computations": self.computations,
+            "pushed": self.pushed
+        }
+
+    async def _compute(self, user_id: str, topics: Iterable[str]) -> List[str]:
+        """Recompute topics for a user; returns the topics whose content changed"""
+        sent = self._sent.setdefault(user_id, {})
+        latest = self._latest.setdefault(user_id, {})
+        changed = []
+        for topic in topics:
+            try:
+                data = await self._topic(user_id, topic)
+            except Exception as e:
+                logger.error(f"Error computing {topic} push for {user_id}: {e}")
+                continue
+            self.computations += 1
+            fingerprint = _fingerprint(data)
+            if sent.get(topic) == fingerprint:
+                continue
+            sent[topic] = fingerprint
+            latest[topic] = {"type": topic, "data": data, "generated_at": datetime.utcnow().isoformat()}
+            changed.append(topic)
+        return changed
+
+    async def _topic(self, user_id: str, topic: str) -> Any:
+        if topic == "insights":
+            return await self.financial_agent.generate_insights(user_id, INSIGHTS_PERIOD_DAYS)
+        if topic == "anomalies":
+            return await self.financial_agent.detect_anomalies(user_id, ANOMALY_SENSITIVITY)
+        goals = await self.goals_agent.detect_at_risk_goals(user_id)
+        return {"atRiskGoals": goals, "count": len(goals)}
+
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(user_id, asyncio.Lock())
+
+
+# Singleton instance
+_push_hub = None
+
+def get_push_hub() -> PushHub:
+    """Get or create push hub instance"""
+    global _push_hub
+    if _push_hub is None:
+        _push_hub = PushHub()
+    return _push_hub
@@ -0,0 +1,216 @@
+"""
+Recurring Detector - Periodicity-aware recurring transaction detection
+
+Splits transactions into series by (user, type, category, normalized
+description) and amount band, sorts every series by date, and classifies
+the median inter-arrival interval into a calendar cadence (weekly to
+annual) with a tolerance. Monthly and longer cadences predict the next
+occurrence on the series' usual day of the month. Everything is two
+integer-keyed sorts plus grouped aggregations, O(n log n) in the number of
+transactions.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from analytics.services.encoding import fill_category, type_mask
+
+# name, nominal interval in days, calendar months per step (0 = fixed days), tolerance in days
+CADENCES = (
+    ("weekly", 7.0, 0, 1),
+    ("biweekly", 14.0, 0, 2),
+    ("monthly", 30.44, 1, 4),
+    ("quarterly", 91.31, 3, 10),
+    ("semiannual", 182.62, 6, 15),
+    ("annual", 365.25, 12, 20),
+)
+CADENCE_NAMES = np.array([c[0] for c in CADENCES])
+CADENCE_DAYS = np.array([c[1] for c in CADENCES])
+CADENCE_MONTHS = np.array([c[2] for c in CADENCES])
+CADENCE_TOLERANCE = np.array([c[3] for c in CADENCES])
+DAYS_PER_MONTH = 30.44
+
+SERIES_KEYS = ['userId', 'type', 'category', 'key']
+
+COLUMNS = [
+    'userId', 'type', 'category', 'description', 'cadence', 'intervalDays', 'stepMonths',
+    'anchorDay', 'occurrences', 'amount', 'monthlyAmount', 'firstDate', 'lastDate',
+    'nextDate', 'confidence', 'active'
+]
+
+
+def normalize_descriptions(descriptions: pd.Series) -> pd.Series:
+    """Lowercase descriptions without digits and punctuation ("Parcela 3/12" -> "parcela")"""
+    # Descriptions repeat a lot; clean each distinct one once
+    codes, uniques = pd.factorize(descriptions.fillna('').astype(str))
+    cleaned = (
+        pd.Series(uniques, dtype=object).str.lower()
+        .str.replace(r'[\d\W_]+', ' ', regex=True)
+        .str.strip()
+        .to_numpy()
+    )
+    return pd.Series(cleaned[codes], index=descriptions.index)
+
+
+def detect_recurring(
+    df: pd.DataFrame,
+    min_occurrences: int = 3,
+    amount_tolerance: float = 0.2,
+    min_confidence: float = 0.6,
+    now: Optional[datetime] = None
+) -> Tuple[pd.DataFrame, pd.Index]:
+    """
+    Recurring series in a frame of transactions (one or many users)
+
+    A series is a run of same-user, same-type, same-category transactions
+    with the same normalized description whose amounts stay within
+    `amount_tolerance` of each other. It is recurring when its median
+    interval matches a cadence and at least `min_confidence` of its
+    intervals are within that cadence's tolerance. Semiannual and annual
+    cadences need only two occurrences, since typical histories can't
+    hold three of them.
+
+    Args:
+        df: Transactions (fetch_transactions columns)
+        min_occurrences: Occurrences needed for weekly to quarterly series
+        amount_tolerance: Relative gap between sorted amounts that starts a new series
+        min_confidence: Share of intervals that must match the cadence
+        now: Reference date for `active` (default: now)
+
+    Returns:
+        (one row per recurring series with COLUMNS, ids of the transactions in them)
+    """
+    empty = pd.DataFrame(columns=COLUMNS), pd.Index([])
+    df = df[type_mask(df, 'INCOME') | type_mask(df, 'EXPENSE')]
+    if df.empty:
+        return empty
+
+    rows = pd.DataFrame({
+        'id': df['id'].to_numpy(),
+        'userId': df['userId'].to_numpy(),
+        'type': df['type'].array,
+        'category': fill_category(df['category_name'], 'Outros').array,
+        'key': normalize_descriptions(df['description']).to_numpy(),
+        'description': df['description'].to_numpy(),
+        'amount': df['amount'].astype(float).abs().to_numpy(),
+        'date': pd.to_datetime(df['date']).dt.normalize().to_numpy()
+    })
+
+    # Amount bands: a new series starts where the sorted amount jumps past the tolerance
+    rows['group'] = rows.groupby(SERIES_KEYS, sort=False, observed=True).ngroup()
+    rows = rows.iloc[np.lexsort((rows['amount'].to_numpy(), rows['group'].to_numpy()))].reset_index(drop=True)
+    new_key = rows['group'] != rows['group'].shift()
+    jump = rows['amount'] > rows['amount'].shift() * (1 + amount_tolerance)
+    rows['series'] = (new_key | jump).cumsum()
+
+    # Inter-arrival intervals; same-day duplicates count as one occurrence
+    occurrences = rows.iloc[np.lexsort((rows['date'].to_numpy(), rows['series'].to_numpy()))]
+    occurrences = occurrences[
+        (occurrences['series'] != occurrences['series'].shift())
+        | (occurrences['date'] != occurrences['date'].shift())
+    ].reset_index(drop=True)
+    same_series = occurrences['series'] == occurrences['series'].shift()
+    occurrences['gap'] = occurrences['date'].diff().dt.days.where(same_series)
+    occurrences['day'] = occurrences['date'].dt.day
+
+    series = occurrences.groupby('series', sort=False).agg(
+        occurrences=('date', 'size'),
+        amount=('amount', 'median'),
+        firstDate=('date', 'min'),
+        lastDate=('date', 'max'),
+        medianGap=('gap', 'median'),
+        anchorDay=('day', 'median')
+    )
+    # Rows are sorted by series: labels come from its first row, the description from its latest
+    labels = occurrences.loc[~same_series, ['series', 'userId', 'type', 'category']].set_index('series')
+    latest = occurrences.loc[occurrences['series'] != occurrences['series'].shift(-1), ['series', 'description']]
+    series = series.join(labels).join(latest.set_index('series'))
+    series = series[series['occurrences'] >= 2]
+    if series.empty:
+        return empty
+
+    # Cadence whose tolerance window holds the median interval
+    gap = series['medianGap'].to_numpy()
+    fits = np.abs(gap[:, None] - CADENCE_DAYS[None, :]) <= CADENCE_TOLERANCE[None, :]
+    cadence = np.where(fits.any(axis=1), fits.argmax(axis=1), -1)
+    series = series.assign(cadenceIdx=cadence)[cadence >= 0]
+
+    # Confidence: share of the series' intervals within the cadence tolerance
+    per_row = occurrences['series'].map(series['cadenceIdx'])
+    matched = occurrences[per_row.notna() & occurrences['gap'].notna()]
+    idx = per_row[matched.index].astype(int).to_numpy()
+    in_tolerance = np.abs(matched['gap'].to_numpy() - CADENCE_DAYS[idx]) <= CADENCE_TOLERANCE[idx]
+    hits = pd.Series(in_tolerance, index=matched['series'].to_numpy()).groupby(level=0).sum()
+
+    idx = series['cadenceIdx'].to_numpy()
+    series['confidence'] = hits.reindex(series.index, fill_value=0).to_numpy() / (series['occurrences'] - 1)
+    needed = np.where(CADENCE_MONTHS[idx] >= 6, min(min_occurrences, 2), min_occurrences)
+    series = series[(series['occurrences'] >= needed) & (series['confidence'] >= min_confidence)]
+    if series.empty:
+        return empty
+
+    idx = series['cadenceIdx'].to_numpy()
+    series = series.assign(
+        cadence=CADENCE_NAMES[idx],
+        intervalDays=CADENCE_DAYS[idx],
+        stepMonths=CADENCE_MONTHS[idx],
+        anchorDay=series['anchorDay'].round().astype(int),
+        monthlyAmount=series['amount'] * DAYS_PER_MONTH / CADENCE_DAYS[idx],
+        confidence=series['confidence'].round(2)
+    )
+    series['nextDate'] = pd.to_datetime(_step_dates(series, np.ones((len(series), 1), dtype=np.int64))[:, 0])
+    # Still running unless more than one whole interval overdue
+    now = pd.Timestamp(now or datetime.now()).normalize()
+    series['active'] = (series['nextDate'] + pd.to_timedelta(CADENCE_DAYS[idx], unit='D')) >= now
+
+    members = pd.Index(rows.loc[rows['series'].isin(series.index), 'id'])
+    return series[COLUMNS].reset_index(drop=True), members
+
+
+def expand_occurrences(series: pd.DataFrame, start: datetime, end: datetime) -> pd.DataFrame:
+    """
+    Predicted occurrences of each series in (start, end]
+
+    Returns a frame with `series` (positional row of `series`) and `date`.
+    """
+    if series.empty:
+        return pd.DataFrame({'series': pd.Series(dtype=np.int64), 'date': pd.Series(dtype='datetime64[ns]')})
+
+    start = np.datetime64(pd.Timestamp(start).normalize(), 'D')
+    end = np.datetime64(pd.Timestamp(end).normalize(), 'D')
+    last = series['lastDate'].to_numpy().astype('datetime64[D]')
+    months = series['stepMonths'].to_numpy()
+    interval = series['intervalDays'].to_numpy()
+
+    # Whole steps already behind `start` (one short, so the first kept step is never skipped)
+    behind_days = (start - last).astype(np.int64)
+    behind_months = (start.astype('datetime64[M]') - last.astype('datetime64[M]')).astype(np.int64)
+    skipped = np.where(months > 0, behind_months // np.maximum(months, 1) - 1, behind_days // interval)
+    first = np.maximum(skipped, 1)
+
+    steps = int(np.ceil((end - start).astype(np.int64) / interval.min())) + 2
+    k = first[:, None] + np.arange(steps)[None, :]
+    dates = _step_dates(series, k)
+
+    keep = (dates > start) & (dates <= end)
+    series_idx, _ = np.nonzero(keep)
+    return pd.DataFrame({'series': series_idx, 'date': dates[keep].astype('datetime64[ns]')})
+
+
+def _step_dates(series: pd.DataFrame, k: np.ndarray) -> np.ndarray:
+    """Date of the k-th occurrence after each series' last one (k has one row per series)"""
+    last = series['lastDate'].to_numpy().astype('datetime64[D]')
+    months = series['stepMonths'].to_numpy()
+    interval = np.rint(series['intervalDays'].to_numpy()).astype(np.int64)
+    anchor = series['anchorDay'].to_numpy().astype(np.int64)
+
+    by_days = last[:, None] + (k * interval[:, None]).astype('timedelta64[D]')
+
+    # Calendar cadences land on the usual day, clamped to the month's length
+    month = last.astype('datetime64[M]')[:, None] + (k * months[:, None]).astype('timedelta64[M]')
+    month_start = month.astype('datetime64[D]')
+    length = ((month + np.timedelta64(1, 'M')).astype('datetime64[D]') - month_start).astype(np.int64)
+    by_months = month_start + (np.minimum(anchor[:, None], length) - 1).astype('timedelta64[D]')
+
+    return np.where(months[:, None] > 0, by_months, by_days)
@@ -6,7 +6,26 @@ Uses Pandas/NumPy for 10-100x faster analytics than Node.js
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any, Optional, Sequence
+
+from analytics.services.aggregates import AggregateState, MonthlyStateStore, get_monthly_state_store
+from analytics.services.encoding import type_mask
+from analytics.services.money import from_cents, mean, percent
+from analytics.services.recurring import detect_recurring
+from analytics.services.stratified import (
+    CONFIDENCE,
+    Z_95,
+    combine,
+    estimate,
+    interval,
+    savings_rate as estimated_savings_rate,
+    stratum_estimates,
+    weighted_median
+)
+
+
+# Expense order statistics served from quantile sketches
+EXPENSE_PERCENTILES = {"median_expense": 0.5, "p90_expense": 0.9, "p99_expense": 0.99}
 
 
 class ReportCalculator:
@@ -26,38 +45,264 @@ class ReportCalculator:
         """Calculate moving average"""
         return df['amount'].rolling(window=window).mean()
 
-    def generate_insights(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def financial_summary(self, df: pd.DataFrame, state: Optional[AggregateState] = None) -> Dict[str, Any]:
+        """
+        Totals, per-category sums, daily trends and statistics of a
+        non-empty frame of COMPLETED transactions (amounts in exact cents)
+
+        Expense percentiles come from the quantile sketches of `state`
+        (e.g. `period_states` of the same period) or, without it, of
+        sketches built from the frame.
+        """
+        income_df = df[type_mask(df, 'INCOME')]
+        expense_df = df[type_mask(df, 'EXPENSE')]
+
+        income_cents = int(income_df['amountCents'].sum())
+        expense_cents = int(expense_df['amountCents'].sum())
+
+        # Group by category
+        category_summary = df.groupby(['category_name', 'type'], observed=True).agg({
+            'amountCents': 'sum',
+            'id': 'count'
+        }).reset_index()
+        category_summary.columns = ['category', 'type', 'total', 'count']
+        category_summary['total'] = from_cents(category_summary['total'].to_numpy())
+
+        # Calculate daily trends
+        daily_trends = df.groupby([pd.Grouper(key='date', freq='D'), 'type'], observed=True).agg({
+            'amountCents': 'sum'
+        }).reset_index()
+        daily_trends = daily_trends.assign(
+            amount=from_cents(daily_trends['amountCents'].to_numpy())
+        ).drop(columns='amountCents')
+
+        return {
+            "summary": {
+                "total_income": from_cents(income_cents),
+                "total_expenses": from_cents(expense_cents),
+                "net_balance": from_cents(income_cents - expense_cents),
+                "transaction_count": len(df),
+                "avg_transaction": mean(df['amountCents']),
+                "savings_rate": percent(income_cents - expense_cents, income_cents) if income_cents > 0 else 0
+            },
+            "by_category": category_summary.to_dict('records'),
+            "trends": daily_trends.to_dict('records'),
+            "statistics": {
+                "highest_expense": float(expense_df['amount'].max()) if not expense_df.empty else 0,
+                "lowest_expense": float(expense_df['amount'].min()) if not expense_df.empty else 0,
+                "highest_income": float(income_df['amount'].max()) if not income_df.empty else 0,
+                **self.expense_percentiles(state if state is not None else self.type_states(df))
+            }
+        }
+
+    @staticmethod
+    def type_states(df: pd.DataFrame) -> AggregateState:
+        """Aggregate state of a frame by transaction type"""
+        return AggregateState.from_frame(df.assign(type=df['type'].astype(str)), ['type'])
+
+    def expense_percentiles(self, state: AggregateState) -> Dict[str, float]:
+        """EXPENSE_PERCENTILES of a state with a `type` key, from its sketches (0 without expenses)"""
+        quantiles = state.rollup(['type']).quantiles(list(EXPENSE_PERCENTILES.values()))
+        if 'EXPENSE' not in quantiles.index:
+            return {name: 0 for name in EXPENSE_PERCENTILES}
+        row = quantiles.loc['EXPENSE']
+        return {name: round(float(value), 2) for name, value in zip(EXPENSE_PERCENTILES, row.to_numpy().ravel())}
+
+    @staticmethod
+    def empty_financial_summary() -> Dict[str, Any]:
+        """`financial_summary` of a period without transactions"""
+        return {
+            "summary": {
+                "total_income": 0,
+                "total_expenses": 0,
+                "net_balance": 0,
+                "transaction_count": 0
+            },
+            "by_category": [],
+            "trends": []
+        }
+
+    def approximate_financial_summary(self, sample: pd.DataFrame) -> Dict[str, Any]:
+        """
+        `financial_summary` estimated from a non-empty stratified sample
+        (see services.stratified), with 95% intervals
+
+        Counts are exact; trends are monthly and the statistics only carry
+        the median expense (extremes cannot be estimated from a sample).
+        """
+        strata = stratum_estimates(sample)
+        income = estimate(strata[strata['type'] == 'INCOME'])
+        expenses = estimate(strata[strata['type'] == 'EXPENSE'])
+        net = (income[0] - expenses[0], combine(income[1], expenses[1]))
+        count = int(strata['size'].sum())
+        overall = estimate(strata)
+        rate, rate_margin = estimated_savings_rate(income, expenses)
+
+        def grouped(keys: List[str]) -> pd.DataFrame:
+            totals = strata.groupby(keys, sort=False).agg(
+                total=('total', 'sum'),
+                variance=('variance', 'sum'),
+                count=('size', 'sum')
+            ).reset_index()
+            totals['margin'] = Z_95 * np.sqrt(totals['variance'])
+            return totals
+
+        by_category = [
+            {
+                "category": row.category,
+                "type": row.type,
+                "total": from_cents(row.total),
+                "count": int(row.count),
+                "interval": interval(row.total, row.margin)
+            }
+            for row in grouped(['category', 'type']).itertuples(index=False)
+        ]
+        trends = [
+            {"date": row.month, "type": row.type, "amount": from_cents(row.total), "interval": interval(row.total, row.margin)}
+            for row in grouped(['month', 'type']).sort_values(['month', 'type']).itertuples(index=False)
+        ]
+
+        expense_sample = sample[sample['type'] == 'EXPENSE']
+        statistics: Dict[str, Any] = {}
+        if not expense_sample.empty:
+            median, low, high = weighted_median(expense_sample, strata[strata['type'] == 'EXPENSE'])
+            statistics = {"median_expense": median, "median_expense_interval": [low, high]}
+
+        return {
+            "summary": {
+                "total_income": from_cents(income[0]),
+                "total_expenses": from_cents(expenses[0]),
+                "net_balance": from_cents(net[0]),
+                "transaction_count": count,
+                "avg_transaction": from_cents(overall[0] / count),
+                "savings_rate": rate
+            },
+            "intervals": {
+                "total_income": interval(*income),
+                "total_expenses": interval(*expenses),
+                "net_balance": interval(*net),
+                "avg_transaction": interval(overall[0] / count, overall[1] / count),
+                "savings_rate": [rate - rate_margin, rate + rate_margin]
+            },
+            "confidence": CONFIDENCE,
+            "by_category": by_category,
+            "trends": trends,
+            "trend_granularity": "month",
+            "statistics": statistics
+        }
+
+    def financial_summary_by_user(self, df: pd.DataFrame, user_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
         """
-        Generate intelligent insights from transaction data
+        `financial_summary` of every user in a multi-user frame
+
+        Computed with grouped operations over the whole frame; users
+        without transactions get `empty_financial_summary()`.
+        """
+        users = pd.Index(list(user_ids), dtype=object)
+        result = {user_id: self.empty_financial_summary() for user_id in users}
+        if df.empty:
+            return result
+
+        income = type_mask(df, 'INCOME')
+        expense = type_mask(df, 'EXPENSE')
+        cents = df['amountCents']
+        user = df['userId']
+
+        income_cents = cents[income].groupby(user[income]).sum().reindex(users, fill_value=0)
+        expense_cents = cents[expense].groupby(user[expense]).sum().reindex(users, fill_value=0)
+        count = user.value_counts().reindex(users, fill_value=0)
+        total_cents = cents.groupby(user).sum().reindex(users, fill_value=0)
+        net_cents = income_cents - expense_cents
+
+        expense_stats = df.loc[expense, 'amount'].groupby(user[expense]).agg(['max', 'min'])
+        expense_percentiles = AggregateState.from_frame(df[expense], ['userId']).quantiles(list(EXPENSE_PERCENTILES.values()))
+        highest_income = df.loc[income, 'amount'].groupby(user[income]).max()
+
+        by_category = df.groupby(['userId', 'category_name', 'type'], observed=True).agg(
+            total=('amountCents', 'sum'),
+            count=('id', 'count')
+        ).reset_index().rename(columns={'category_name': 'category'})
+        by_category['total'] = from_cents(by_category['total'].to_numpy())
+        categories = dict(tuple(by_category.groupby('userId', sort=False)))
+
+        trends = df.groupby(['userId', pd.Grouper(key='date', freq='D'), 'type'], observed=True)['amountCents'].sum().reset_index()
+        trends = trends.assign(amount=from_cents(trends['amountCents'].to_numpy())).drop(columns='amountCents')
+        trends_by_user = dict(tuple(trends.groupby('userId', sort=False)))
+
+        savings_rate = percent(net_cents.to_numpy(), income_cents.to_numpy())
+        for i, user_id in enumerate(users):
+            if not count[user_id]:
+                continue
+            stats = expense_stats.loc[user_id] if user_id in expense_stats.index else None
+            result[user_id] = {
+                "summary": {
+                    "total_income": from_cents(income_cents[user_id]),
+                    "total_expenses": from_cents(expense_cents[user_id]),
+                    "net_balance": from_cents(net_cents[user_id]),
+                    "transaction_count": int(count[user_id]),
+                    "avg_transaction": from_cents(total_cents[user_id] / count[user_id]),
+                    "savings_rate": float(savings_rate[i]) if income_cents[user_id] > 0 else 0
+                },
+                "by_category": categories[user_id].drop(columns='userId').to_dict('records') if user_id in categories else [],
+                "trends": trends_by_user[user_id].drop(columns='userId').to_dict('records'),
+                "statistics": {
+                    "highest_expense": float(stats['max']) if stats is not None else 0,
+                    "lowest_expense": float(stats['min']) if stats is not None else 0,
+                    "highest_income": float(highest_income[user_id]) if user_id in highest_income.index else 0,
+                    **{
+                        name: round(float(expense_percentiles.loc[user_id].iloc[j]), 2) if stats is not None else 0
+                        for j, name in enumerate(EXPENSE_PERCENTILES)
+                    }
+                }
+            }
+        return result
+
+    def monthly_states(self, df: pd.DataFrame) -> AggregateState:
+        """Mergeable (month, type, category) aggregate states of a transaction frame"""
+        return MonthlyStateStore.build(df)
+
+    def merge_states(
+        self,
+        states: Iterable[AggregateState],
+        keys: Optional[Sequence[str]] = None
+    ) -> AggregateState:
+        """Merge partition states, optionally rolled up to `keys`"""
+        return AggregateState.merge(states, keys)
+
+    def period_states(self, user_id: str, start: datetime, end: Optional[datetime] = None) -> AggregateState:
+        """
+        Monthly states of a user's period: cached closed months merged with
+        the live month and partial edge months
+        """
+        return get_monthly_state_store().load(user_id, start, end)
+
+    def generate_insights(self, features: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Generate intelligent insights from a feature-store feature vector
 
         Returns actionable recommendations based on spending patterns
         """
         insights = []
 
-        if df.empty:
+        if not features['transactionCount']:
             return insights
 
         # Insight 1: High expense categories
-        expense_df = df[df['type'] == 'EXPENSE']
-        if not expense_df.empty:
-            top_category = expense_df.groupby('category_name')['amount'].sum().idxmax()
-            top_amount = expense_df.groupby('category_name')['amount'].sum().max()
+        if features['topCategories']:
+            top = features['topCategories'][0]
 
             insights.append({
                 "type": "high_spending",
                 "priority": "high",
-                "category": top_category,
-                "amount": float(top_amount),
-                "message": f"Maior gasto em '{top_category}': R$ {top_amount:.2f}",
-                "recommendation": f"Considere reduzir gastos em '{top_category}' para economizar."
+                "category": top['category'],
+                "amount": top['total'],
+                "message": f"Maior gasto em '{top['category']}': R$ {top['total']:.2f}",
+                "recommendation": f"Considere reduzir gastos em '{top['category']}' para economizar."
             })
 
         # Insight 2: Savings rate
-        total_income = df[df['type'] == 'INCOME']['amount'].sum()
-        total_expenses = df[df['type'] == 'EXPENSE']['amount'].sum()
-
-        if total_income > 0:
-            savings_rate = ((total_income - total_expenses) / total_income) * 100
+        if features['totalIncome'] > 0:
+            savings_rate = features['savingsRate']
 
             if savings_rate < 20:
                 insights.append({
@@ -69,19 +314,15 @@ class ReportCalculator:
                 })
 
         # Insight 3: Weekend spending
-        df['day_of_week'] = pd.to_datetime(df['date']).dt.dayofweek
-        weekend_spending = expense_df[expense_df['day_of_week'].isin([5, 6])]['amount'].sum()
-        total_spending = expense_df['amount'].sum()
-
-        if total_spending > 0:
-            weekend_percentage = (weekend_spending / total_spending) * 100
+        if features['totalExpenses'] > 0:
+            weekend_percentage = features['weekendShare']
 
             if weekend_percentage > 40:
                 insights.append({
                     "type": "weekend_spending",
                     "priority": "medium",
                     "percentage": float(weekend_percentage),
-                    "amount": float(weekend_spending),
+                    "amount": features['weekendExpenses'],
                     "message": f"Gastos em finais de semana: {weekend_percentage:.1f}%",
                     "recommendation": "Planeje atividades de lazer mais econômicas nos finais de semana."
                 })
@@ -97,29 +338,25 @@ class ReportCalculator:
         """
         Detect recurring transactions (subscriptions, bills, etc.)
 
-        Uses clustering to find similar transactions
+        Series of similar transactions whose intervals match a weekly to
+        annual cadence; see services.recurring.
         """
-        recurring = []
+        series, _ = detect_recurring(df, min_occurrences=min_occurrences, amount_tolerance=amount_tolerance)
 
-        if df.empty:
-            return recurring
-
-        # Group by category and amount (with tolerance)
-        df['amount_rounded'] = df['amount'].round(0)
-
-        for (category, amount), group in df.groupby(['category_name', 'amount_rounded']):
-            if len(group) >= min_occurrences:
-                # Check if amounts are similar
-                std_dev = group['amount'].std()
-                mean_amount = group['amount'].mean()
-
-                if std_dev / mean_amount < amount_tolerance:
-                    recurring.append({
-                        "category": category,
-                        "average_amount": float(mean_amount),
-                        "frequency": len(group),
-                        "type": "recurring",
-                        "confidence": 0.9
-                    })
-
-        return recurring
+        return [
+            {
+                "category": s.category,
+                "description": s.description,
+                "average_amount": float(s.amount),
+                "monthly_amount": float(s.monthlyAmount),
+                "frequency": s.cadence,
+                "occurrences": int(s.occurrences),
+                "day_of_month": int(s.anchorDay) if s.stepMonths > 0 else None,
+                "next_date": s.nextDate.isoformat(),
+                "active": bool(s.active),
+                "type": "recurring",
+                "transaction_type": s.type,
+                "confidence": float(s.confidence)
+            }
+            for s in series.itertuples(index=False)
+        ]
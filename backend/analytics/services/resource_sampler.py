@@ -0,0 +1,151 @@
+"""
+Resource Sampler - Background process/runtime metrics
+
+Samples CPU, memory, file descriptors, event-loop lag, DB pool usage and
+executor queue depth on a fixed interval and keeps them in a ring buffer,
+so health endpoints can answer in constant time from the cached snapshot.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+from loguru import logger
+
+from analytics.config import get_settings
+from analytics.database.connection import get_db_connection, POOL_SIZE, MAX_OVERFLOW
+
+
+class ResourceSampler:
+    """
+    Periodic resource sampler backed by a fixed-size ring buffer
+
+    `cpu_percent()` is primed on creation so every later call measures the
+    CPU time consumed since the previous sample instead of returning 0.
+    """
+
+    def __init__(self, interval: float = 5.0, history_minutes: int = 60):
+        self.interval = max(0.5, interval)
+        self.history_size = max(1, int(history_minutes * 60 / self.interval))
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=self.history_size)
+        self._process = psutil.Process(os.getpid())
+        self._process.cpu_percent(interval=None)
+        self._started_at = time.time()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """Start the background sampling task (idempotent)"""
+        if self.running:
+            return
+        self._samples.append(self._sample(loop_lag_ms=0.0))
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📈 Resource sampler started (every {self.interval}s, {self.history_size} samples)")
+
+    async def stop(self):
+        """Stop the background sampling task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Most recent sample, or None before the first one"""
+        return self._samples[-1] if self._samples else None
+
+    def history(self, minutes: int = 15) -> List[Dict[str, Any]]:
+        """Samples recorded during the last `minutes` minutes, oldest first"""
+        cutoff = time.time() - minutes * 60
+        return [s for s in self._samples if s["ts"] >= cutoff]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            # Anything past the requested wake-up time was spent waiting for the loop
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            try:
+                self._samples.append(self._sample(lag_ms))
+            except Exception as e:
+                logger.error(f"Error sampling resources: {e}")
+
+    def _sample(self, loop_lag_ms: float) -> Dict[str, Any]:
+        now = time.time()
+        with self._process.oneshot():
+            memory_info = self._process.memory_info()
+            sample = {
+                "ts": now,
+                "timestamp": datetime.utcfromtimestamp(now).isoformat(),
+                "uptime_seconds": round(now - self._started_at, 1),
+                "cpu_percent": self._process.cpu_percent(interval=None),
+                "memory": {
+                    "used_mb": memory_info.rss / 1024 / 1024,
+                    "percent": self._process.memory_percent()
+                },
+                "open_fds": self._open_fds(),
+                "threads": self._process.num_threads(),
+                "loop_lag_ms": round(loop_lag_ms, 2),
+                "db_pool": self._db_pool_stats(),
+                "executor_queue": self._executor_queue_depth()
+            }
+        return sample
+
+    def _open_fds(self) -> Optional[int]:
+        try:
+            if hasattr(self._process, "num_fds"):
+                return self._process.num_fds()
+            return self._process.num_handles()
+        except psutil.Error:
+            return None
+
+    def _db_pool_stats(self) -> Optional[Dict[str, int]]:
+        # Never create the engine just to report on it
+        if get_db_connection.cache_info().currsize == 0:
+            return None
+        pool = get_db_connection().pool
+        try:
+            return {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                "checked_in": pool.checkedin(),
+                "capacity": POOL_SIZE + MAX_OVERFLOW
+            }
+        except AttributeError:
+            return None
+
+    def _executor_queue_depth(self) -> Optional[int]:
+        try:
+            executor = asyncio.get_running_loop()._default_executor
+        except (RuntimeError, AttributeError):
+            return None
+        if executor is None:
+            return 0
+        work_queue = getattr(executor, "_work_queue", None)
+        return work_queue.qsize() if work_queue is not None else None
+
+
+# Singleton instance
+_resource_sampler = None
+
+def get_resource_sampler() -> ResourceSampler:
+    """Get or create resource sampler instance"""
+    global _resource_sampler
+    if _resource_sampler is None:
+        settings = get_settings()
+        _resource_sampler = ResourceSampler(
+            interval=settings.resource_sample_interval,
+            history_minutes=settings.resource_history_minutes
+        )
+    return _resource_sampler
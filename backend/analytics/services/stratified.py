@@ -0,0 +1,152 @@
+"""
+Stratified - Estimates from a stratified sample of a user's transactions
+
+Long periods are summarized from a sample of at most n rows per (month,
+type, category) stratum instead of every row. Stratum sizes N come from
+the user's monthly aggregate states (stratum_sizes), which are persisted
+per closed month, so they cost no scan; fetch_stratified_sample then reads
+only the sampled rows through an md5(id)-ordered index. Each stratum's
+sample is a contiguous arc of that hash order from a seeded pivot, which
+is a simple random sample without replacement.
+
+A stratum total is N * mean of its sampled rows, with variance
+N^2 * (1 - n/N) * s^2 / n; strata are independent, so totals over any
+group of strata add their estimates and variances. Strata smaller than n
+are read whole and contribute no error. Counts are exact: every stratum
+reports its size.
+
+All margins are half-widths of 95% intervals.
+"""
+import math
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from analytics.services.aggregates import AggregateState
+from analytics.services.money import CENTS, from_cents
+
+CONFIDENCE = 0.95
+Z_95 = 1.96
+# category_name is "" for uncategorized rows in the keys
+STRATUM_KEYS = ['month', 'type', 'category_name']
+
+
+def stratum_sizes(state: AggregateState) -> pd.DataFrame:
+    """month, type, category ("" when uncategorized) and size of every stratum of monthly states"""
+    counts = state.moments['count']
+    strata = counts[counts > 0].rename('size').reset_index()
+    strata['category'] = strata['category'].astype(object).where(strata['category'].notna(), '')
+    return strata[['month', 'type', 'category', 'size']]
+
+
+def stratum_estimates(sample: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-stratum size, sample size, estimated total cents and its variance
+
+    Keeps month, type and category name (None when uncategorized) next to
+    the stratum keys.
+    """
+    rows = sample.assign(
+        category_name=sample['category_name'].fillna(''),
+        category=sample['category_name'].astype(object)
+    )
+    cents = rows['amountCents'].astype(float)
+    strata = rows.assign(cents=cents, squares=cents ** 2).groupby(STRATUM_KEYS, sort=False).agg(
+        category=('category', 'first'),
+        size=('stratumSize', 'first'),
+        sampled=('cents', 'size'),
+        sum=('cents', 'sum'),
+        squares=('squares', 'sum')
+    ).reset_index()
+
+    n = strata['sampled'].to_numpy(dtype=float)
+    size = strata['size'].to_numpy(dtype=float)
+    mean = strata['sum'].to_numpy() / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s2 = np.where(n > 1, (strata['squares'].to_numpy() - n * mean ** 2) / (n - 1), 0.0)
+    strata['total'] = size * mean
+    strata['variance'] = np.maximum(size ** 2 * (1 - n / size) * s2 / n, 0.0)
+    return strata
+
+
+def margin(variance: float) -> float:
+    return Z_95 * math.sqrt(max(float(variance), 0.0))
+
+
+def combine(*margins: float) -> float:
+    """Margin of a sum or difference of independent estimates"""
+    return math.sqrt(sum(m ** 2 for m in margins))
+
+
+def estimate(strata: pd.DataFrame) -> Tuple[float, float]:
+    """Estimated total cents of a group of strata and its 95% margin"""
+    return float(strata['total'].sum()), margin(strata['variance'].sum())
+
+
+def savings_rate(income: Tuple[float, float], expenses: Tuple[float, float]) -> Tuple[float, float]:
+    """
+    (income - expenses) / income in %, with its margin
+
+    Income and expense strata are disjoint, so the linearized variance of
+    E / I is (Var(E) + (E/I)^2 Var(I)) / I^2.
+    """
+    (i, i_margin), (e, e_margin) = income, expenses
+    if i <= 0:
+        return 0.0, 0.0
+    ratio = e / i
+    variance = ((e_margin / Z_95) ** 2 + ratio ** 2 * (i_margin / Z_95) ** 2) / i ** 2
+    return (1 - ratio) * 100, margin(variance) * 100
+
+
+def weighted_median(sample: pd.DataFrame, strata: pd.DataFrame) -> Tuple[float, float, float]:
+    """
+    Estimated median amount of sampled rows (currency units) with a Woodruff interval
+
+    Rows are weighted by N/n of their stratum; the interval inverts the
+    estimated CDF at 0.5 +/- 1.96 of its standard error at the median.
+    """
+    rows = sample.assign(category_name=sample['category_name'].fillna(''))
+    rows = rows.merge(strata[STRATUM_KEYS + ['size', 'sampled']], on=STRATUM_KEYS)
+    values = rows['amountCents'].to_numpy(dtype=float)
+    weights = (rows['size'] / rows['sampled']).to_numpy()
+    order = np.argsort(values, kind='stable')
+    values, weights = values[order], weights[order]
+    cdf = np.cumsum(weights) / weights.sum()
+
+    def quantile(q: float) -> float:
+        return float(values[min(int(np.searchsorted(cdf, q)), len(values) - 1)])
+
+    median = quantile(0.5)
+
+    # Var(F(m)) from per-stratum proportions of rows at or below the median
+    population = strata['size'].sum()
+    below = rows.assign(below=rows['amountCents'] <= median).groupby(STRATUM_KEYS, sort=False)['below'].mean()
+    grouped = strata.set_index(STRATUM_KEYS)
+    p = below.reindex(grouped.index).to_numpy(dtype=float)
+    n = grouped['sampled'].to_numpy(dtype=float)
+    size = grouped['size'].to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(n > 1, (size / population) ** 2 * (1 - n / size) * p * (1 - p) / (n - 1), 0.0)
+    se = math.sqrt(terms.sum())
+
+    return median / CENTS, quantile(max(0.5 - Z_95 * se, 0.0)) / CENTS, quantile(min(0.5 + Z_95 * se, 1.0)) / CENTS
+
+
+def interval(value: float, half_width: float) -> List[float]:
+    """[low, high] in currency units from cents"""
+    return [from_cents(value - half_width), from_cents(value + half_width)]
+
+
+def sample_info(sample: pd.DataFrame, per_stratum: int, seconds: float) -> Dict[str, Any]:
+    """Size of a sample and of the population it stands for"""
+    sizes = sample.groupby(
+        [sample['month'], sample['type'], sample['category_name'].fillna('')], sort=False
+    )['stratumSize'].first()
+    return {
+        "strata": len(sizes),
+        "per_stratum": per_stratum,
+        "rows": len(sample),
+        "population": int(sizes.sum()),
+        "seconds": round(seconds, 3)
+    }
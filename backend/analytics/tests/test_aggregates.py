@@ -0,0 +1,195 @@
+"""
+Monthly aggregate state tests
+
+Tests marked `database` need a migrated Postgres in ANALYTICS_TEST_DATABASE_URL
+(it is written to); they are skipped without one.
+"""
+import os
+import threading
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from analytics.database import connection
+from analytics.database.queries import fetch_stratified_sample, save_monthly_aggregates
+from analytics.services import aggregates
+from analytics.services.aggregates import MonthlyStateStore
+from analytics.services.cache import ResultCache
+from analytics.services.money import with_units
+from analytics.services.stratified import stratum_sizes
+
+TEST_DATABASE_URL = os.getenv("ANALYTICS_TEST_DATABASE_URL")
+database = pytest.mark.skipif(not TEST_DATABASE_URL, reason="ANALYTICS_TEST_DATABASE_URL not set")
+
+
+def _transactions(start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    rng = np.random.default_rng(11)
+    dates = pd.date_range(start, end, freq="13h")
+    return with_units(pd.DataFrame({
+        "id": [f"t{i}" for i in range(len(dates))],
+        "userId": "u1",
+        "amountCents": rng.integers(100, 50000, len(dates)),
+        "type": rng.choice(["EXPENSE", "INCOME"], len(dates), p=[0.8, 0.2]),
+        "date": dates,
+        "category_name": rng.choice(["Mercado", "Lazer", None], len(dates))
+    }), "amountCents")
+
+
+def test_period_ending_in_the_future_includes_every_month(monkeypatch):
+    now = datetime.now()
+    current = pd.Period(now, freq="M")
+    start = (current - 9).start_time
+    end = (current + 2).end_time
+    frame = _transactions(start, pd.Timestamp(now))
+
+    def fetch_transactions(user_ids, first, last=None):
+        rows = frame[frame["date"] >= first]
+        return rows[rows["date"] <= last] if last is not None else rows
+
+    monkeypatch.setattr(aggregates, "fetch_transactions", fetch_transactions)
+    monkeypatch.setattr(aggregates, "fetch_monthly_watermarks", lambda user_id, first, last: {})
+    monkeypatch.setattr(aggregates, "fetch_monthly_aggregates", lambda user_id, months: pd.DataFrame())
+    monkeypatch.setattr(aggregates, "save_monthly_aggregates", lambda user_id, months, rows: None)
+
+    state = MonthlyStateStore(ResultCache()).load("u1", start, end)
+    expected = MonthlyStateStore.build(frame)
+
+    assert state.moments["count"].sum() == len(frame)
+    assert str(current) in set(state.moments.index.get_level_values("month"))
+    by_type = state.rollup(["type"]).quantiles([0.5, 0.9])
+    assert by_type.equals(expected.rollup(["type"]).quantiles([0.5, 0.9]))
+
+
+def test_cached_months_merge_like_one_build(monkeypatch):
+    frame = _transactions(pd.Timestamp("2025-01-01"), pd.Timestamp("2025-06-30 23:00"))
+    monkeypatch.setattr(
+        aggregates, "fetch_transactions",
+        lambda user_ids, first, last=None: frame[(frame["date"] >= first) & (frame["date"] <= last)]
+    )
+    monkeypatch.setattr(aggregates, "fetch_monthly_watermarks", lambda user_id, first, last: {})
+    monkeypatch.setattr(aggregates, "fetch_monthly_aggregates", lambda user_id, months: pd.DataFrame())
+    monkeypatch.setattr(aggregates, "save_monthly_aggregates", lambda user_id, months, rows: None)
+
+    store = MonthlyStateStore(ResultCache())
+    store.load("u1", datetime(2025, 1, 1), datetime(2025, 6, 30, 23, 59))
+    state = store.load("u1", datetime(2025, 1, 15), datetime(2025, 6, 30, 23, 59))
+    expected = MonthlyStateStore.build(frame[frame["date"] >= "2025-01-15"])
+
+    assert state.rollup(["type"]).moments.equals(expected.rollup(["type"]).moments)
+
+
+@database
+def test_concurrent_saves_store_a_month_once(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    connection.get_db_connection.cache_clear()
+    engine = connection.get_db_connection()
+
+    user_id = f"test-{uuid.uuid4().hex}"
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (id, name, email, "passwordHash", "updatedAt")
+            VALUES (:id, 'Teste', :email, 'x', NOW())
+        """), {"id": user_id, "email": f"{user_id}@example.com"})
+
+    try:
+        month = pd.Period("2025-03", freq="M")
+        frame = _transactions(month.start_time, month.end_time)
+        state = MonthlyStateStore.build(frame)
+        watermark = {"updated_at": None, "count": len(frame)}
+        rows = MonthlyStateStore._rows(state, month, watermark)
+
+        barrier = threading.Barrier(4)
+        errors = []
+
+        def save():
+            try:
+                barrier.wait()
+                save_monthly_aggregates(user_id, [str(month)], rows)
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=save) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        persisted = MonthlyStateStore()._load_persisted(user_id, [(month, watermark)])[str(month)]
+        assert persisted.moments["count"].sum() == len(frame)
+        assert persisted.moments["sumCents"].sum() == frame["amountCents"].sum()
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        connection.get_db_connection.cache_clear()
+
+
+@database
+def test_stratified_sample_reads_a_bounded_seeded_sample_per_stratum(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", TEST_DATABASE_URL)
+    connection.get_db_connection.cache_clear()
+    engine = connection.get_db_connection()
+
+    user_id = f"test-{uuid.uuid4().hex}"
+    start, end = pd.Timestamp("2025-03-01"), pd.Timestamp("2025-04-30 23:59:59")
+    frame = _transactions(start, end)
+    categories = {"Mercado": f"{user_id}-mercado", "Lazer": f"{user_id}-lazer"}
+    with engine.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO users (id, name, email, "passwordHash", "updatedAt")
+            VALUES (:id, 'Teste', :email, 'x', NOW())
+        """), {"id": user_id, "email": f"{user_id}@example.com"})
+        conn.execute(text("""
+            INSERT INTO accounts (id, "userId", name, type, balance, "updatedAt")
+            VALUES (:id, :user_id, 'Conta', 'CHECKING', 0, NOW())
+        """), {"id": user_id, "user_id": user_id})
+        for name, category_id in categories.items():
+            conn.execute(text("""
+                INSERT INTO user_categories (id, "userId", name, type, "updatedAt")
+                VALUES (:id, :user_id, :name, 'EXPENSE', NOW())
+            """), {"id": category_id, "user_id": user_id, "name": name})
+        conn.execute(text("""
+            INSERT INTO transactions (id, "userId", description, amount, type, "accountId", "userCategoryId",
+                                      status, date, "updatedAt")
+            VALUES (:id, :user_id, 'x', :amount, CAST(:type AS "TransactionType"), :user_id, :category_id,
+                    'COMPLETED', :date, NOW())
+        """), [
+            {
+                "id": f"{user_id}-{row.id}",
+                "user_id": user_id,
+                "amount": row.amountCents / 100,
+                "type": row.type,
+                "category_id": categories.get(row.category_name),
+                "date": row.date.to_pydatetime()
+            }
+            for row in frame.itertuples()
+        ])
+
+    try:
+        strata = stratum_sizes(MonthlyStateStore.build(frame))
+        sample = fetch_stratified_sample(user_id, start, end, strata, 5, seed=3)
+
+        keys = ["month", "type", "category_name"]
+        expected = frame.assign(
+            month=frame["date"].dt.to_period("M").astype(str),
+            category_name=frame["category_name"].fillna("")
+        ).groupby(keys).size()
+        picked = sample.assign(category_name=sample["category_name"].fillna("")).groupby(keys).agg(
+            rows=("id", "size"),
+            size=("stratumSize", "first")
+        )
+        assert picked.index.equals(expected.index)
+        assert (picked["rows"] == expected.clip(upper=5)).all()
+        assert (picked["size"] == expected).all()
+        assert sample["id"].is_unique
+        assert sample["id"].tolist() == fetch_stratified_sample(user_id, start, end, strata, 5, seed=3)["id"].tolist()
+        assert set(sample["id"]) != set(fetch_stratified_sample(user_id, start, end, strata, 5, seed=4)["id"])
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text('DELETE FROM transactions WHERE "userId" = :id'), {"id": user_id})
+            conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": user_id})
+        connection.get_db_connection.cache_clear()
@@ -0,0 +1,61 @@
+"""
+Budget matching tests
+"""
+import pandas as pd
+
+from analytics.services.budgets import _non_overlapping_layers, assign_budgets
+
+
+def _budgets(periods):
+    return pd.DataFrame([
+        {"id": f"b{i}", "userId": "u1", "userCategoryId": "c1", "startDate": start, "endDate": end}
+        for i, (start, end) in enumerate(periods)
+    ])
+
+
+def test_adjacent_periods_use_two_layers():
+    starts = pd.date_range("2021-01-01", periods=60, freq="MS")
+    budgets = _budgets(zip(starts, starts + pd.offsets.MonthBegin(1)))
+
+    layers = list(_non_overlapping_layers(budgets))
+
+    assert len(layers) == 2
+    assert sum(len(layer) for layer in layers) == 60
+
+
+def test_overlapping_periods_use_two_layers():
+    starts = pd.date_range("2021-01-04", periods=60, freq="7D")
+    budgets = _budgets(zip(starts, starts + pd.Timedelta(days=9)))
+
+    layers = list(_non_overlapping_layers(budgets))
+
+    assert len(layers) == 2
+
+
+def test_layers_follow_nesting_depth():
+    budgets = _budgets([
+        ("2024-01-01", "2024-12-31"),
+        ("2024-01-01", "2024-01-31"),
+        ("2024-02-01", "2024-02-29"),
+        ("2024-03-01", "2024-03-31"),
+    ])
+    budgets["startDate"] = pd.to_datetime(budgets["startDate"])
+    budgets["endDate"] = pd.to_datetime(budgets["endDate"])
+
+    assert len(list(_non_overlapping_layers(budgets))) == 2
+
+
+def test_transaction_on_shared_boundary_counts_for_both_budgets():
+    budgets = _budgets([
+        (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-02-01")),
+        (pd.Timestamp("2024-02-01"), pd.Timestamp("2024-03-01")),
+    ])
+    transactions = pd.DataFrame([
+        {"userId": "u1", "userCategoryId": "c1", "type": "EXPENSE", "date": "2024-01-15", "amount": 10},
+        {"userId": "u1", "userCategoryId": "c1", "type": "EXPENSE", "date": "2024-02-01", "amount": 20},
+        {"userId": "u1", "userCategoryId": "c1", "type": "EXPENSE", "date": "2024-02-10", "amount": 30},
+    ])
+
+    totals = assign_budgets(budgets, transactions).groupby("budgetId")["amountCents"].sum()
+
+    assert totals.to_dict() == {"b0": 3000, "b1": 5000}
@@ -0,0 +1,53 @@
+"""
+Cash-flow projection tests
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from analytics.services import cash_flow
+from analytics.services.cash_flow import load_projections
+from analytics.services.money import with_units
+
+NOW = datetime(2026, 10, 19, 6, 0)
+
+
+def _transactions(days: int) -> pd.DataFrame:
+    """Irregular daily expenses over the last `days` days"""
+    rng = np.random.default_rng(7)
+    dates = [NOW - timedelta(days=d, hours=3) for d in range(1, days)]
+    frame = pd.DataFrame({
+        "id": [f"t{i}" for i in range(len(dates))],
+        "userId": "u1",
+        "description": [f"Compra {i}" for i in range(len(dates))],
+        "amountCents": rng.integers(500, 20000, len(dates)),
+        "type": "EXPENSE",
+        "date": pd.to_datetime(dates),
+        "status": "COMPLETED",
+        "userCategoryId": "c1",
+        "updatedAt": pd.to_datetime(dates),
+        "category_name": "Mercado",
+        "category_type": "EXPENSE"
+    })
+    return with_units(frame, "amountCents")
+
+
+def test_nightly_frame_projects_like_on_demand(monkeypatch):
+    # The nightly batch loads ~210 days for other analyses; on demand loads HISTORY_DAYS
+    nightly_frame = _transactions(210)
+    monkeypatch.setattr(
+        cash_flow, "fetch_transactions",
+        lambda user_ids, start: nightly_frame[nightly_frame["date"] >= start]
+    )
+    monkeypatch.setattr(
+        cash_flow, "fetch_accounts",
+        lambda user_ids: pd.DataFrame({"userId": ["u1"], "type": ["CHECKING"], "balanceCents": [500000]})
+    )
+    monkeypatch.setattr(cash_flow, "fetch_goals", lambda user_ids: pd.DataFrame())
+
+    nightly = load_projections(["u1"], NOW, 90, nightly_frame, pd.DataFrame())["u1"]
+    on_demand = load_projections(["u1"], NOW, 90)["u1"]
+
+    assert nightly["dailyDiscretionary"] == on_demand["dailyDiscretionary"]
+    assert nightly["daily"] == on_demand["daily"]
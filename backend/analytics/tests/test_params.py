@@ -0,0 +1,60 @@
+"""
+Admin guard tests
+"""
+import base64
+import hashlib
+import hmac
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from analytics.routers import params
+from analytics.routers.params import require_admin
+
+SECRET = "test-secret"
+
+
+def _segment(value) -> str:
+    raw = value if isinstance(value, bytes) else json.dumps(value).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _token(claims, header=None, secret=SECRET) -> str:
+    signing_input = f"{_segment(header or {'alg': 'HS256', 'typ': 'JWT'})}.{_segment(claims)}"
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return f"Bearer {signing_input}.{_segment(signature)}"
+
+
+def _status(authorization: str) -> int:
+    try:
+        require_admin(authorization)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+@pytest.fixture(autouse=True)
+def secret(monkeypatch):
+    monkeypatch.setattr(params, "get_settings", lambda: SimpleNamespace(jwt_secret=SECRET))
+
+
+def test_valid_admin_token():
+    assert _status(_token({"role": "ADMIN", "exp": time.time() + 60})) == 200
+
+
+def test_rejected_tokens():
+    assert _status(_token({"role": "ADMIN"})) == 401
+    assert _status(_token({"role": "ADMIN", "exp": time.time() - 1})) == 401
+    assert _status(_token({"role": "ADMIN", "exp": "never"})) == 401
+    assert _status(_token([1, 2], header={"alg": "HS256"})) == 401
+    assert _status(_token({"role": "ADMIN", "exp": time.time() + 60}, header=["HS256"])) == 401
+    assert _status(_token({"role": "ADMIN", "exp": time.time() + 60}, secret="other")) == 401
+    assert _status(_token({"role": "USER", "exp": time.time() + 60})) == 403
+
+
+def test_placeholder_secret_refuses(monkeypatch):
+    monkeypatch.setattr(params, "get_settings", lambda: SimpleNamespace(jwt_secret="your-secret-key"))
+    assert _status(_token({"role": "ADMIN", "exp": time.time() + 60}, secret="your-secret-key")) == 503
@@ -0,0 +1,126 @@
+-- CreateEnum
+CREATE TYPE "ReportType" AS ENUM ('FINANCIAL_SUMMARY', 'CATEGORY_ANALYSIS', 'MONTHLY_TREND', 'CASH_FLOW_PROJECTION', 'BUDGET_VARIANCE', 'SPENDING_PATTERNS', 'CUSTOM');
+
+-- CreateEnum
+CREATE TYPE "ReportStatus" AS ENUM ('PENDING', 'PROCESSING', 'COMPLETED', 'FAILED');
+
+-- CreateEnum
+CREATE TYPE "ReportFormat" AS ENUM ('JSON', 'PDF', 'EXCEL', 'CSV');
+
+-- CreateEnum
+CREATE TYPE "AlertType" AS ENUM ('BUDGET_EXCEEDED', 'HIGH_SPENDING', 'LOW_BALANCE', 'UNUSUAL_TRANSACTION', 'RECURRING_PAYMENT_DUE', 'GOAL_MILESTONE', 'CASH_FLOW_WARNING', 'INCOME_RECEIVED', 'EXPENSE_ANOMALY', 'SAVINGS_OPPORTUNITY', 'CUSTOM');
+
+-- CreateEnum
+CREATE TYPE "AlertSeverity" AS ENUM ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL');
+
+-- CreateEnum
+CREATE TYPE "AlertStatus" AS ENUM ('ACTIVE', 'READ', 'DISMISSED', 'EXPIRED');
+
+-- CreateEnum
+CREATE TYPE "AlertChannel" AS ENUM ('IN_APP', 'EMAIL', 'SMS', 'PUSH');
+
+-- CreateTable
+CREATE TABLE "reports" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "name" TEXT NOT NULL,
+    "description" TEXT,
+    "type" "ReportType" NOT NULL,
+    "status" "ReportStatus" NOT NULL DEFAULT 'PENDING',
+    "format" "ReportFormat" NOT NULL,
+    "config" JSONB NOT NULL,
+    "data" JSONB,
+    "fileUrl" TEXT,
+    "filePath" TEXT,
+    "error" TEXT,
+    "generatedAt" TIMESTAMP(3),
+    "expiresAt" TIMESTAMP(3),
+    "metadata" JSONB,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "reports_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "alerts" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "type" "AlertType" NOT NULL,
+    "severity" "AlertSeverity" NOT NULL,
+    "status" "AlertStatus" NOT NULL DEFAULT 'ACTIVE',
+    "title" TEXT NOT NULL,
+    "message" TEXT NOT NULL,
+    "description" TEXT,
+    "data" JSONB NOT NULL,
+    "rule" JSONB,
+    "actionUrl" TEXT,
+    "actionText" TEXT,
+    "triggeredAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "readAt" TIMESTAMP(3),
+    "dismissedAt" TIMESTAMP(3),
+    "expiresAt" TIMESTAMP(3),
+    "channels" JSONB NOT NULL,
+    "metadata" JSONB,
+    "createdAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "alerts_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "reports_userId_idx" ON "reports"("userId");
+
+-- CreateIndex
+CREATE INDEX "reports_type_idx" ON "reports"("type");
+
+-- CreateIndex
+CREATE INDEX "reports_status_idx" ON "reports"("status");
+
+-- CreateIndex
+CREATE INDEX "reports_format_idx" ON "reports"("format");
+
+-- CreateIndex
+CREATE INDEX "reports_generatedAt_idx" ON "reports"("generatedAt");
+
+-- CreateIndex
+CREATE INDEX "reports_expiresAt_idx" ON "reports"("expiresAt");
+
+-- CreateIndex
+CREATE INDEX "reports_createdAt_idx" ON "reports"("createdAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_userId_idx" ON "alerts"("userId");
+
+-- CreateIndex
+CREATE INDEX "alerts_type_idx" ON "alerts"("type");
+
+-- CreateIndex
+CREATE INDEX "alerts_severity_idx" ON "alerts"("severity");
+
+-- CreateIndex
+CREATE INDEX "alerts_status_idx" ON "alerts"("status");
+
+-- CreateIndex
+CREATE INDEX "alerts_triggeredAt_idx" ON "alerts"("triggeredAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_readAt_idx" ON "alerts"("readAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_dismissedAt_idx" ON "alerts"("dismissedAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_expiresAt_idx" ON "alerts"("expiresAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_createdAt_idx" ON "alerts"("createdAt");
+
+-- CreateIndex
+CREATE INDEX "alerts_userId_status_idx" ON "alerts"("userId", "status");
+
+-- AddForeignKey
+ALTER TABLE "reports" ADD CONSTRAINT "reports_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "alerts" ADD CONSTRAINT "alerts_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "transactions" ALTER COLUMN "categoryId" DROP NOT NULL;
@@ -0,0 +1,20 @@
+-- CreateTable
+CREATE TABLE "analytics_snapshots" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "kind" TEXT NOT NULL,
+    "data" JSONB NOT NULL,
+    "runId" TEXT NOT NULL,
+    "computedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "analytics_snapshots_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "analytics_snapshots_runId_idx" ON "analytics_snapshots"("runId");
+
+-- CreateIndex
+CREATE UNIQUE INDEX "analytics_snapshots_userId_kind_key" ON "analytics_snapshots"("userId", "kind");
+
+-- AddForeignKey
+ALTER TABLE "analytics_snapshots" ADD CONSTRAINT "analytics_snapshots_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
@@ -0,0 +1,45 @@
+-- CreateTable
+CREATE TABLE "category_stats" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "category" TEXT NOT NULL,
+    "count" INTEGER NOT NULL DEFAULT 0,
+    "mean" DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "m2" DOUBLE PRECISION NOT NULL DEFAULT 0,
+    "sketch" JSONB NOT NULL,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "category_stats_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateTable
+CREATE TABLE "anomaly_scores" (
+    "id" TEXT NOT NULL,
+    "transactionId" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "category" TEXT NOT NULL,
+    "amount" DECIMAL(15,2) NOT NULL,
+    "date" TIMESTAMP(3) NOT NULL,
+    "zScore" DOUBLE PRECISION,
+    "robustScore" DOUBLE PRECISION,
+    "mean" DOUBLE PRECISION NOT NULL,
+    "std" DOUBLE PRECISION NOT NULL,
+    "scoredAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "anomaly_scores_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "category_stats_userId_category_key" ON "category_stats"("userId", "category");
+
+-- CreateIndex
+CREATE UNIQUE INDEX "anomaly_scores_transactionId_key" ON "anomaly_scores"("transactionId");
+
+-- CreateIndex
+CREATE INDEX "anomaly_scores_userId_date_idx" ON "anomaly_scores"("userId", "date");
+
+-- AddForeignKey
+ALTER TABLE "category_stats" ADD CONSTRAINT "category_stats_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
+
+-- AddForeignKey
+ALTER TABLE "anomaly_scores" ADD CONSTRAINT "anomaly_scores_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
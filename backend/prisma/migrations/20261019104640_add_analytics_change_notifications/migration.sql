@@ -0,0 +1,36 @@
+-- Change notifications for the analytics service (LISTEN analytics_changes).
+-- The payload only carries user and month so a bulk write folds into one
+-- notification per user-month.
+
+-- CreateFunction
+CREATE OR REPLACE FUNCTION analytics_notify_change() RETURNS trigger AS $$
+DECLARE
+  row_data jsonb;
+BEGIN
+  FOREACH row_data IN ARRAY ARRAY[
+    CASE WHEN TG_OP IN ('UPDATE', 'DELETE') THEN to_jsonb(OLD) END,
+    CASE WHEN TG_OP IN ('INSERT', 'UPDATE') THEN to_jsonb(NEW) END
+  ] LOOP
+    IF row_data IS NOT NULL THEN
+      PERFORM pg_notify('analytics_changes', json_build_object(
+        'table', TG_TABLE_NAME,
+        'userId', row_data ->> 'userId',
+        'month', CASE WHEN TG_TABLE_NAME = 'transactions' THEN left(row_data ->> 'date', 7) END
+      )::text);
+    END IF;
+  END LOOP;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- CreateTrigger
+CREATE TRIGGER transactions_analytics_notify AFTER INSERT OR UPDATE OR DELETE ON "transactions"
+FOR EACH ROW EXECUTE FUNCTION analytics_notify_change();
+
+-- CreateTrigger
+CREATE TRIGGER goals_analytics_notify AFTER INSERT OR UPDATE OR DELETE ON "goals"
+FOR EACH ROW EXECUTE FUNCTION analytics_notify_change();
+
+-- CreateTrigger
+CREATE TRIGGER budgets_analytics_notify AFTER INSERT OR UPDATE OR DELETE ON "budgets"
+FOR EACH ROW EXECUTE FUNCTION analytics_notify_change();
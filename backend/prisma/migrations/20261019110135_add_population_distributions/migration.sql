@@ -0,0 +1,15 @@
+-- CreateTable
+CREATE TABLE "population_distributions" (
+    "id" TEXT NOT NULL,
+    "metric" TEXT NOT NULL,
+    "category" TEXT NOT NULL DEFAULT '',
+    "count" INTEGER NOT NULL,
+    "sketch" JSONB NOT NULL,
+    "runId" TEXT NOT NULL,
+    "computedAt" TIMESTAMP(3) NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    CONSTRAINT "population_distributions_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "population_distributions_metric_category_key" ON "population_distributions"("metric", "category");
@@ -0,0 +1,26 @@
+-- CreateTable
+CREATE TABLE "monthly_aggregates" (
+    "id" TEXT NOT NULL,
+    "userId" TEXT NOT NULL,
+    "month" TEXT NOT NULL,
+    "type" TEXT NOT NULL,
+    "category" TEXT NOT NULL DEFAULT '',
+    "count" INTEGER NOT NULL,
+    "sumCents" BIGINT NOT NULL,
+    "sumSquares" DOUBLE PRECISION NOT NULL,
+    "minCents" BIGINT NOT NULL,
+    "maxCents" BIGINT NOT NULL,
+    "sketch" JSONB NOT NULL,
+    "accuracy" DOUBLE PRECISION NOT NULL,
+    "watermarkAt" TIMESTAMP(3),
+    "watermarkCount" INTEGER NOT NULL,
+    "updatedAt" TIMESTAMP(3) NOT NULL,
+
+    CONSTRAINT "monthly_aggregates_pkey" PRIMARY KEY ("id")
+);
+
+-- CreateIndex
+CREATE INDEX "monthly_aggregates_userId_month_idx" ON "monthly_aggregates"("userId", "month");
+
+-- AddForeignKey
+ALTER TABLE "monthly_aggregates" ADD CONSTRAINT "monthly_aggregates_userId_fkey" FOREIGN KEY ("userId") REFERENCES "users"("id") ON DELETE CASCADE ON UPDATE CASCADE;
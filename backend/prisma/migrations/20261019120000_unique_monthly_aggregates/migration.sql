@@ -0,0 +1,16 @@
+-- Concurrent rebuilds could store a user-month twice; drop those months (they are rebuilt on the next read)
+DELETE FROM "monthly_aggregates" a
+USING (
+    SELECT "userId", "month"
+    FROM "monthly_aggregates"
+    GROUP BY "userId", "month", "type", "category"
+    HAVING COUNT(*) > 1
+) duplicated
+WHERE a."userId" = duplicated."userId"
+    AND a."month" = duplicated."month";
+
+-- DropIndex
+DROP INDEX "monthly_aggregates_userId_month_idx";
+
+-- CreateIndex
+CREATE UNIQUE INDEX "monthly_aggregates_userId_month_type_category_key" ON "monthly_aggregates"("userId", "month", "type", "category");
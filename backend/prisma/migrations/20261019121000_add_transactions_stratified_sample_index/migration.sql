@@ -0,0 +1,5 @@
+-- Approximate reports read a bounded random sample per (user, type, category, month) stratum of
+-- COMPLETED transactions in md5(id) order (analytics fetch_stratified_sample).
+-- Partial expression index: not expressible in schema.prisma.
+-- CreateIndex
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "transactions_stratified_sample_idx" ON "transactions"("userId", "type", COALESCE("userCategoryId", ''), date_trunc('month', "date"), md5("id")) WHERE "status" = 'COMPLETED';